@@ -1,3 +1,57 @@
+import os
+
 import streamlit as st
+from dotenv import load_dotenv
+
+from src.app.resources import (
+    get_llm,
+    get_session_agent,
+    get_session_tenant,
+    load_patient_profile,
+)
+
+load_dotenv()
 
 st.title("Sistema de Suporte à Decisão - HELTH")
+
+# Carregar o modelo partilhado logo no arranque: só a primeira sessão do processo
+# paga este custo, reruns e sessões seguintes reutilizam a mesma instância
+get_llm()
+
+if "messages" not in st.session_state:
+    st.session_state.messages = []
+
+with st.sidebar:
+    st.header("Paciente")
+    patient_id = st.text_input("ID do paciente")
+    if patient_id:
+        profile = load_patient_profile(patient_id)
+        if profile:
+            st.json(profile, expanded=False)
+        else:
+            st.info("Paciente não encontrado.")
+
+    if st.button("Nova conversa"):
+        st.session_state.messages = []
+
+for role, content in st.session_state.messages:
+    with st.chat_message("user" if role == "human" else "assistant"):
+        st.markdown(content)
+
+if question := st.chat_input("Pergunta clínica"):
+    with st.chat_message("user"):
+        st.markdown(question)
+
+    history = list(st.session_state.messages)
+    result: dict[str, str] = {}
+    with st.chat_message("assistant"):
+        st.write_stream(get_session_agent().stream(
+            question,
+            chat_history=history,
+            tenant=get_session_tenant(),
+            timeout=float(os.getenv("LLM_QUERY_TIMEOUT", "120")),
+            result=result,
+        ))
+
+    # Resposta final do agente (não o texto emitido, que pode vir em fragmentos)
+    st.session_state.messages += [("human", question), ("ai", result["output"])]
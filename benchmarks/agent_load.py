@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do MedicalDecisionAgent com LLM gravado
+
+Modo gravação (precisa do provider real):
+    python benchmarks/agent_load.py --record gravacoes.jsonl --provider ollama
+
+Modo carga (sem GPU, respostas reproduzidas com latência simulada):
+    python benchmarks/agent_load.py --replay gravacoes.jsonl --concurrency 8 --queries 200
+    python benchmarks/agent_load.py --replay gravacoes.jsonl --latency 0   # só overhead
+    python benchmarks/agent_load.py --replay gravacoes.jsonl --router      # com fast path
+
+Na reprodução, um prompt sem gravação é um erro (ex: prompt do agente
+alterado desde a gravação); --any-recording usa as gravações por ordem.
+
+Por pergunta separa o tempo do modelo (spans llm.call), das ferramentas
+(spans tool.*) e o overhead do agente (o restante: prompt, dispatch, parsing);
+no fim, iterações e chamadas ao LLM poupadas pelo controlo de execução.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.observability.tracing import MemoryExporter, Tracer, set_tracer  # noqa: E402
+
+QUESTIONS = [
+    "Qual o IMC de um paciente com 85kg e 1.70m?",
+    "Consulta a glicose em jejum média dos pacientes com diabetes tipo 2.",
+    "Quais as guidelines para hipertensão em diabéticos?",
+    "Paciente com pressão 160/100. O que fazer?",
+]
+
+
+def stub_tools():
+    """Ferramentas com os nomes reais e respostas fixas (sem bases de dados)"""
+    from langchain.tools import Tool
+
+    from src.agents.tools import clinical_calculator
+
+    return [
+        Tool(
+            name="ClinicalCalculator",
+            func=clinical_calculator,
+            description="Cálculos clínicos. Input: 'imc:peso,altura' ex: 'imc:70,1.75'",
+        ),
+        Tool(
+            name="QueryDatabase",
+            func=lambda sql: "estágio | glicose_jejum\nType 2 | 148.2",
+            description="Consulta dados de pacientes. Input: uma consulta SQL SELECT",
+        ),
+        Tool(
+            name="RAGSearch",
+            func=lambda q: "[guideline] Alvo tensional <130/80 mmHg em diabéticos.",
+            description="Pesquisa guidelines e contexto clínico. Input: pergunta em texto",
+        ),
+    ]
+
+
+def build_agent(llm, use_router: bool = False):
+    from src.agents.nesy_agent import MedicalDecisionAgent
+    from src.agents.router import SymbolicRouter
+
+    return MedicalDecisionAgent(
+        llm=llm,
+        tools=stub_tools(),
+        db_postgres=None,
+        vector_db=None,
+        mongo_db=None,
+        router=SymbolicRouter() if use_router else None,
+    )
+
+
+def record(args, questions: list[str]) -> None:
+    from src.agents.text_tools import TextToolCallingChat, supports_tool_calling
+    from src.llm import get_medgemma_llm
+    from src.llm.replay import LLMRecorder
+
+    llm = get_medgemma_llm(provider=args.provider)
+    if not supports_tool_calling(llm):
+        # Grava ao nível do chat model: tool calls gravadas como tal
+        llm = TextToolCallingChat(llm=llm)
+    llm.callbacks = [LLMRecorder(args.record)]
+    agent = build_agent(llm)
+    for question in questions:
+        print(f"> {question}\n{agent.query(question)}\n")
+    print(f"Gravações em {args.record}")
+
+
+def _pct(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def replay(args, questions: list[str]) -> None:
+    from src.llm.replay import ReplayChatModel
+
+    latency = args.latency
+    if latency not in ("recorded", "none"):
+        latency = float(latency)
+    llm = ReplayChatModel.from_file(
+        args.replay,
+        latency=None if latency == "none" else latency,
+        latency_scale=args.latency_scale,
+        strict=not args.any_recording,
+    )
+    agent = build_agent(llm, use_router=args.router)
+
+    exporter = MemoryExporter()
+    set_tracer(Tracer([exporter]))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(
+            lambda i: agent.query(questions[i % len(questions)]), range(args.queries)
+        ))
+    elapsed = time.perf_counter() - start
+
+    by_trace: dict[str, dict[str, float]] = {}
+    for span in exporter.spans:
+        stats = by_trace.setdefault(span.trace_id, {"total": 0.0, "model": 0.0, "tools": 0.0})
+        if span.name == "agent.query":
+            stats["total"] = span.duration_ms
+        elif span.name == "llm.call":
+            stats["model"] += span.duration_ms
+        elif span.name.startswith("tool."):
+            stats["tools"] += span.duration_ms
+
+    rows = {"total": [], "model": [], "tools": [], "overhead": []}
+    for stats in by_trace.values():
+        if not stats["total"]:
+            continue
+        stats["overhead"] = stats["total"] - stats["model"] - stats["tools"]
+        for name in rows:
+            rows[name].append(stats[name])
+
+    print(f"{args.queries} perguntas, concorrência {args.concurrency}: "
+          f"{args.queries / elapsed:.1f} perguntas/s")
+    print(f"{'ms por pergunta':16} {'média':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, values in rows.items():
+        values.sort()
+        print(f"{name:16} {statistics.fmean(values):9.2f} {_pct(values, 50):9.2f} "
+              f"{_pct(values, 95):9.2f} {_pct(values, 99):9.2f}")
+
+    if args.router:
+        from src.agents.router import format_route_report, route_report
+
+        print()
+        print(format_route_report(route_report()))
+
+    from src.agents.execution import execution_report
+
+    report = execution_report()
+    print()
+    print(f"agente LLM: {report['iterations']} iterações, {report['llm_calls']} chamadas ao LLM; "
+          f"poupadas {sum(report['saved_iterations'].values())} iterações e "
+          f"{sum(report['saved_llm_calls'].values())} chamadas {report['saved_llm_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do agente")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--record", help="Gravar respostas do provider real neste ficheiro")
+    mode.add_argument("--replay", help="Reproduzir respostas gravadas deste ficheiro")
+    parser.add_argument("--provider", default="ollama", help="Provider para gravação")
+    parser.add_argument("--questions", type=Path, help="Ficheiro com uma pergunta por linha")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument(
+        "--latency", default="recorded", help="'recorded', 'none' ou segundos por chamada"
+    )
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument(
+        "--router", action="store_true", help="Ativar o router simbólico (fast path)"
+    )
+    parser.add_argument(
+        "--any-recording", action="store_true",
+        help="Prompt sem gravação: usar as gravações por ordem (default: erro)",
+    )
+    args = parser.parse_args()
+
+    questions = QUESTIONS
+    if args.questions:
+        questions = [q for q in args.questions.read_text().splitlines() if q.strip()]
+
+    if args.record:
+        record(args, questions)
+    else:
+        replay(args, questions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark de tempo de import (python -X importtime)
+
+Falha (exit code 1) quando:
+- um módulo excede o orçamento de tempo de import, ou
+- um módulo arrasta bibliotecas pesadas que deviam ser carregadas só quando usadas.
+
+Uso:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 7 --scale 2.0   # CI mais lento
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Módulo -> orçamento em milissegundos (tempo acumulado dos imports do próprio módulo)
+BUDGETS_MS = {
+    "config": 100,
+    "src.llm": 100,
+    "src.agents.nesy_agent": 100,
+    "src.ML.diabetes_dataset": 100,
+}
+
+# Bibliotecas que nenhum dos módulos acima pode importar no arranque
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "pandas",
+    "matplotlib",
+    "seaborn",
+    "streamlit",
+)
+
+_PRINT_MODULES = "import json, sys; print(json.dumps(sorted(sys.modules)))"
+
+
+def _run_importtime(code: str) -> tuple[dict[str, int], list[str]]:
+    """Executa `code` num interpretador limpo; devolve (top-level -> us, sys.modules)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        check=True,
+    )
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # cabeçalho
+        name = parts[2].rstrip()[1:]  # remove o espaço a seguir ao separador
+        if name.startswith(" "):
+            continue  # só interessam imports de primeiro nível
+        cumulative[name] = cumulative.get(name, 0) + int(parts[1])
+
+    modules = json.loads(result.stdout.strip().splitlines()[-1]) if result.stdout else []
+    return cumulative, modules
+
+
+def measure(module: str, runs: int) -> tuple[float, list[str]]:
+    """Mediana (ms) do tempo de import de `module` e bibliotecas pesadas carregadas"""
+    baseline, baseline_modules = _run_importtime(_PRINT_MODULES)
+
+    samples = []
+    heavy = []
+    for _ in range(runs):
+        timings, modules = _run_importtime(f"import {module}; {_PRINT_MODULES}")
+        samples.append(sum(us for name, us in timings.items() if name not in baseline) / 1000)
+        loaded = set(modules) - set(baseline_modules)
+        heavy = sorted({m.split(".")[0] for m in loaded} & set(HEAVY_MODULES))
+
+    return statistics.median(samples), heavy
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Execuções por módulo")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=float(os.getenv("IMPORT_BUDGET_SCALE", "1.0")),
+        help="Multiplicador dos orçamentos (máquinas lentas)",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in BUDGETS_MS.items():
+        budget *= args.scale
+        elapsed, heavy = measure(module, args.runs)
+
+        status = "OK"
+        if elapsed > budget:
+            status = "LENTO"
+            failed = True
+        if heavy:
+            status = "PESADO"
+            failed = True
+
+        print(f"{status:7} {module:28} {elapsed:7.1f} ms (orçamento {budget:.0f} ms)")
+        if heavy:
+            print(f"        importa no arranque: {', '.join(heavy)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
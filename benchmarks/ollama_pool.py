@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pool de réplicas Ollama contra servidores stub locais
+
+Cada stub imita um servidor Ollama com capacidade para um pedido de cada vez
+(como uma GPU) e latência fixa. Mede o throughput agregado com 1, 2 e 4 réplicas
+e verifica o failover quando uma réplica devolve erros.
+
+Uso:
+    python benchmarks/ollama_pool.py --latency 0.05 --requests 80
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.llm.ollama_pool import OllamaPool  # noqa: E402
+
+
+def start_stub(latency: float, fail: bool = False) -> ThreadingHTTPServer:
+    """Arranca um stub Ollama numa porta livre (thread daemon)"""
+    gpu = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):  # noqa: N802
+            self._send(500 if fail else 200, {"models": [{"name": "medgemma"}]})
+
+        def do_POST(self):  # noqa: N802
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if fail:
+                self._send(500, {"error": "stub em falha"})
+                return
+            with gpu:
+                time.sleep(latency)
+            self._send(200, {"response": f"eco: {payload.get('prompt', '')}", "done": True})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def throughput(pool: OllamaPool, n_requests: int, concurrency: int) -> float:
+    """Pedidos por segundo com `concurrency` clientes em paralelo"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda i: pool.generate("medgemma", f"p{i}"), range(n_requests)))
+    return n_requests / (time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.05, help="Latência por pedido (s)")
+    parser.add_argument("--requests", type=int, default=80, help="Pedidos por medição")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clientes em paralelo")
+    args = parser.parse_args()
+
+    results = {}
+    for n_replicas in (1, 2, 4):
+        servers = [start_stub(args.latency) for _ in range(n_replicas)]
+        pool = OllamaPool([url(s) for s in servers], health_check_interval=None)
+        results[n_replicas] = throughput(pool, args.requests, args.concurrency)
+        spread = [r["total_requests"] for r in pool.stats()]
+        print(f"{n_replicas} réplica(s): {results[n_replicas]:7.1f} req/s  distribuição={spread}")
+        pool.close()
+        for s in servers:
+            s.shutdown()
+
+    # Failover: uma réplica sempre em erro não deve fazer falhar pedidos
+    healthy, broken = start_stub(args.latency), start_stub(args.latency, fail=True)
+    pool = OllamaPool([url(broken), url(healthy)], health_check_interval=None)
+    ok = throughput(pool, args.requests // 4, args.concurrency) > 0
+    ejected = not pool.stats()[0]["available"]
+    print(f"failover: {'OK' if ok else 'FALHOU'}  réplica em erro ejetada={ejected}")
+    pool.close()
+
+    scaling = results[4] / results[1]
+    print(f"escala 1→4 réplicas: {scaling:.2f}x")
+    # Com capacidade 1 por réplica, 4 réplicas devem render pelo menos ~3x
+    return 0 if ok and ejected and scaling >= 3.0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks reprodutíveis do HELTH
+
+Benchmarks:
+- hf_generate: MedGemmaHuggingFace.generate com modelo minúsculo de pesos aleatórios
+  (CPU, offline), incluindo 32 prompts em ciclo vs em lote (src.llm.batch)
+- llm_coalesce: MedGemmaLangChain.invoke de 1/4/8 sessões concorrentes, cada
+  chamada sozinha vs juntas em lotes (src.llm.coalesce)
+- hf_load: carregamento do modelo minúsculo a partir do original vs do snapshot
+  local (src.llm.snapshot)
+- agent_query: MedicalDecisionAgent.query com LLM falso e ferramentas stub
+- ingest: ingest_structured_data contra SQLite (ou PostgreSQL com --pg-url), e a
+  validação (src.db.validation) isolada, para medir o seu peso na ingestão; com
+  dados válidos e, em separado, com 5% de linhas inválidas (quarentena)
+- tratamento: tratamento_dados em datasets sintéticos (10k a 10M linhas)
+- diabetic_features: leitura + features de encontros diabéticos sintéticos
+  (src.ML.diabetic_data), do CSV e da cache Parquet
+- feature_store: atualização incremental e leituras por paciente da feature
+  store (src.db.feature_store), com e sem LRU
+
+Os resultados ficam em JSON (um ficheiro por execução, com commit e máquina)
+para comparar entre commits:
+
+    python benchmarks/run.py
+    python benchmarks/run.py --only tratamento --sizes 10000 1000000 10000000
+    python benchmarks/run.py --compare benchmarks/results/<anterior>.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+SEED = 42
+
+# Fração de linhas inválidas no caso de ingestão com quarentena
+INVALID_FRACTION = 0.05
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> dict[str, float]:
+    """Executa `fn` várias vezes e devolve estatísticas de tempo (segundos)"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "min_s": samples[0],
+        "median_s": statistics.median(samples),
+        "max_s": samples[-1],
+    }
+
+
+# ----------------------------------------------------------------------
+# Dados sintéticos
+# ----------------------------------------------------------------------
+
+CATEGORIES = {
+    "gender": ["Male", "Female", "Other"],
+    "ethnicity": ["White", "Hispanic", "Black", "Asian", "Other"],
+    "education_level": ["No formal", "Highschool", "Graduate", "Postgraduate"],
+    "income_level": ["Low", "Low-Middle", "Upper-Middle", "High"],
+    "employment_status": ["Employed", "Unemployed", "Retired", "Student"],
+    "smoking_status": ["Never", "Former", "Current"],
+    "diabetes_stage": ["No Diabetes", "Pre-Diabetes", "Type 1", "Type 2", "Gestational"],
+}
+
+NUMERIC = {
+    "age": (18, 90),
+    "bmi": (16.0, 45.0),
+    "systolic_bp": (90, 190),
+    "glucose_fasting": (60, 250),
+    "hba1c": (4.0, 13.0),
+    "cholesterol_total": (120, 320),
+    "heart_rate": (45, 120),
+}
+
+
+def synthetic_diabetes_dataset(
+    n_rows: int, rows_per_patient: int = 5, invalid_fraction: float = 0.0
+):
+    """
+    Dataset com o esquema de saude_transacional (valores aleatórios, seed fixa)
+
+    As colunas de diabetes_dataset.csv mais o paciente de cada registo
+    (obrigatório na ingestão), em média `rows_per_patient` registos por paciente.
+    Todas as linhas passam a validação (src.db.validation), exceto uma fração
+    `invalid_fraction` com pressão diastólica >= sistólica ou IMC fora do
+    intervalo, metade de cada.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from src.db.validation import PATIENT_ID_COLUMN
+
+    rng = np.random.default_rng(SEED)
+    n_patients = max(1, n_rows // rows_per_patient)
+    patients = rng.integers(0, n_patients, n_rows).astype(str)
+    data = {PATIENT_ID_COLUMN: np.char.add("P", patients)}
+    for col, values in CATEGORIES.items():
+        # Espaços à volta como no CSV original, obrigando ao strip
+        labels = np.array([f" {v} " for v in values], dtype=object)
+        data[col] = labels[rng.integers(0, len(values), n_rows)]
+    for col, (low, high) in NUMERIC.items():
+        if isinstance(low, int):
+            data[col] = rng.integers(low, high, n_rows)
+        else:
+            data[col] = rng.uniform(low, high, n_rows).round(1)
+    # Diastólica sempre abaixo da sistólica (regra pa_sistolica_maior)
+    data["diastolic_bp"] = rng.integers(55, np.minimum(data["systolic_bp"] - 20, 120) + 1)
+    data["diagnosed_diabetes"] = rng.integers(0, 2, n_rows)
+
+    invalid = rng.permutation(n_rows)[: int(n_rows * invalid_fraction)]
+    inverted, out_of_range = invalid[::2], invalid[1::2]
+    data["diastolic_bp"][inverted] = data["systolic_bp"][inverted] + rng.integers(
+        0, 20, len(inverted)
+    )
+    data["bmi"][out_of_range] = 200.0
+    return pd.DataFrame(data)
+
+
+def synthetic_diabetic_encounters(n_rows: int):
+    """Encontros com o esquema de diabetic_data.csv (UCI), vários por paciente"""
+    import numpy as np
+    import pandas as pd
+
+    from src.ML.diabetic_data import AGE_BANDS, MEDICATIONS, encounter_dtypes
+
+    rng = np.random.default_rng(SEED)
+
+    def pick(values, p=None):
+        return np.asarray(values, dtype=object)[rng.choice(len(values), n_rows, p=p)]
+
+    diags = [str(c) for c in rng.integers(1, 1000, 700)] + ["250.01", "V57", "E885", "?"]
+    data = {
+        "encounter_id": rng.permutation(n_rows * 4)[:n_rows] + 10_000,
+        # ~1.4 encontros por paciente, como no dataset original
+        "patient_nbr": rng.integers(0, int(n_rows / 1.4), n_rows) + 100_000,
+        "race": pick(["Caucasian", "AfricanAmerican", "Hispanic", "Other", "?"]),
+        "gender": pick(["Female", "Male"]),
+        "age": pick(AGE_BANDS),
+        "weight": pick(["?", "[75-100)", "[50-75)"], p=[0.97, 0.02, 0.01]),
+        "admission_type_id": rng.integers(1, 9, n_rows),
+        "discharge_disposition_id": rng.integers(1, 30, n_rows),
+        "admission_source_id": rng.integers(1, 27, n_rows),
+        "time_in_hospital": rng.integers(1, 15, n_rows),
+        "payer_code": pick(["?", "MC", "HM", "SP", "BC"]),
+        "medical_specialty": pick(["?", "InternalMedicine", "Cardiology", "Surgery-General"]),
+        "num_lab_procedures": rng.integers(1, 133, n_rows),
+        "num_procedures": rng.integers(0, 7, n_rows),
+        "num_medications": rng.integers(1, 82, n_rows),
+        "number_outpatient": rng.poisson(0.4, n_rows),
+        "number_emergency": rng.poisson(0.2, n_rows),
+        "number_inpatient": rng.poisson(0.6, n_rows),
+        "diag_1": pick(diags),
+        "diag_2": pick(diags),
+        "diag_3": pick(diags),
+        "number_diagnoses": rng.integers(1, 17, n_rows),
+        "max_glu_serum": pick(["None", "Norm", ">200", ">300"], p=[0.95, 0.03, 0.01, 0.01]),
+        "A1Cresult": pick(["None", "Norm", ">7", ">8"], p=[0.83, 0.05, 0.04, 0.08]),
+    }
+    for col in MEDICATIONS:
+        data[col] = pick(["No", "Steady", "Up", "Down"], p=[0.85, 0.11, 0.02, 0.02])
+    data["change"] = pick(["No", "Ch"])
+    data["diabetesMed"] = pick(["No", "Yes"])
+    data["readmitted"] = pick(["NO", ">30", "<30"], p=[0.54, 0.35, 0.11])
+    return pd.DataFrame(data)[list(encounter_dtypes())]
+
+
+# ----------------------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------------------
+
+
+def bench_tratamento(args) -> dict:
+    from src.ML.diabetes_dataset import tratamento_dados
+
+    results = {}
+    for n in args.sizes:
+        df = synthetic_diabetes_dataset(n)
+        repeat = args.repeat if n <= 1_000_000 else 1
+        stats = measure(lambda df=df: tratamento_dados(df), repeat=repeat, warmup=0)
+        stats["rows_per_s"] = n / stats["median_s"]
+        results[str(n)] = stats
+        print(f"  tratamento_dados {n:>10,} linhas: {stats['median_s']:.3f} s")
+    return results
+
+
+def bench_diabetic_features(args) -> dict:
+    from src.ML.diabetic_data import (
+        build_features,
+        join_id_mappings,
+        load_features,
+        read_encounters,
+    )
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = Path(tmp) / "cache"
+        for n in args.encounter_sizes:
+            csv_path = Path(tmp) / f"diabetic_{n}.csv"
+            synthetic_diabetic_encounters(n).to_csv(csv_path, index=False)
+
+            csv = measure(
+                lambda p=csv_path: build_features(join_id_mappings(read_encounters(p))),
+                repeat=args.repeat,
+                warmup=0,
+            )
+            # Primeira chamada grava a cache; as medições leem só o Parquet
+            load_features(csv_path, cache_dir=cache_dir)
+            cached = measure(
+                lambda p=csv_path: load_features(p, cache_dir=cache_dir), repeat=args.repeat
+            )
+            for case, stats in (("csv", csv), ("cache", cached)):
+                stats["rows_per_s"] = n / stats["median_s"]
+                results[f"{case}_{n}"] = stats
+            print(f"  features {n:>10,} encontros: CSV {csv['median_s']:.3f} s, "
+                  f"cache {cached['median_s']:.3f} s")
+    return results
+
+
+def bench_feature_store(args) -> dict:
+    from src.db.feature_store import FeatureStore
+    from src.db.validation import PATIENT_ID_COLUMN
+
+    n_rows = 100_000
+    df = synthetic_diabetes_dataset(n_rows)
+    ids = df[PATIENT_ID_COLUMN].unique().tolist()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "features.db"
+        store = FeatureStore(path)
+        stats = measure(lambda: store.update(df), repeat=1, warmup=0)
+        stats["rows_per_s"] = n_rows / stats["median_s"]
+        results["update_100k_rows"] = stats
+
+        # Sem LRU (cache_size=0): cada leitura é uma consulta por chave primária
+        for name, cache_size in (("lookup_sqlite", 0), ("lookup_lru", len(ids))):
+            reader = FeatureStore(path, cache_size=cache_size)
+            for patient_id in ids:
+                reader.get(patient_id)
+            stats = measure(lambda r=reader: [r.get(p) for p in ids], repeat=args.repeat)
+            stats["us_per_lookup"] = stats["median_s"] / len(ids) * 1e6
+            results[name] = stats
+        print(f"  update {n_rows:,} linhas: {results['update_100k_rows']['median_s']:.2f} s; "
+              f"leitura: {results['lookup_sqlite']['us_per_lookup']:.1f} µs (SQLite), "
+              f"{results['lookup_lru']['us_per_lookup']:.1f} µs (LRU)")
+    return results
+
+
+def bench_ingest(args) -> dict:
+    from ingest_data import ingest_structured_data
+    from sqlalchemy import create_engine
+
+    from src.db.validation import QUARANTINE_TABLE, validate
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+
+        def run(csv_path):
+            engine = create_engine(args.pg_url or f"sqlite:///{Path(tmp) / 'bench.db'}")
+            with engine.begin() as conn:
+                conn.exec_driver_sql("DROP TABLE IF EXISTS saude_transacional")
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {QUARANTINE_TABLE}")
+            ingest_structured_data(csv_path, engine=engine)
+            engine.dispose()
+
+        for n in args.ingest_sizes:
+            csv_path = Path(tmp) / f"saude_{n}.csv"
+            synthetic_diabetes_dataset(n).to_csv(csv_path, index=False)
+            stats = measure(lambda csv_path=csv_path: run(csv_path), repeat=args.repeat, warmup=0)
+            stats["rows_per_s"] = n / stats["median_s"]
+            stats["backend"] = "postgresql" if args.pg_url else "sqlite"
+            results[str(n)] = stats
+
+            # Caso separado: parte das linhas vai para a quarentena
+            invalid_path = Path(tmp) / f"saude_{n}_invalidas.csv"
+            synthetic_diabetes_dataset(n, invalid_fraction=INVALID_FRACTION).to_csv(
+                invalid_path, index=False
+            )
+            dirty = measure(
+                lambda invalid_path=invalid_path: run(invalid_path), repeat=args.repeat, warmup=0
+            )
+            dirty["rows_per_s"] = n / dirty["median_s"]
+            dirty["invalid_fraction"] = INVALID_FRACTION
+            results[f"invalid_{n}"] = dirty
+
+            df = synthetic_diabetes_dataset(n)
+            check = measure(lambda df=df: validate(df), repeat=args.repeat)
+            check["rows_per_s"] = n / check["median_s"]
+            check["share_of_ingest"] = check["median_s"] / stats["median_s"]
+            results[f"validate_{n}"] = check
+            print(f"  ingest {n:>10,} linhas ({stats['backend']}): {stats['median_s']:.3f} s "
+                  f"(validação {check['median_s']:.3f} s, "
+                  f"{check['share_of_ingest']:.0%}); com {INVALID_FRACTION:.0%} inválidas: "
+                  f"{dirty['median_s']:.3f} s")
+    return results
+
+
+def _fake_tool_calling_llm():
+    """LLM falso: uma chamada à ferramenta seguida da resposta final"""
+    from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+    from langchain_core.messages import AIMessage
+
+    class ToolCallingFake(FakeMessagesListChatModel):
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+    return ToolCallingFake(responses=[
+        AIMessage(content="", tool_calls=[{
+            "name": "ClinicalCalculator", "args": {"__arg1": "imc:85,1.70"}, "id": "call_1",
+        }]),
+        AIMessage(content="O IMC é 29.4 (Sobrepeso)."),
+    ])
+
+
+def bench_agent_query(args) -> dict:
+    from langchain.tools import Tool
+
+    from src.agents.nesy_agent import MedicalDecisionAgent
+    from src.agents.tools import clinical_calculator
+
+    tools = [Tool(name="ClinicalCalculator", func=clinical_calculator, description="IMC")]
+    agent = MedicalDecisionAgent(
+        llm=_fake_tool_calling_llm(), tools=tools, db_postgres=None, vector_db=None, mongo_db=None
+    )
+
+    n = args.agent_queries
+
+    def run():
+        for _ in range(n):
+            agent.query("Qual o IMC de um paciente com 85kg e 1.70m?")
+
+    stats = measure(run, repeat=args.repeat)
+    stats["queries"] = n
+    stats["ms_per_query"] = stats["median_s"] / n * 1000
+    print(f"  agent.query (LLM falso): {stats['ms_per_query']:.2f} ms/pergunta")
+    return {"fake_llm": stats}
+
+
+def _tiny_model_dir(path: Path) -> str:
+    """Cria um modelo Gemma minúsculo com pesos aleatórios e tokenizer local"""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+    from transformers import GemmaConfig, GemmaForCausalLM, PreTrainedTokenizerFast
+
+    torch.manual_seed(SEED)
+    corpus = ["O doente apresenta hipertensão arterial e diabetes tipo 2."] * 10
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=512, special_tokens=["<pad>", "<eos>", "<unk>"])
+    tokenizer.train_from_iterator(corpus, trainer)
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        pad_token="<pad>",
+        eos_token="<eos>",
+        unk_token="<unk>",
+        model_input_names=["input_ids", "attention_mask"],
+    ).save_pretrained(path)
+
+    config = GemmaConfig(
+        vocab_size=tokenizer.get_vocab_size(),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=1,
+        head_dim=16,
+        max_position_embeddings=512,
+        pad_token_id=0,
+        eos_token_id=1,
+    )
+    GemmaForCausalLM(config).save_pretrained(path)
+    return str(path)
+
+
+def bench_hf_generate(args) -> dict:
+    from src.llm.medgemma import MedGemmaHuggingFace
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        model = MedGemmaHuggingFace(
+            model_name=_tiny_model_dir(Path(tmp)),
+            device="cpu",
+            use_quantization=False,
+            use_snapshot=False,
+        )
+        prompt = "O doente apresenta hipertensão arterial e diabetes tipo 2. " * 4
+        for max_new_tokens in (16, 64):
+            stats = measure(
+                lambda m=max_new_tokens: model.generate(prompt, max_new_tokens=m, do_sample=False),
+                repeat=args.repeat,
+            )
+            stats["tokens_per_s"] = max_new_tokens / stats["median_s"]
+            results[f"max_new_tokens={max_new_tokens}"] = stats
+            print(f"  generate {max_new_tokens:>3} tokens: {stats['tokens_per_s']:.1f} tokens/s")
+
+        # 32 prompts de comprimentos variados: ciclo de generate vs lotes dinâmicos
+        prompts = [prompt[: 40 + 7 * i] for i in range(32)]
+        loop = measure(
+            lambda: [model.generate(p, max_new_tokens=32, do_sample=False) for p in prompts],
+            repeat=max(1, args.repeat // 2),
+        )
+        batched = measure(
+            lambda: _run_batch_job(model, prompts), repeat=max(1, args.repeat // 2)
+        )
+        loop["tokens_per_s"] = len(prompts) * 32 / loop["median_s"]
+        batched["tokens_per_s"] = len(prompts) * 32 / batched["median_s"]
+        results["loop_32_prompts"] = loop
+        results["batch_32_prompts"] = batched
+        print(f"  32 prompts em ciclo: {loop['tokens_per_s']:.1f} tokens/s, em lote: "
+              f"{batched['tokens_per_s']:.1f} tokens/s "
+              f"({loop['median_s'] / batched['median_s']:.1f}x)")
+    return results
+
+
+def bench_llm_coalesce(args) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from src.llm.medgemma import MedGemmaLangChain
+
+    results = {}
+    prompt = "O doente apresenta hipertensão arterial e diabetes tipo 2. "
+    prompts = [prompt * (1 + i % 3) for i in range(32)]
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = _tiny_model_dir(Path(tmp))
+        for window_ms in (0, 10):
+            llm = MedGemmaLangChain(
+                model_name=model_dir,
+                device="cpu",
+                use_quantization=False,
+                use_snapshot=False,
+                batch_window_ms=window_ms,
+                max_batch_size=8,
+                max_new_tokens=32,
+                do_sample=False,
+            )
+            for concurrency in (1, 4, 8):
+
+                def run(n=concurrency, llm=llm):
+                    with ThreadPoolExecutor(max_workers=n) as executor:
+                        list(executor.map(llm.invoke, prompts))
+
+                stats = measure(run, repeat=max(1, args.repeat // 2))
+                stats["tokens_per_s"] = len(prompts) * 32 / stats["median_s"]
+                results[f"window={window_ms}ms/concurrency={concurrency}"] = stats
+                print(f"  janela {window_ms:>2} ms, {concurrency} sessões: "
+                      f"{stats['tokens_per_s']:.1f} tokens/s")
+    return results
+
+
+def bench_hf_load(args) -> dict:
+    from src.llm.medgemma import MedGemmaHuggingFace
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = _tiny_model_dir(Path(tmp) / "model")
+        snapshot_dir = str(Path(tmp) / "snapshots")
+
+        def load(**kwargs):
+            return MedGemmaHuggingFace(
+                model_name=model_dir, device="cpu", use_quantization=False, **kwargs
+            )
+
+        results["original"] = measure(lambda: load(use_snapshot=False), repeat=args.repeat)
+        # Primeiro carregamento grava o snapshot; os seguintes carregam-no
+        load(snapshot_dir=snapshot_dir)
+        results["snapshot"] = measure(
+            lambda: load(snapshot_dir=snapshot_dir), repeat=args.repeat
+        )
+        for name, stats in results.items():
+            print(f"  carregar do {name:<9}: {stats['median_s'] * 1000:.1f} ms")
+    return results
+
+
+def _run_batch_job(model, prompts: list[str]) -> None:
+    from src.llm.batch import BatchInferenceJob, BatchItem
+
+    class _Discard:
+        def write(self, rows):
+            pass
+
+    job = BatchInferenceJob(
+        model, _Discard(), max_new_tokens=32, generation_kwargs={"do_sample": False}
+    )
+    job.run(BatchItem(str(i), p) for i, p in enumerate(prompts))
+
+
+BENCHMARKS: dict[str, Callable] = {
+    "hf_generate": bench_hf_generate,
+    "llm_coalesce": bench_llm_coalesce,
+    "hf_load": bench_hf_load,
+    "agent_query": bench_agent_query,
+    "ingest": bench_ingest,
+    "tratamento": bench_tratamento,
+    "diabetic_features": bench_diabetic_features,
+    "feature_store": bench_feature_store,
+}
+
+
+# ----------------------------------------------------------------------
+# Resultados
+# ----------------------------------------------------------------------
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Mostra a variação do tempo mediano face a uma execução anterior"""
+    print(f"\nComparação com {baseline['commit']} ({baseline['timestamp']}):")
+    for bench, cases in current["results"].items():
+        for case, stats in cases.items():
+            old = baseline["results"].get(bench, {}).get(case)
+            if not isinstance(stats, dict) or not isinstance(old, dict) or "median_s" not in old:
+                continue
+            delta = (stats["median_s"] - old["median_s"]) / old["median_s"] * 100
+            print(f"  {bench}/{case}: {old['median_s']:.4f} s → {stats['median_s']:.4f} s "
+                  f"({delta:+.1f}%)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks HELTH")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Subconjunto")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições por medição")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+        help="Linhas para tratamento_dados (até 10M)",
+    )
+    parser.add_argument("--ingest-sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument(
+        "--encounter-sizes", type=int, nargs="+", default=[100_000, 1_000_000],
+        help="Encontros para diabetic_features",
+    )
+    parser.add_argument("--agent-queries", type=int, default=20, help="Perguntas por medição")
+    parser.add_argument("--pg-url", help="PostgreSQL para o benchmark de ingestão")
+    parser.add_argument("--output", type=Path, help="Ficheiro JSON de resultados")
+    parser.add_argument("--compare", type=Path, help="Resultados anteriores para comparar")
+    args = parser.parse_args()
+
+    run = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "results": {},
+    }
+
+    for name in args.only or BENCHMARKS:
+        print(f"[{name}]")
+        try:
+            run["results"][name] = BENCHMARKS[name](args)
+        except ImportError as e:
+            print(f"  ignorado: dependência em falta ({e.name})")
+            run["results"][name] = {"skipped": f"dependência em falta: {e.name}"}
+
+    stamp = run["timestamp"].replace(":", "")
+    output = args.output or RESULTS_DIR / f"{stamp}-{run['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run, indent=2, ensure_ascii=False))
+    print(f"\nResultados em {output}")
+
+    if args.compare:
+        compare(run, json.loads(args.compare.read_text()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
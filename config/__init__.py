@@ -1,19 +1,55 @@
 """
 Configurações do sistema HELTH
+
+Carregamento preguiçoso (PEP 562): os submódulos só são importados quando um
+dos seus símbolos é acedido.
 """
 
-from .medgemma_config import (
-    DEV_CONFIG,
-    DEV_OLLAMA_CONFIG,
-    PROD_CLOUD_CONFIG,
-    PROD_LOCAL_CONFIG,
-    MedGemmaConfig,
-)
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .medgemma_config import (
+        DEV_CONFIG,
+        DEV_OLLAMA_CONFIG,
+        GENERATION_PROFILES,
+        PROD_CLOUD_CONFIG,
+        PROD_LOCAL_CONFIG,
+        GenerationProfile,
+        MedGemmaConfig,
+    )
+
+# Nome público -> submódulo onde está definido
+_LAZY_ATTRS = {
+    "MedGemmaConfig": ".medgemma_config",
+    "GenerationProfile": ".medgemma_config",
+    "GENERATION_PROFILES": ".medgemma_config",
+    "DEV_CONFIG": ".medgemma_config",
+    "DEV_OLLAMA_CONFIG": ".medgemma_config",
+    "PROD_LOCAL_CONFIG": ".medgemma_config",
+    "PROD_CLOUD_CONFIG": ".medgemma_config",
+}
 
 __all__ = [
     "MedGemmaConfig",
+    "GenerationProfile",
+    "GENERATION_PROFILES",
     "DEV_CONFIG",
     "DEV_OLLAMA_CONFIG",
     "PROD_LOCAL_CONFIG",
     "PROD_CLOUD_CONFIG",
 ]
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value  # acessos seguintes não passam por __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
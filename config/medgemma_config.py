@@ -4,16 +4,46 @@ Adaptar conforme necessidades e recursos disponíveis
 """
 
 import os
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
 from typing import Literal
 
 
+@dataclass(frozen=True)
+class GenerationProfile:
+    """
+    Parâmetros de geração, no vocabulário comum a todos os providers
+
+    Cada provider traduz para os seus nomes (ex: Ollama `num_predict`, Vertex
+    `max_output_tokens`); `do_sample=False` é geração determinística (greedy).
+    """
+
+    max_new_tokens: int = 512
+    temperature: float = 0.7
+    top_p: float = 0.9
+    top_k: int = 50
+    do_sample: bool = True
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# Perfis nomeados; "default" é construído a partir dos campos de MedGemmaConfig
+GENERATION_PROFILES: dict[str, GenerationProfile] = {
+    # Respostas curtas e determinísticas (triagem, frases sobre resultados de ferramentas)
+    "fast-triage": GenerationProfile(max_new_tokens=128, temperature=0.0, do_sample=False),
+    # Explicações longas (ex: justificar uma recomendação)
+    "detailed": GenerationProfile(max_new_tokens=1024, temperature=0.5),
+}
+
+
 @dataclass
 class MedGemmaConfig:
     """Configuração para deployment do MedGemma"""
 
-    # Provider: "huggingface", "ollama", "vertexai"
-    provider: Literal["huggingface", "ollama", "vertexai"] = "huggingface"
+    # Provider: "huggingface", "ollama", "ollama-pool", "local-server", "vertexai"
+    provider: Literal[
+        "huggingface", "ollama", "ollama-pool", "local-server", "vertexai"
+    ] = "huggingface"
 
     # Modelo (para HuggingFace)
     model_size: Literal["2b", "7b"] = "2b"  # 2B mais rápido, 7B mais preciso
@@ -24,12 +54,28 @@ class MedGemmaConfig:
     # Quantização (reduz uso de memória)
     use_quantization: bool = True  # Recomendado se GPU <16GB
 
-    # Parâmetros de geração
+    # Snapshot dos pesos já convertidos (arranques seguintes em segundos)
+    use_snapshot: bool = True
+    snapshot_dir: str = ""  # "" = ~/.cache/helth/medgemma
+
+    # Chamadas concorrentes juntas num lote (HuggingFace): janela e tamanho máximo
+    # 0 = cada chamada gera sozinha (default: a janela atrasa pedidos isolados)
+    batch_window_ms: float = 0.0
+    max_batch_size: int = 8
+
+    # Parâmetros de geração (perfil "default")
     temperature: float = 0.7  # 0.0-1.0 (menor = mais conservador)
-    max_length: int = 2048
+    max_length: int = 2048  # Contexto: prompt + tokens gerados
+    max_new_tokens: int = 512
     top_p: float = 0.9
     top_k: int = 50
 
+    # Perfil usado quando a pergunta não indica outro ("default", "fast-triage", ...)
+    generation_profile: str = "default"
+    profiles: dict[str, GenerationProfile] = field(
+        default_factory=lambda: dict(GENERATION_PROFILES)
+    )
+
     # Vertex AI (se provider="vertexai")
     gcp_project_id: str = os.getenv("GOOGLE_CLOUD_PROJECT", "")
     gcp_location: str = "us-central1"
@@ -38,6 +84,64 @@ class MedGemmaConfig:
     ollama_base_url: str = "http://localhost:11434"
     ollama_model_name: str = "medgemma"
 
+    # Réplicas Ollama (se provider="ollama-pool")
+    ollama_base_urls: list[str] = field(default_factory=list)
+
+    # Servidor local do modelo (se provider="local-server"): http://... ou unix:///...
+    local_server_url: str = "http://127.0.0.1:8765"
+
+    @classmethod
+    def from_env(cls) -> "MedGemmaConfig":
+        """Cria configuração a partir das variáveis de ambiente (ver .env.example)"""
+        defaults = cls()
+        return cls(
+            provider=os.getenv("MEDGEMMA_PROVIDER", defaults.provider),
+            model_size=os.getenv("MEDGEMMA_MODEL_SIZE", defaults.model_size),
+            device=os.getenv("MEDGEMMA_DEVICE", defaults.device),
+            use_quantization=os.getenv(
+                "MEDGEMMA_QUANTIZATION", str(defaults.use_quantization)
+            ).lower() == "true",
+            use_snapshot=os.getenv(
+                "MEDGEMMA_SNAPSHOT", str(defaults.use_snapshot)
+            ).lower() == "true",
+            snapshot_dir=os.getenv("MEDGEMMA_SNAPSHOT_DIR", defaults.snapshot_dir),
+            batch_window_ms=float(
+                os.getenv("MEDGEMMA_BATCH_WINDOW_MS", defaults.batch_window_ms)
+            ),
+            max_batch_size=int(os.getenv("MEDGEMMA_MAX_BATCH_SIZE", defaults.max_batch_size)),
+            temperature=float(os.getenv("MEDGEMMA_TEMPERATURE", defaults.temperature)),
+            max_new_tokens=int(os.getenv("MEDGEMMA_MAX_NEW_TOKENS", defaults.max_new_tokens)),
+            generation_profile=os.getenv("MEDGEMMA_PROFILE", defaults.generation_profile),
+            gcp_location=os.getenv("GCP_LOCATION", defaults.gcp_location),
+            ollama_base_url=os.getenv("OLLAMA_BASE_URL", defaults.ollama_base_url),
+            ollama_model_name=os.getenv("OLLAMA_MODEL_NAME", defaults.ollama_model_name),
+            ollama_base_urls=[
+                url.strip() for url in os.getenv("OLLAMA_BASE_URLS", "").split(",") if url.strip()
+            ],
+            local_server_url=os.getenv("LOCAL_MODEL_SERVER_URL", defaults.local_server_url),
+        )
+
+    def profile(self, name: str | None = None) -> GenerationProfile:
+        """Perfil de geração `name` (default: `generation_profile`)"""
+        name = name or self.generation_profile
+        if name == "default":
+            return GenerationProfile(
+                max_new_tokens=self.max_new_tokens,
+                temperature=self.temperature,
+                top_p=self.top_p,
+                top_k=self.top_k,
+            )
+        if name not in self.profiles:
+            raise ValueError(
+                f"Perfil de geração desconhecido: {name}. "
+                f"Disponíveis: {', '.join(['default', *self.profiles])}"
+            )
+        return self.profiles[name]
+
+    def all_profiles(self) -> dict[str, GenerationProfile]:
+        """Todos os perfis, incluindo "default" (para o agente escolher por pergunta)"""
+        return {"default": self.profile("default"), **self.profiles}
+
     def to_dict(self) -> dict:
         """Converte para dicionário"""
         return {
@@ -45,8 +149,13 @@ class MedGemmaConfig:
             "model_size": self.model_size,
             "device": self.device,
             "use_quantization": self.use_quantization,
+            "use_snapshot": self.use_snapshot,
+            "batch_window_ms": self.batch_window_ms,
+            "max_batch_size": self.max_batch_size,
             "temperature": self.temperature,
             "max_length": self.max_length,
+            "max_new_tokens": self.max_new_tokens,
+            "generation_profile": self.generation_profile,
             "top_p": self.top_p,
             "top_k": self.top_k,
         }
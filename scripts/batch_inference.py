@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Inferência MedGemma em lote (offline) sobre registos de PostgreSQL, MongoDB ou JSONL
+
+Uso:
+    # JSONL → JSONL (uma linha {"id": ..., "prompt": ...} por registo)
+    python scripts/batch_inference.py --source jsonl:registos.jsonl --output jsonl:resumos.jsonl
+
+    # PostgreSQL → PostgreSQL (a consulta devolve id, prompt)
+    python scripts/batch_inference.py --source postgres \\
+        --sql "SELECT patient_id, notas FROM registos" --output postgres:resumos_llm \\
+        --template "Resume o seguinte registo clínico em 3 frases:\\n{prompt}"
+
+    # MongoDB → MongoDB
+    python scripts/batch_inference.py --source mongo:logs_saude --prompt-field texto \\
+        --output mongo:resumos_llm
+
+Interrompido, o job retoma do checkpoint (por omissão <output>.ckpt). Com
+--compare-loop N mede também `generate` prompt a prompt em N registos.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from config import MedGemmaConfig  # noqa: E402
+from src.llm.batch import (  # noqa: E402
+    BatchInferenceJob,
+    Checkpoint,
+    JsonlSink,
+    MongoSink,
+    PostgresSink,
+    read_jsonl,
+    read_mongo,
+    read_postgres,
+)
+
+load_dotenv()
+
+
+def _pg_engine():
+    from sqlalchemy import create_engine
+
+    return create_engine(
+        f"postgresql+psycopg://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
+        f"@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}"
+        f"/{os.getenv('POSTGRES_DB')}"
+    )
+
+
+def _mongo_db():
+    from pymongo import MongoClient
+
+    client = MongoClient(
+        host=os.getenv("MONGO_HOST", "localhost"), port=int(os.getenv("MONGO_PORT", "27017"))
+    )
+    return client[os.getenv("MONGO_DB", "helth_db")]
+
+
+def build_source(args):
+    kind, _, target = args.source.partition(":")
+    if kind == "jsonl":
+        return read_jsonl(target, args.id_field or "id", args.prompt_field)
+    if kind == "postgres":
+        if not args.sql:
+            raise SystemExit("--sql é obrigatório com --source postgres")
+        return read_postgres(_pg_engine(), args.sql)
+    if kind == "mongo":
+        return read_mongo(_mongo_db()[target], None, args.id_field or "_id", args.prompt_field)
+    raise SystemExit(f"Fonte desconhecida: {args.source}")
+
+
+def build_sink(args):
+    kind, _, target = args.output.partition(":")
+    if kind == "jsonl":
+        return JsonlSink(target)
+    if kind == "postgres":
+        return PostgresSink(_pg_engine(), target)
+    if kind == "mongo":
+        return MongoSink(_mongo_db()[target])
+    raise SystemExit(f"Destino desconhecido: {args.output}")
+
+
+def compare_loop(model, job: BatchInferenceJob, items, n: int) -> float:
+    """Tokens/s de `generate` chamado prompt a prompt (referência)"""
+    prompts = [job.template.format(prompt=item.prompt) for item in items[:n]]
+    start = time.perf_counter()
+    outputs = [
+        model.generate(p, max_new_tokens=job.max_new_tokens, **job.generation_kwargs)
+        for p in prompts
+    ]
+    elapsed = time.perf_counter() - start
+    return sum(job.count_tokens(outputs, add_special_tokens=False)) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inferência MedGemma em lote")
+    parser.add_argument("--source", required=True, help="jsonl:<ficheiro>, postgres, mongo:<col>")
+    parser.add_argument("--output", required=True, help="jsonl:<ficheiro>, postgres:<tabela>, "
+                        "mongo:<coleção>")
+    parser.add_argument("--sql", help="Consulta (id, prompt) para --source postgres")
+    parser.add_argument("--id-field", help="Campo do id (jsonl: id, mongo: _id)")
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--template", default="{prompt}", help="Formato do prompt")
+    parser.add_argument("--checkpoint", type=Path, help="Default: <output>.ckpt")
+    parser.add_argument("--model", help="Modelo HuggingFace ou diretório (default: config)")
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-batch-tokens", type=int, help="Default: estimado pela memória")
+    parser.add_argument("--flush-every", type=int, default=256)
+    parser.add_argument("--greedy", action="store_true", help="Geração determinística")
+    parser.add_argument("--compare-loop", type=int, default=0, metavar="N")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    from src.llm.medgemma import MedGemmaHuggingFace
+
+    config = MedGemmaConfig.from_env()
+    model = MedGemmaHuggingFace(
+        model_name=args.model or f"google/medgemma-{config.model_size}",
+        device=config.device,
+        temperature=config.temperature,
+        use_quantization=config.use_quantization,
+        use_snapshot=config.use_snapshot,
+        snapshot_dir=config.snapshot_dir or None,
+    )
+
+    checkpoint_path = args.checkpoint or Path(f"{args.output.partition(':')[2]}.ckpt")
+    job = BatchInferenceJob(
+        model,
+        build_sink(args),
+        Checkpoint(checkpoint_path),
+        max_new_tokens=args.max_new_tokens,
+        max_batch_size=args.max_batch_size,
+        max_batch_tokens=args.max_batch_tokens,
+        flush_every=args.flush_every,
+        template=args.template,
+        generation_kwargs={"do_sample": False} if args.greedy else None,
+    )
+    items = list(build_source(args))
+
+    stats = job.run(
+        items,
+        progress=lambda s: logging.info(
+            f"{s.prompts}/{len(items) - s.skipped} prompts, {s.tokens_per_second:.1f} tokens/s"
+        ),
+    )
+    print(stats.summary())
+
+    if args.compare_loop:
+        loop = compare_loop(model, job, items, args.compare_loop)
+        print(f"generate em ciclo: {loop:.1f} tokens/s "
+              f"(lote: {stats.tokens_per_second / loop:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Feature store por paciente (src.db.feature_store)
+
+Uso:
+    # Backfill a partir de saude_transacional (depois de mudar FEATURES)
+    python scripts/feature_store.py --rebuild
+
+    # Features de pacientes
+    python scripts/feature_store.py --patient P001 P002
+
+A ingestão (`ingest_structured_data(..., feature_store=store)`) mantém as
+features atualizadas sem rebuild.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from src.db.feature_store import FeatureStore  # noqa: E402
+
+load_dotenv()
+
+
+def _pg_engine():
+    from sqlalchemy import create_engine
+
+    return create_engine(
+        f"postgresql+psycopg://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
+        f"@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}"
+        f"/{os.getenv('POSTGRES_DB')}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature store por paciente")
+    parser.add_argument("--path", default=os.getenv("FEATURE_STORE_PATH", "features_pacientes.db"))
+    parser.add_argument("--table", default="saude_transacional")
+    parser.add_argument("--id-column", default="patient_id")
+    parser.add_argument("--order-column", help="Ordem dos registos de cada paciente (ex: data)")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcular a partir da tabela")
+    parser.add_argument("--patient", nargs="*", default=[], metavar="ID")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    store = FeatureStore(args.path, id_column=args.id_column, order_column=args.order_column)
+    if args.rebuild:
+        store.rebuild(_pg_engine(), table=args.table)
+    elif not args.patient:
+        parser.error("Indicar --rebuild e/ou --patient")
+
+    for patient_id in args.patient:
+        print(f"{patient_id}: {json.dumps(store.get(patient_id), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
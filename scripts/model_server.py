@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Servidor local do MedGemma (provider "local-server")
+
+Uso:
+    # HTTP local, 2 workers a partilhar os pesos em memória
+    python scripts/model_server.py --device cpu --workers 2
+
+    # Unix socket (clientes: LOCAL_MODEL_SERVER_URL=unix:///tmp/helth-llm.sock)
+    python scripts/model_server.py --url unix:///tmp/helth-llm.sock
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from config import MedGemmaConfig  # noqa: E402
+
+load_dotenv()
+
+
+def main():
+    config = MedGemmaConfig.from_env()
+
+    parser = argparse.ArgumentParser(description="Servidor local do MedGemma")
+    parser.add_argument("--url", default=config.local_server_url,
+                        help="http://host:porta ou unix:///caminho")
+    parser.add_argument("--model", help="Modelo HuggingFace ou diretório (default: config)")
+    parser.add_argument("--device", default=config.device)
+    parser.add_argument("--workers", type=int, default=1, help="Processos (pesos partilhados)")
+    parser.add_argument("--max-concurrency", type=int, default=1,
+                        help="Gerações simultâneas por worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(message)s")
+
+    from src.llm.medgemma import MedGemmaHuggingFace
+    from src.llm.model_server import serve
+
+    model = MedGemmaHuggingFace(
+        model_name=args.model or f"google/medgemma-{config.model_size}",
+        device=args.device,
+        max_length=config.max_length,
+        temperature=config.temperature,
+        use_quantization=config.use_quantization,
+        use_snapshot=config.use_snapshot,
+        snapshot_dir=config.snapshot_dir or None,
+    )
+    serve(model, args.url, workers=args.workers, max_concurrency=args.max_concurrency)
+
+
+if __name__ == "__main__":
+    main()
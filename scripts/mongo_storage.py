@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Layout, retenção e rollups das coleções temporais do MongoDB
+
+Uso:
+    # Criar coleções/índices (idempotente; correr em cada deploy)
+    python scripts/mongo_storage.py --setup
+
+    # Converter um logs_saude antigo (coleção normal) em time-series
+    python scripts/mongo_storage.py --migrate
+
+    # Rollups: uma passagem, ou em ciclo a cada 15 min
+    python scripts/mongo_storage.py --rollup
+    python scripts/mongo_storage.py --rollup --every 900
+
+Retenção: LOGS_TTL_DAYS (default 90) e NEWS_TTL_DAYS (default: sem expiração).
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from src.db.mongo_storage import (  # noqa: E402
+    default_layouts,
+    ensure_layouts,
+    migrate_to_timeseries,
+    run_rollups,
+)
+
+load_dotenv()
+
+
+def _mongo_db():
+    from pymongo import MongoClient
+
+    client = MongoClient(
+        host=os.getenv("MONGO_HOST", "localhost"), port=int(os.getenv("MONGO_PORT", "27017"))
+    )
+    return client[os.getenv("MONGO_DB", "helth_db")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coleções temporais do MongoDB")
+    parser.add_argument("--setup", action="store_true", help="Criar coleções e índices")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Converter coleções normais em time-series")
+    parser.add_argument("--rollup", action="store_true", help="Atualizar os resumos")
+    parser.add_argument("--every", type=float, help="Com --rollup: segundos entre passagens")
+    args = parser.parse_args()
+    if not (args.setup or args.migrate or args.rollup):
+        parser.error("Indicar --setup, --migrate e/ou --rollup")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    db = _mongo_db()
+
+    if args.migrate:
+        for layout in default_layouts():
+            if layout.timeseries:
+                print(f"{layout.name}: {migrate_to_timeseries(db, layout)} documentos migrados")
+    if args.setup or args.migrate:
+        for name, kind in ensure_layouts(db).items():
+            print(f"{name}: {kind}")
+
+    while args.rollup:
+        run_rollups(db)
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
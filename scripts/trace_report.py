@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Relatório de latência por etapa (p50/p95/p99) a partir de um ficheiro de spans
+
+Uso:
+    TRACE_JSONL_PATH=traces.jsonl streamlit run app.py   # recolher spans
+    python scripts/trace_report.py traces.jsonl
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.observability.tracing import format_summary, load_spans, summarize  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de latência por etapa")
+    parser.add_argument("path", help="Ficheiro JSONL com spans (TRACE_JSONL_PATH)")
+    parser.add_argument("--json", action="store_true", help="Output em JSON")
+    args = parser.parse_args()
+
+    report = summarize(load_spans(args.path))
+    print(json.dumps(report, indent=2) if args.json else format_summary(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Sincronização incremental de PostgreSQL/MongoDB para o ChromaDB
+
+Uso:
+    # Serviço: saude_transacional e logs_saude, uma passagem a cada 2 s
+    python scripts/vector_sync.py --postgres saude_transacional --mongo logs_saude
+
+    # Uma passagem (ex: cron) com reconciliação de remoções no fim
+    python scripts/vector_sync.py --postgres saude_transacional --once --reconcile
+
+As marcas ficam em --state (por omissão vector_sync.json): reiniciado, o
+serviço continua de onde parou. Métricas Prometheus com METRICS_PORT.
+
+Coleções com layout em src.db.mongo_storage (logs_saude) seguem-no: polling
+por (timestamp, patient_id) nas time-series, sem change streams. Com TTL, as
+expirações só saem do ChromaDB na reconciliação: sem --reconcile-every, o
+serviço reconcilia de hora a hora.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from src.agents.tools import RAG_COLLECTION  # noqa: E402
+from src.db.dedup import NearDuplicateIndex, dedup_path  # noqa: E402
+from src.db.mongo_storage import default_layouts  # noqa: E402
+from src.db.validation import RECORD_ID_COLUMN  # noqa: E402
+from src.db.vector_sync import MongoSource, PostgresSource, SyncState, VectorSync  # noqa: E402
+
+load_dotenv()
+
+# Reconciliação por omissão com coleções com TTL (segundos)
+TTL_RECONCILE_SECONDS = 3600
+
+
+def _pg_engine():
+    from sqlalchemy import create_engine
+
+    return create_engine(
+        f"postgresql+psycopg://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
+        f"@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}"
+        f"/{os.getenv('POSTGRES_DB')}"
+    )
+
+
+def _mongo_db():
+    from pymongo import MongoClient
+
+    client = MongoClient(
+        host=os.getenv("MONGO_HOST", "localhost"), port=int(os.getenv("MONGO_PORT", "27017"))
+    )
+    return client[os.getenv("MONGO_DB", "helth_db")]
+
+
+def _collection(name: str):
+    import chromadb
+
+    client = chromadb.HttpClient(
+        host=os.getenv("CHROMA_HOST", "localhost"), port=int(os.getenv("CHROMA_PORT", "8000"))
+    )
+    return client.get_or_create_collection(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincronização incremental para o ChromaDB")
+    parser.add_argument("--postgres", nargs="*", default=[], metavar="TABELA")
+    parser.add_argument("--id-column", default=RECORD_ID_COLUMN, help="Id único (PostgreSQL)")
+    parser.add_argument("--change-expression", default=PostgresSource.XMIN,
+                        help="Marca numérica (default: xmin)")
+    parser.add_argument("--deleted-column", help="Coluna de remoção lógica (PostgreSQL)")
+    parser.add_argument("--mongo", nargs="*", default=[], metavar="COLEÇÃO")
+    parser.add_argument("--text-field", help="Campo de texto (MongoDB; default: todos)")
+    parser.add_argument("--updated-field", help="Campo de atualização para polling (MongoDB)")
+    parser.add_argument("--no-change-streams", action="store_true",
+                        help="Usar sempre polling no MongoDB")
+    parser.add_argument("--collection", default=RAG_COLLECTION, help="Coleção ChromaDB")
+    parser.add_argument("--state", type=Path, default=Path("vector_sync.json"))
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--dedup-threshold", type=float, default=0.85,
+                        help="Semelhança a partir da qual um documento é duplicado")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Não filtrar quase-duplicados antes dos embeddings")
+    parser.add_argument("--interval", type=float, default=2.0, help="Segundos entre passagens")
+    parser.add_argument("--reconcile-every", type=int,
+                        help="Passagens entre reconciliações de remoções (0 = nunca; "
+                             "default: de hora a hora com coleções com TTL, senão nunca)")
+    parser.add_argument("--once", action="store_true", help="Uma passagem e sair")
+    parser.add_argument("--reconcile", action="store_true", help="Com --once: reconciliar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    sources = []
+    ttl_collections = []
+    if args.postgres:
+        engine = _pg_engine()
+        sources += [
+            PostgresSource(
+                engine,
+                table,
+                id_column=args.id_column,
+                change_expression=args.change_expression,
+                deleted_column=args.deleted_column,
+            )
+            for table in args.postgres
+        ]
+    if args.mongo:
+        db = _mongo_db()
+        layouts = {layout.name: layout for layout in default_layouts()}
+        for name in args.mongo:
+            options = {"text_field": args.text_field}
+            if args.updated_field:
+                options["updated_field"] = args.updated_field
+            if args.no_change_streams:
+                options["use_change_stream"] = False
+            if name not in layouts:
+                sources.append(MongoSource(db[name], **options))
+                continue
+            sources.append(MongoSource.for_layout(db[name], layouts[name], **options))
+            if layouts[name].ttl_days:
+                ttl_collections.append(name)
+    if not sources:
+        parser.error("Indicar pelo menos uma fonte (--postgres e/ou --mongo)")
+
+    if port := os.getenv("METRICS_PORT"):
+        from src.observability import start_metrics_server
+
+        start_metrics_server(int(port))
+
+    dedup = None
+    if not args.no_dedup:
+        dedup = NearDuplicateIndex.load_or_create(
+            dedup_path(args.collection), threshold=args.dedup_threshold, name="rag"
+        )
+    sync = VectorSync(
+        _collection(args.collection),
+        sources,
+        SyncState(args.state),
+        batch_size=args.batch_size,
+        dedup=dedup,
+    )
+    reconcile_every = args.reconcile_every
+    if reconcile_every is None:
+        reconcile_every = 0
+        if ttl_collections:
+            # Sem isto, documentos expirados ficariam no ChromaDB para sempre
+            reconcile_every = max(1, int(TTL_RECONCILE_SECONDS / args.interval))
+            logging.info(
+                f"TTL em {', '.join(ttl_collections)}: reconciliação a cada "
+                f"{reconcile_every} passagens"
+            )
+    if not args.once:
+        sync.run_forever(interval=args.interval, reconcile_every=reconcile_every)
+        return
+
+    for name, counts in sync.run_once().items():
+        print(f"{name}: {counts['upserts']} upserts, {counts['deletes']} remoções")
+    if args.reconcile:
+        for source in sources:
+            print(f"{source.name}: {sync.reconcile(source)} remoções (reconciliação)")
+
+
+if __name__ == "__main__":
+    main()
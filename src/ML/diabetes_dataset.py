@@ -1,8 +1,19 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+# Dictionary mapping for categorical columns (também usado pela feature store)
+CATEGORY_MAPPINGS = {
+    'gender': {'Male': 0, 'Female': 1, 'Other': 2},
+    'ethnicity': {'White': 0, 'Hispanic': 1, 'Black': 2, 'Asian': 3, 'Other': 4},
+    'education_level': {'No formal': 0, 'Highschool': 1, 'Graduate': 2, 'Postgraduate': 3},
+    'income_level': {'Low': 0, 'Low-Middle': 1, 'Upper-Middle': 2, 'High': 3},
+    'employment_status': {'Employed': 0, 'Unemployed': 1, 'Retired': 2, 'Student': 3},
+    'smoking_status': {'Never': 0, 'Former': 1, 'Current': 2},
+    'diabetes_stage': {'No Diabetes': 0, 'Pre-Diabetes': 1, 'Type 1': 2, 'Type 2': 3, 'Gestational': 4}
+}
+
 
 def load_diabetes_dataset():
+    # pandas só é importado quando o dataset é efetivamente carregado
+    import pandas as pd
+
     # Load the diabetes dataset from a CSV file
     df = pd.read_csv('/Users/afonso/sns24/data/diabetes_dataset.csv')
     
@@ -15,19 +26,8 @@ def load_diabetes_dataset():
 def tratamento_dados(df):
     df = df.copy()
 
-    # Dictionary mapping for categorical columns
-    mappings = {
-        'gender': {'Male': 0, 'Female': 1, 'Other': 2},
-        'ethnicity': {'White': 0, 'Hispanic': 1, 'Black': 2, 'Asian': 3, 'Other': 4},
-        'education_level': {'No formal': 0, 'Highschool': 1, 'Graduate': 2, 'Postgraduate': 3},
-        'income_level': {'Low': 0, 'Low-Middle': 1, 'Upper-Middle': 2, 'High': 3},
-        'employment_status': {'Employed': 0, 'Unemployed': 1, 'Retired': 2, 'Student': 3},
-        'smoking_status': {'Never': 0, 'Former': 1, 'Current': 2},
-        'diabetes_stage': {'No Diabetes': 0, 'Pre-Diabetes': 1, 'Type 1': 2, 'Type 2': 3, 'Gestational': 4}
-    }
-
     # Apply mappings to categorical columns
-    for col, mapping in mappings.items():
+    for col, mapping in CATEGORY_MAPPINGS.items():
         # Strip whitespace from values before mapping
         df[col] = df[col].str.strip()
         df[col] = df[col].map(mapping).fillna(-1).astype(int)
@@ -84,6 +84,8 @@ if __name__ == "__main__":
         unique_values = df[col].unique()
         print(f"Coluna: {col}, Valores únicos: {unique_values}")
 
+    # import matplotlib.pyplot as plt
+    # import seaborn as sns
     # corr_matrix = df.corr(numeric_only=True)
     # f, ax = plt.subplots(figsize=(12, 10))
     # sns.heatmap(corr_matrix, vmax=1.0, vmin=-1.0, square=True, annot=True, linewidths=1, cmap='coolwarm', ax=ax, fmt=".2f", annot_kws={"size": 5})
@@ -0,0 +1,370 @@
+"""
+Encontros hospitalares de diabéticos (UCI "Diabetes 130-US hospitals, 1999-2008")
+
+Pipeline:
+1. read_encounters: leitura em blocos com dtypes compactos explícitos
+   (ids int32, contagens int8/int16, categorias) e `?` tratado como NA
+2. join_id_mappings: descrições de admission_type_id, discharge_disposition_id
+   e admission_source_id (data/IDS_mapping.csv) por join vetorizado
+3. build_features: features por paciente (encontros anteriores, readmissões
+   anteriores) com ordenação + somas acumuladas segmentadas, sem ciclos por linha
+4. load_features: cache colunar (Parquet), invalidada quando o CSV ou a
+   versão das features mudam
+
+O dataset não tem datas: a ordem temporal dos encontros de um paciente é a
+ordem de encounter_id.
+"""
+
+import hashlib
+import io
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+DEFAULT_CSV_PATH = DATA_DIR / "diabetic_data.csv"
+IDS_MAPPING_PATH = DATA_DIR / "IDS_mapping.csv"
+CACHE_DIR = DATA_DIR / "cache"
+
+# Mudar build_features obriga a incrementar: invalida as caches existentes
+FEATURES_VERSION = 1
+
+CHUNKSIZE = 100_000
+NA_VALUES = ["?"]
+
+ID_COLUMNS = ["admission_type_id", "discharge_disposition_id", "admission_source_id"]
+
+# Descrições do IDS_mapping.csv que significam "sem informação"
+MISSING_DESCRIPTIONS = {"NULL", "Not Mapped", "Not Available", "Unknown/Invalid"}
+
+MEDICATIONS = [
+    "metformin", "repaglinide", "nateglinide", "chlorpropamide", "glimepiride",
+    "acetohexamide", "glipizide", "glyburide", "tolbutamide", "pioglitazone",
+    "rosiglitazone", "acarbose", "miglitol", "troglitazone", "tolazamide", "examide",
+    "citoglipton", "insulin", "glyburide-metformin", "glipizide-metformin",
+    "glimepiride-pioglitazone", "metformin-rosiglitazone", "metformin-pioglitazone",
+]
+
+AGE_BANDS = [f"[{i}-{i + 10})" for i in range(0, 100, 10)]
+MEDICATION_LEVELS = ["No", "Steady", "Up", "Down"]
+READMITTED_LEVELS = ["NO", ">30", "<30"]
+
+# Grupos de diagnóstico ICD-9 (Strack et al., 2014): (nome, intervalos, códigos extra)
+ICD9_GROUPS = [
+    ("Circulatory", [(390, 460)], [785]),
+    ("Respiratory", [(460, 520)], [786]),
+    ("Digestive", [(520, 580)], [787]),
+    ("Diabetes", [(250, 251)], []),
+    ("Injury", [(800, 1000)], []),
+    ("Musculoskeletal", [(710, 740)], []),
+    ("Genitourinary", [(580, 630)], [788]),
+    ("Neoplasms", [(140, 240)], []),
+]
+
+
+def encounter_dtypes() -> dict:
+    """
+    Dtypes explícitos do CSV
+
+    Colunas com níveis conhecidos usam CategoricalDtype fixo (iguais em todos os
+    blocos); as restantes categorias (diagnósticos, especialidade, ...) ficam
+    "category" e são unificadas no fim da leitura.
+    """
+    import pandas as pd
+
+    medication = pd.CategoricalDtype(MEDICATION_LEVELS)
+    return {
+        "encounter_id": "int32",
+        "patient_nbr": "int32",
+        "race": "category",
+        "gender": pd.CategoricalDtype(["Female", "Male", "Unknown/Invalid"]),
+        "age": pd.CategoricalDtype(AGE_BANDS, ordered=True),
+        "weight": "category",
+        "admission_type_id": "int8",
+        "discharge_disposition_id": "int8",
+        "admission_source_id": "int8",
+        "time_in_hospital": "int8",
+        "payer_code": "category",
+        "medical_specialty": "category",
+        "num_lab_procedures": "int16",
+        "num_procedures": "int8",
+        "num_medications": "int16",
+        "number_outpatient": "int16",
+        "number_emergency": "int16",
+        "number_inpatient": "int16",
+        "diag_1": "category",
+        "diag_2": "category",
+        "diag_3": "category",
+        "number_diagnoses": "int8",
+        # "None" é um nível (análise não feita), não um valor em falta
+        "max_glu_serum": pd.CategoricalDtype(["None", "Norm", ">200", ">300"]),
+        "A1Cresult": pd.CategoricalDtype(["None", "Norm", ">7", ">8"]),
+        **dict.fromkeys(MEDICATIONS, medication),
+        "change": pd.CategoricalDtype(["No", "Ch"]),
+        "diabetesMed": pd.CategoricalDtype(["No", "Yes"]),
+        "readmitted": pd.CategoricalDtype(READMITTED_LEVELS),
+    }
+
+
+def read_encounters(
+    path: str | Path = DEFAULT_CSV_PATH,
+    chunksize: int = CHUNKSIZE,
+    usecols: list[str] | None = None,
+):
+    """
+    Lê diabetic_data.csv em blocos com dtypes compactos
+
+    Só `?` é NA (keep_default_na=False): "None" em max_glu_serum/A1Cresult é
+    um nível válido e não deve virar NaN.
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    dtypes = encounter_dtypes()
+    reader = pd.read_csv(
+        path,
+        dtype=dtypes,
+        na_values=NA_VALUES,
+        keep_default_na=False,
+        usecols=usecols,
+        chunksize=chunksize,
+    )
+    chunks = list(reader)
+    if len(chunks) == 1:
+        return chunks[0]
+
+    # Categorias abertas diferem entre blocos: unificar antes de concatenar,
+    # senão pd.concat devolve object
+    for col in chunks[0].columns:
+        if dtypes.get(col) != "category":
+            continue
+        categories = union_categoricals([chunk[col] for chunk in chunks]).categories
+        for chunk in chunks:
+            chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_id_mappings(path: str | Path = IDS_MAPPING_PATH) -> dict:
+    """
+    Tabelas de códigos do IDS_mapping.csv
+
+    O ficheiro tem várias tabelas `<coluna>_id,description` separadas por
+    linhas ",". Devolve {coluna: Series id → descrição}.
+    """
+    import pandas as pd
+
+    blocks, current = [], []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if line.strip(" ,"):
+            current.append(line)
+        elif current:
+            blocks.append(current)
+            current = []
+    if current:
+        blocks.append(current)
+
+    mappings = {}
+    for block in blocks:
+        table = pd.read_csv(io.StringIO("\n".join(block)), keep_default_na=False)
+        column = table.columns[0]
+        mappings[column] = pd.Series(
+            table["description"].str.strip().to_numpy(),
+            index=table[column].astype("int16"),
+            name=column.removesuffix("_id"),
+        )
+    return mappings
+
+
+def join_id_mappings(df, mappings: dict | None = None):
+    """
+    Acrescenta as descrições dos códigos (admission_type, ...) como categorias
+
+    Join vetorizado: as descrições são mapeadas uma vez para categorias e cada
+    linha recebe o código da categoria por indexação de arrays.
+    """
+    import numpy as np
+    import pandas as pd
+
+    mappings = load_id_mappings() if mappings is None else mappings
+    df = df.copy()
+    for column in ID_COLUMNS:
+        if column not in df.columns or column not in mappings:
+            continue
+        table = mappings[column]
+        categories = pd.Index(table[~table.isin(MISSING_DESCRIPTIONS)].unique())
+        # Descrições "sem informação" ficam fora das categorias (código -1 = NA)
+        codes = np.full(len(table) + 1, -1, dtype=np.int16)
+        codes[: len(table)] = categories.get_indexer(table.to_numpy())
+        positions = table.index.get_indexer(df[column].to_numpy())
+        # positions == -1 (id desconhecido) cai na última entrada, também NA
+        df[table.name] = pd.Categorical.from_codes(codes[positions], categories=categories)
+    return df
+
+
+def icd9_groups(codes):
+    """Grupo ICD-9 de cada código (V/E e fora dos grupos → "Other", NA → "Missing")"""
+    import numpy as np
+    import pandas as pd
+
+    codes = pd.Series(codes, dtype=object)
+    values = pd.to_numeric(codes, errors="coerce").to_numpy()
+    conditions, names = [], []
+    for name, ranges, extra in ICD9_GROUPS:
+        mask = np.isin(np.floor(values), extra)
+        for low, high in ranges:
+            mask |= (values >= low) & (values < high)
+        conditions.append(mask)
+        names.append(name)
+    groups = np.select(conditions, names, default="Other").astype(object)
+    groups[codes.isna().to_numpy()] = "Missing"
+    return groups
+
+
+def _segmented_cumsum(values, starts):
+    """Soma acumulada exclusiva (valores anteriores) dentro de cada segmento"""
+    import numpy as np
+
+    total = np.cumsum(values, dtype=np.int64) - values
+    return total - total[starts]
+
+
+def build_features(df):
+    """
+    Features por encontro, com histórico do paciente
+
+    Ordena por (patient_nbr, encounter_id) e calcula tudo sobre arrays:
+    início de cada paciente por comparação com a linha anterior e contagens
+    anteriores por somas acumuladas segmentadas (O(n) depois do sort).
+
+    Features:
+    - prior_encounters / encounters_total: encontros anteriores e totais do paciente
+    - prior_readmissions_30 / prior_readmissions: encontros anteriores com
+      readmissão <30 dias / qualquer readmissão
+    - prev_readmitted_30: o encontro anterior teve readmissão <30 dias
+    - prior_inpatient_days: dias internado em encontros anteriores
+    - utilization: number_outpatient + number_emergency + number_inpatient
+    - med_changes / meds_active: medicações alteradas (Up/Down) / em uso
+    - age_years: ponto médio do escalão etário
+    - diag_1_group..diag_3_group: grupos ICD-9
+    - readmitted_30: alvo (readmissão <30 dias)
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = df.sort_values(["patient_nbr", "encounter_id"], kind="stable", ignore_index=True)
+    n = len(df)
+
+    patient = df["patient_nbr"].to_numpy()
+    first = np.empty(n, dtype=bool)
+    first[:1] = True
+    first[1:] = patient[1:] != patient[:-1]
+    # Índice da primeira linha do paciente de cada linha
+    starts = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    group_starts = np.flatnonzero(first)
+    sizes = np.diff(np.append(group_starts, n))
+
+    readmitted = df["readmitted"].cat.codes.to_numpy()
+    readmitted_30 = (readmitted == READMITTED_LEVELS.index("<30")).astype(np.int8)
+    readmitted_any = (readmitted > READMITTED_LEVELS.index("NO")).astype(np.int8)
+
+    features = {
+        "prior_encounters": (np.arange(n) - starts).astype(np.int16),
+        "encounters_total": np.repeat(sizes, sizes).astype(np.int16),
+        "prior_readmissions_30": _segmented_cumsum(readmitted_30, starts).astype(np.int16),
+        "prior_readmissions": _segmented_cumsum(readmitted_any, starts).astype(np.int16),
+        "prior_inpatient_days": _segmented_cumsum(
+            df["time_in_hospital"].to_numpy(), starts
+        ).astype(np.int32),
+    }
+    previous = np.zeros(n, dtype=np.int8)
+    previous[1:] = readmitted_30[:-1]
+    previous[first] = 0
+    features["prev_readmitted_30"] = previous
+
+    features["utilization"] = (
+        df["number_outpatient"].to_numpy(np.int32)
+        + df["number_emergency"].to_numpy(np.int32)
+        + df["number_inpatient"].to_numpy(np.int32)
+    ).astype(np.int16)
+
+    medications = [col for col in MEDICATIONS if col in df.columns]
+    if medications:
+        # Códigos das categorias: 0=No, 1=Steady, 2=Up, 3=Down (-1 = NA)
+        codes = np.column_stack([df[col].cat.codes.to_numpy() for col in medications])
+        features["med_changes"] = (codes >= 2).sum(axis=1).astype(np.int8)
+        features["meds_active"] = (codes >= 1).sum(axis=1).astype(np.int8)
+
+    age = df["age"].cat.codes.to_numpy()
+    features["age_years"] = np.where(age >= 0, age * 10 + 5, -1).astype(np.int8)
+
+    for col in ("diag_1", "diag_2", "diag_3"):
+        if col not in df.columns:
+            continue
+        # Agrupar só as categorias distintas (~700) e propagar pelos códigos
+        diag = df[col].astype("category")
+        groups = icd9_groups(diag.cat.categories)
+        group_dtype = pd.CategoricalDtype(
+            [name for name, _, _ in ICD9_GROUPS] + ["Other", "Missing"]
+        )
+        per_row = np.append(groups, "Missing")[diag.cat.codes.to_numpy()]
+        features[f"{col}_group"] = pd.Categorical(per_row, dtype=group_dtype)
+
+    features["readmitted_30"] = readmitted_30
+    return pd.concat([df, pd.DataFrame(features)], axis=1)
+
+
+def _cache_path(csv_path: Path, cache_dir: Path) -> Path:
+    """Ficheiro da cache: depende do CSV (caminho, tamanho, mtime) e da versão"""
+    stat = csv_path.stat()
+    key = f"{csv_path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{FEATURES_VERSION}"
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return cache_dir / f"{csv_path.stem}-features-{digest}.parquet"
+
+
+def load_features(
+    csv_path: str | Path = DEFAULT_CSV_PATH,
+    cache_dir: str | Path | None = CACHE_DIR,
+    refresh: bool = False,
+):
+    """
+    Features do dataset, a partir da cache Parquet quando existe
+
+    A primeira chamada lê o CSV, constrói as features e grava a cache
+    (escrita atómica); as seguintes leem só o Parquet, com os dtypes
+    compactos e categorias preservados. cache_dir=None desativa a cache.
+    """
+    import pandas as pd
+
+    csv_path = Path(csv_path)
+    cache = _cache_path(csv_path, Path(cache_dir)) if cache_dir is not None else None
+    if cache is not None and cache.exists() and not refresh:
+        return pd.read_parquet(cache)
+
+    df = build_features(join_id_mappings(read_encounters(csv_path)))
+    if cache is not None:
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_name(f".{cache.name}.{os.getpid()}.tmp")
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, cache)
+            logger.info(f"✓ Cache de features gravada em {cache}")
+        except (OSError, ImportError) as e:
+            logger.warning(f"Não foi possível gravar a cache de features ({e})")
+    return df
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CSV_PATH
+    start = time.perf_counter()
+    encounters = read_encounters(path)
+    read_s = time.perf_counter() - start
+    features = build_features(join_id_mappings(encounters))
+    total_s = time.perf_counter() - start
+    memory_mb = features.memory_usage(deep=True).sum() / 2**20
+    print(f"{len(features):,} encontros, {features['patient_nbr'].nunique():,} pacientes")
+    print(f"Leitura: {read_s:.2f} s, total: {total_s:.2f} s, memória: {memory_mb:.1f} MB")
@@ -0,0 +1,184 @@
+"""
+Orçamento de tokens do contexto do agente
+
+Cada chamada ao LLM leva o prompt de sistema, o histórico, a pergunta e o
+`agent_scratchpad` (tool calls + observações de todas as iterações). Sem
+controlo, o prompt cresce com cada ferramenta usada: o prefill fica mais lento
+e o modelo pode truncar o início do contexto.
+
+`ContextBudget.fit` é aplicado antes de cada chamada e garante que o prompt
+cabe em `max_context_tokens - reserve_for_generation`:
+- observações recentes limitadas a `max_observation_tokens`
+- observações antigas reduzidas a um resumo curto (primeiras linhas)
+- se ainda não couber, observações mais antigas são omitidas
+- histórico da conversa cortado às mensagens mais recentes que cabem
+"""
+
+import logging
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+from src.observability.agent_tracing import approx_token_count
+
+logger = logging.getLogger(__name__)
+
+# Tokens por mensagem (marcadores de papel/turno, nome da ferramenta, ids)
+MESSAGE_OVERHEAD_TOKENS = 8
+
+
+@lru_cache(maxsize=8)
+def load_tokenizer(model_name: str):
+    """
+    Tokenizer (fast) de um modelo, carregado uma vez por processo
+
+    Só usa ficheiros já em cache local: contar tokens nunca deve implicar um
+    download. Devolve None se o tokenizer não estiver disponível.
+    """
+    try:
+        from transformers import AutoTokenizer
+
+        return AutoTokenizer.from_pretrained(model_name, use_fast=True, local_files_only=True)
+    except Exception as e:
+        logger.info(f"Tokenizer de {model_name} indisponível ({e}); a usar estimativa")
+        return None
+
+
+class TokenCounter:
+    """Conta tokens com o tokenizer real do modelo, com cache dos textos repetidos"""
+
+    def __init__(self, tokenizer: Any = None, cache_size: int = 4096):
+        """
+        Args:
+            tokenizer: Tokenizer HuggingFace (None = estimativa por caracteres)
+            cache_size: Textos cujo número de tokens fica em cache (prompt de sistema,
+                observações repetidas entre iterações, etc.)
+        """
+        self.tokenizer = tokenizer
+        self._cached = lru_cache(maxsize=cache_size)(self._count)
+
+    @classmethod
+    def for_model(cls, model_name: str) -> "TokenCounter":
+        return cls(load_tokenizer(model_name))
+
+    @classmethod
+    def for_llm(cls, llm: Any, model_name: str | None = None) -> "TokenCounter":
+        """Reutiliza o tokenizer já carregado (MedGemma local) ou carrega o de `model_name`"""
+        medgemma = getattr(llm, "medgemma", None)
+        if getattr(medgemma, "tokenizer", None) is not None:
+            return cls(medgemma.tokenizer)
+        return cls.for_model(model_name) if model_name else cls()
+
+    def _count(self, text: str) -> int:
+        if self.tokenizer is None:
+            return approx_token_count(text)
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def __call__(self, text: str) -> int:
+        return self._cached(text) if text else 0
+
+
+@dataclass
+class ContextBudget:
+    """Limites de tokens do prompt do agente"""
+
+    max_context_tokens: int = 2048
+    reserve_for_generation: int = 512
+    max_observation_tokens: int = 384
+    old_observation_tokens: int = 64
+    keep_recent_steps: int = 1
+    counter: Callable[[str], int] = field(default_factory=TokenCounter)
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Tokens disponíveis para o prompt completo"""
+        return self.max_context_tokens - self.reserve_for_generation
+
+    def count_tokens(self, text: str) -> int:
+        return self.counter(text)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Corta `text` para caber em `max_tokens`, assinalando o corte"""
+        total = self.counter(text)
+        if total <= max_tokens:
+            return text
+
+        marker = f"\n… [truncado: {total} tokens no original]"
+        budget = max(0, max_tokens - self.counter(marker))
+        # Corte proporcional em caracteres, afinado até caber
+        cut = int(len(text) * budget / total)
+        while cut > 0 and self.counter(text[:cut]) > budget:
+            cut = int(cut * 0.9)
+        return text[:cut].rstrip() + marker
+
+    def summarize(self, text: str, max_tokens: int) -> str:
+        """Resumo extrativo: primeiras linhas não vazias até `max_tokens`"""
+        lines = [line for line in text.splitlines() if line.strip()]
+        return self.truncate("\n".join(lines[:5]), max_tokens)
+
+    def _step_cost(self, action: Any, observation: str) -> int:
+        return (
+            self.counter(str(getattr(action, "tool_input", "")))
+            + self.counter(observation)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+
+    def compact_steps(self, steps: Sequence[tuple[Any, Any]], max_tokens: int) -> list:
+        """Limita as observações das iterações anteriores a `max_tokens` no total"""
+        n = len(steps)
+        compacted = []
+        for i, (action, observation) in enumerate(steps):
+            text = str(observation)
+            if i >= n - self.keep_recent_steps:
+                text = self.truncate(text, self.max_observation_tokens)
+            else:
+                text = self.summarize(text, self.old_observation_tokens)
+            compacted.append((action, text))
+
+        costs = [self._step_cost(a, o) for a, o in compacted]
+        total = sum(costs)
+        for i in range(n):
+            if total <= max_tokens:
+                break
+            action, observation = compacted[i]
+            stub = f"[observação omitida: {self.counter(observation)} tokens]"
+            compacted[i] = (action, stub)
+            total += self._step_cost(action, stub) - costs[i]
+        return compacted
+
+    def trim_history(self, history: Sequence[Any], max_tokens: int) -> list:
+        """Mantém as mensagens mais recentes do histórico que cabem em `max_tokens`"""
+        kept: list = []
+        used = 0
+        for message in reversed(history):
+            content = message[1] if isinstance(message, tuple) else message.content
+            cost = self.counter(str(content)) + MESSAGE_OVERHEAD_TOKENS
+            if used + cost > max_tokens:
+                break
+            kept.append(message)
+            used += cost
+        return kept[::-1]
+
+    def fit(self, inputs: dict[str, Any], fixed_text: str = "") -> dict[str, Any]:
+        """
+        Ajusta histórico e scratchpad ao orçamento
+
+        Args:
+            inputs: Inputs do agente (input, chat_history, intermediate_steps)
+            fixed_text: Partes fixas do prompt (ex: prompt de sistema)
+        """
+        available = self.prompt_tokens - self.counter(fixed_text) - self.counter(
+            str(inputs.get("input", ""))
+        )
+        # Histórico nunca ocupa mais de metade do espaço livre
+        history = self.trim_history(inputs.get("chat_history") or [], max(0, available // 2))
+        used_by_history = sum(
+            self.counter(str(m[1] if isinstance(m, tuple) else m.content))
+            + MESSAGE_OVERHEAD_TOKENS
+            for m in history
+        )
+        steps = self.compact_steps(
+            inputs.get("intermediate_steps") or [], max(0, available - used_by_history)
+        )
+        return {**inputs, "chat_history": history, "intermediate_steps": steps}
@@ -0,0 +1,564 @@
+"""
+Controlo da execução do agente: orçamento, reparação de tool calls e ciclos
+
+O `AgentExecutor` corria sempre até `max_iterations=5` e, com
+`handle_parsing_errors=True`, cada tool call malformada custava mais uma ida e
+volta ao LLM só para o modelo a repetir bem formatada. Cada pergunta tem agora
+um `ExecutionController`, consultado antes e depois de cada chamada ao LLM:
+
+- reparação local: tool calls escritas no texto (JSON, blocos ```json,
+  <tool_call>), argumentos com JSON inválido (aspas simples, vírgulas finais)
+  e nomes de ferramenta com maiúsculas/erros de escrita são corrigidos sem
+  nova chamada
+- ciclos: uma tool call igual (ferramenta + input) a uma já feita não volta a
+  correr; o modelo já tem a observação no scratchpad
+- orçamento por pergunta (tokens de prompt + gerados e segundos): quando só
+  cabe mais uma chamada (estimada pela média das anteriores), ou na última
+  iteração, o LLM é chamado sem ferramentas e a resposta é final
+- resposta suficiente: se o modelo já escreveu uma resposta e só pede
+  ferramentas repetidas, ou não há orçamento para outra ronda, essa resposta
+  é devolvida sem mais chamadas
+
+Iterações e chamadas ao LLM poupadas contam em
+`helth_agent_saved_total{kind=..., reason=...}`; `execution_report()` resume-as
+desde o arranque do processo.
+"""
+
+import ast
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from difflib import get_close_matches
+from typing import Any
+from uuid import uuid4
+
+from src.agents.context_budget import approx_token_count
+from src.observability.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Chave dos inputs do agente com o controlador da pergunta
+CONTROLLER_KEY = "execution"
+
+# Tag das chamadas ao LLM que geram a resposta ao utilizador (as únicas que
+# `MedicalDecisionAgent.stream` emite token a token)
+ANSWER_TAG = "agent-answer"
+
+AGENT_STOPS = REGISTRY.counter(
+    "helth_agent_stops_total", "Execuções do agente LLM por motivo de fim"
+)
+AGENT_ITERATIONS = REGISTRY.counter("helth_agent_iterations_total", "Iterações do agente LLM")
+AGENT_LLM_CALLS = REGISTRY.counter(
+    "helth_agent_llm_calls_total", "Chamadas ao LLM feitas pelo agente"
+)
+AGENT_SAVED = REGISTRY.counter(
+    "helth_agent_saved_total", "Iterações e chamadas ao LLM poupadas pelo controlo de execução"
+)
+
+_FENCED = re.compile(r"```(?:json|tool_code|tool_call)?\s*(.*?)```", re.DOTALL)
+_TAGGED = re.compile(r"<tool_call>\s*(.*?)\s*(?:</tool_call>|$)", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_NOT_ALNUM = re.compile(r"[\W_]+")
+_NAME_KEYS = ("name", "tool", "action")
+_ARGS_KEYS = ("arguments", "args", "parameters", "tool_input", "action_input", "input")
+
+
+def _optional_env(name: str, default: float | None, cast: Callable[[str], Any]) -> Any:
+    """Limite de uma variável de ambiente (vazio/0 = sem limite)"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return cast(value) if value.strip() not in ("", "0") else None
+
+
+@dataclass(frozen=True)
+class ExecutionLimits:
+    """
+    Limites por pergunta ao agente LLM (None = sem limite)
+
+    - max_iterations: decisões do LLM (a última é sempre uma resposta final)
+    - max_tokens: tokens de prompt + gerados, somados em todas as chamadas
+    - max_seconds: tempo total da pergunta (limitado também pelo `timeout` da pergunta)
+    - min_answer_tokens: texto a partir do qual o modelo "já respondeu"
+    """
+
+    max_iterations: int = 5
+    max_tokens: int | None = 8000
+    max_seconds: float | None = 60.0
+    min_answer_tokens: int = 16
+
+    @classmethod
+    def from_env(cls) -> "ExecutionLimits":
+        """AGENT_MAX_ITERATIONS, AGENT_MAX_TOKENS e AGENT_MAX_SECONDS (ver .env.example)"""
+        defaults = cls()
+        return cls(
+            max_iterations=int(os.getenv("AGENT_MAX_ITERATIONS", defaults.max_iterations)),
+            max_tokens=_optional_env("AGENT_MAX_TOKENS", defaults.max_tokens, int),
+            max_seconds=_optional_env("AGENT_MAX_SECONDS", defaults.max_seconds, float),
+        )
+
+
+# ----------------------------------------------------------------------
+# Reparação de tool calls
+# ----------------------------------------------------------------------
+
+
+def loads_lenient(text: str) -> Any:
+    """JSON com os erros mais comuns dos modelos locais; None se não for recuperável"""
+    text = text.strip()
+    if fenced := _FENCED.search(text):
+        text = fenced.group(1).strip()
+    for candidate in dict.fromkeys((text, _TRAILING_COMMA.sub(r"\1", text))):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            pass
+        try:
+            # Aspas simples, True/None: literais Python (sem avaliar código)
+            return ast.literal_eval(candidate)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    return None
+
+
+def resolve_tool_name(name: str, tool_names: Sequence[str]) -> str | None:
+    """Nome da ferramenta, tolerando maiúsculas, separadores e erros de escrita"""
+    if name in tool_names:
+        return name
+    normalized = {_NOT_ALNUM.sub("", n).lower(): n for n in tool_names}
+    key = _NOT_ALNUM.sub("", str(name)).lower()
+    if key in normalized:
+        return normalized[key]
+    close = get_close_matches(key, list(normalized), n=1, cutoff=0.8)
+    return normalized[close[0]] if close else None
+
+
+def _as_call(item: Any, tool_names: Sequence[str]) -> tuple[str, Any] | None:
+    """(ferramenta, argumentos) de um objeto JSON escrito pelo modelo"""
+    if not isinstance(item, dict):
+        return None
+    if isinstance(item.get("function"), dict):  # formato OpenAI
+        item = item["function"]
+    name = next((item[k] for k in _NAME_KEYS if isinstance(item.get(k), str)), None)
+    tool = resolve_tool_name(name, tool_names) if name is not None else None
+    if tool is None:
+        return None
+    args = next((item[k] for k in _ARGS_KEYS if k in item), {})
+    if isinstance(args, str) and isinstance(parsed := loads_lenient(args), dict):
+        args = parsed  # argumentos em JSON dentro de uma string
+    return tool, args
+
+
+def calls_in_text(text: str, tool_names: Sequence[str]) -> list[tuple[str, Any]]:
+    """Tool calls escritas no conteúdo em vez de no campo `tool_calls`"""
+    blocks = _TAGGED.findall(text) or _FENCED.findall(text)
+    if not blocks and "{" in text:
+        blocks = [text[text.find("{") : text.rfind("}") + 1]]
+    calls = []
+    for block in blocks:
+        data = loads_lenient(block)
+        for item in data if isinstance(data, list) else [data]:
+            if (call := _as_call(item, tool_names)) is not None:
+                calls.append(call)
+    return calls
+
+
+def _text(content: Any) -> str:
+    """Texto de `message.content` (string ou lista de blocos)"""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block) for block in content
+    )
+
+
+def parse_actions(message: Any, tool_names: Sequence[str]) -> tuple[Any, int]:
+    """
+    Como `ToolsAgentOutputParser`, reparando tool calls malformadas
+
+    Devolve (lista de ações ou AgentFinish, n.º de tool calls reparadas).
+    Tool calls irrecuperáveis levantam OutputParserException (tratada pelo
+    `AgentExecutor` com `handle_parsing_errors`).
+    """
+    from langchain.agents.output_parsers.tools import ToolAgentAction
+    from langchain_core.agents import AgentFinish
+    from langchain_core.exceptions import OutputParserException
+    from langchain_core.messages import AIMessage
+
+    content = _text(message.content)
+    calls = []
+    repaired = 0
+    for call in message.tool_calls:
+        name = resolve_tool_name(call["name"], tool_names) or call["name"]
+        repaired += name != call["name"]
+        calls.append((name, call["args"], call.get("id")))
+    for call in getattr(message, "invalid_tool_calls", None) or []:
+        name = resolve_tool_name(call.get("name") or "", tool_names)
+        args = loads_lenient(call.get("args") or "{}")
+        if name is None or not isinstance(args, dict):
+            raise OutputParserException(f"Tool call inválida: {call}")
+        calls.append((name, args, call.get("id")))
+        repaired += 1
+    from_text = not calls
+    if from_text:
+        calls = [(name, args, None) for name, args in calls_in_text(content, tool_names)]
+        repaired = len(calls)
+    if not calls:
+        return AgentFinish(return_values={"output": message.content}, log=content), 0
+
+    calls = [(name, args, call_id or f"call_{uuid4().hex[:12]}") for name, args, call_id in calls]
+    log_message = message
+    if repaired:
+        # Mensagem corrigida no scratchpad: o modelo vê tool calls bem formadas
+        log_message = AIMessage(
+            content="" if from_text else message.content,
+            tool_calls=[
+                {"name": name, "args": args if isinstance(args, dict) else {"__arg1": args},
+                 "id": call_id}
+                for name, args, call_id in calls
+            ],
+        )
+    content_msg = f"responded: {content}\n" if content and not from_text else "\n"
+    actions = []
+    for name, args, call_id in calls:
+        tool_input = args.get("__arg1", args) if isinstance(args, dict) else args
+        actions.append(ToolAgentAction(
+            tool=name,
+            tool_input=tool_input,
+            log=f"\nInvoking: `{name}` with `{tool_input}`\n{content_msg}\n",
+            message_log=[log_message],
+            tool_call_id=call_id,
+        ))
+    return actions, repaired
+
+
+def _call_key(tool: str, tool_input: Any) -> str:
+    return f"{tool}:{json.dumps(tool_input, sort_keys=True, ensure_ascii=False, default=str)}"
+
+
+def _fallback_answer(steps: Sequence[tuple[Any, Any]]) -> str:
+    """Resposta sem LLM quando o orçamento se esgotou: o último resultado obtido"""
+    if not steps:
+        return "Não foi possível responder dentro do orçamento da pergunta."
+    action, observation = steps[-1]
+    return (
+        "Não foi possível concluir a análise dentro do orçamento da pergunta. "
+        f"Último resultado ({action.tool}):\n{str(observation)[:2000]}"
+    )
+
+
+# ----------------------------------------------------------------------
+# Controlador por pergunta
+# ----------------------------------------------------------------------
+
+
+class ExecutionController:
+    """Orçamento, contagens e decisões de uma pergunta (uma instância por pergunta)"""
+
+    def __init__(
+        self,
+        limits: ExecutionLimits | None = None,
+        count_tokens: Callable[[str], int] = approx_token_count,
+        timeout: float | None = None,
+    ):
+        """
+        Args:
+            limits: Limites por pergunta (default: `ExecutionLimits()`)
+            count_tokens: Contador de tokens (quando o LLM não reporta `usage_metadata`)
+            timeout: Prazo da pergunta em segundos (o menor de `timeout` e `max_seconds`)
+        """
+        self.limits = limits or ExecutionLimits()
+        self.count_tokens = count_tokens
+        seconds = [s for s in (self.limits.max_seconds, timeout) if s is not None]
+        self.max_seconds = min(seconds) if seconds else None
+        self.started = time.monotonic()
+        self.iterations = 0
+        self.llm_calls = 0
+        self.tokens = 0
+        self.repairs = 0
+        self.saved_iterations = 0
+        self.saved_llm_calls = 0
+        self.stop_reason: str | None = None
+        self._last_call_tokens = 0
+        self._recorded = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def calls_left(self) -> float:
+        """Chamadas ao LLM que ainda cabem no orçamento (média das anteriores)"""
+        if not self.llm_calls:
+            return math.inf
+        left = math.inf
+        if self.limits.max_tokens is not None:
+            # O prompt cresce a cada iteração: a última chamada estima melhor que a média
+            per_call = max(self.tokens / self.llm_calls, self._last_call_tokens)
+            left = min(left, (self.limits.max_tokens - self.tokens) / max(per_call, 1))
+        if self.max_seconds is not None and self.iterations:
+            # Por iteração: inclui o tempo das ferramentas, não só o do LLM
+            per_iteration = self.elapsed / self.iterations
+            left = min(left, (self.max_seconds - self.elapsed) / max(per_iteration, 1e-3))
+        return left
+
+    def exhausted(self) -> bool:
+        return (
+            self.limits.max_tokens is not None and self.tokens >= self.limits.max_tokens
+        ) or (self.max_seconds is not None and self.elapsed >= self.max_seconds)
+
+    def begin_iteration(self) -> bool:
+        """Conta a iteração; True se a chamada desta iteração tem de ser a resposta final"""
+        self.iterations += 1
+        return self.iterations >= self.limits.max_iterations or self.calls_left() < 2
+
+    def record_call(self, prompt: str, message: Any) -> None:
+        """Conta uma chamada ao LLM e os seus tokens"""
+        self.llm_calls += 1
+        usage = getattr(message, "usage_metadata", None)
+        if usage and usage.get("total_tokens"):
+            tokens = usage["total_tokens"]
+        else:
+            generated = _text(message.content) + "".join(
+                f"{c['name']}{c['args']}" for c in getattr(message, "tool_calls", None) or []
+            )
+            tokens = self.count_tokens(prompt) + self.count_tokens(generated)
+        self.tokens += tokens
+        self._last_call_tokens = tokens
+
+    def save(self, reason: str, iterations: int = 0, llm_calls: int = 0) -> None:
+        iterations, llm_calls = max(0, iterations), max(0, llm_calls)
+        self.saved_iterations += iterations
+        self.saved_llm_calls += llm_calls
+        AGENT_SAVED.inc(iterations, kind="iterations", reason=reason)
+        AGENT_SAVED.inc(llm_calls, kind="llm_calls", reason=reason)
+
+    def stop(self, reason: str, output: str) -> Any:
+        from langchain_core.agents import AgentFinish
+
+        self.stop_reason = reason
+        return AgentFinish(return_values={"output": output}, log=output)
+
+    def answer(self, message: Any, steps: Sequence[tuple[Any, Any]], reason: str) -> Any:
+        """Resposta final de uma chamada sem ferramentas"""
+        return self.stop(reason, _text(message.content).strip() or _fallback_answer(steps))
+
+    def decide(
+        self, message: Any, steps: Sequence[tuple[Any, Any]], tool_names: Sequence[str],
+        final: bool,
+    ) -> Any:
+        """
+        Próximo passo depois de uma chamada ao LLM
+
+        Devolve AgentFinish, a lista de ações a executar ou None (ciclo sem
+        resposta escrita: repetir a chamada sem ferramentas).
+        """
+        from langchain_core.agents import AgentFinish
+
+        if final:
+            reason = "iterations" if self.iterations >= self.limits.max_iterations else "budget"
+            return self.answer(message, steps, reason)
+
+        text = _text(message.content).strip()
+
+        result, repaired = parse_actions(message, tool_names)
+        if repaired:
+            # Sem reparação: mais uma ida e volta ao LLM (erro de parsing ou
+            # ferramenta inexistente) ou o JSON da tool call como resposta
+            self.repairs += repaired
+            self.save("repair", iterations=1, llm_calls=1)
+        if isinstance(result, AgentFinish):
+            self.stop_reason = "answer"
+            return result
+
+        done = {_call_key(action.tool, action.tool_input) for action, _ in steps}
+        actions = [a for a in result if _call_key(a.tool, a.tool_input) not in done]
+        answered = self.count_tokens(text) >= self.limits.min_answer_tokens
+        if not actions:
+            # Ciclo: sem controlo repetiria a ferramenta e voltaria ao LLM. Só conta
+            # o que é de facto evitado: essa ida e volta (uma por repetição), menos
+            # a chamada de resposta que substitui a do LLM quando ainda não há texto
+            if answered:
+                self.save("loop", iterations=1, llm_calls=1)
+                return self.stop("loop", text)
+            self.save("loop", iterations=1)
+            return None
+        if answered and self.calls_left() < 1:
+            # Resposta já escrita e sem orçamento para outra ronda
+            self.save("budget", iterations=1, llm_calls=1)
+            return self.stop("budget", text)
+        return actions
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "iterations": self.iterations,
+            "llm_calls": self.llm_calls,
+            "tokens": self.tokens,
+            "seconds": round(self.elapsed, 3),
+            "repairs": self.repairs,
+            "saved_iterations": self.saved_iterations,
+            "saved_llm_calls": self.saved_llm_calls,
+            "stop_reason": self.stop_reason,
+        }
+
+    def record(self) -> None:
+        """Regista as métricas da pergunta (uma vez, no fim da execução)"""
+        if self._recorded:
+            return
+        self._recorded = True
+        AGENT_STOPS.inc(reason=self.stop_reason or "error")
+        AGENT_ITERATIONS.inc(self.iterations)
+        AGENT_LLM_CALLS.inc(self.llm_calls)
+        logger.debug(f"Execução do agente: {self.report()}")
+
+
+# ----------------------------------------------------------------------
+# Passo de decisão do agente
+# ----------------------------------------------------------------------
+
+
+def answer_config(config: Any) -> dict[str, Any]:
+    """`config` com `ANSWER_TAG`: os tokens desta chamada são a resposta"""
+    config = dict(config or {})
+    config["tags"] = [*(config.get("tags") or []), ANSWER_TAG]
+    return config
+
+
+class AgentPlanner:
+    """
+    Passo de decisão do agente (substitui `prompt | llm | ToolsAgentOutputParser()`)
+
+    Usado como runnable do `AgentExecutor` via `as_runnable()`; lê o
+    controlador da pergunta dos inputs (`CONTROLLER_KEY`).
+    """
+
+    def __init__(
+        self,
+        prepare: Any,
+        llm: Any,
+        answer_llm: Any,
+        tool_names: Sequence[str],
+        limits: ExecutionLimits | None = None,
+        count_tokens: Callable[[str], int] = approx_token_count,
+    ):
+        """
+        Args:
+            prepare: Runnable inputs -> prompt (orçamento de contexto, scratchpad, template)
+            llm: LLM com as ferramentas ligadas
+            answer_llm: O mesmo LLM sem ferramentas (chamada final)
+            tool_names: Ferramentas disponíveis (para reparar nomes)
+            limits: Limites quando os inputs não trazem controlador
+            count_tokens: Contador de tokens quando os inputs não trazem controlador
+        """
+        self.prepare = prepare
+        self.llm = llm
+        self.answer_llm = answer_llm
+        self.tool_names = list(tool_names)
+        self.limits = limits
+        self.count_tokens = count_tokens
+
+    def as_runnable(self) -> Any:
+        from langchain_core.runnables import RunnableLambda
+
+        return RunnableLambda(self._plan, afunc=self._aplan, name="AgentPlanner")
+
+    def _controller(self, inputs: dict[str, Any]) -> ExecutionController:
+        controller = inputs.get(CONTROLLER_KEY)
+        if controller is None:
+            # Agente invocado diretamente: orçamento só desta chamada
+            controller = ExecutionController(self.limits, self.count_tokens)
+            controller.iterations = len(inputs.get("intermediate_steps") or [])
+        return controller
+
+    @staticmethod
+    def _message(message: Any) -> Any:
+        if isinstance(message, str):
+            from langchain_core.messages import AIMessage
+
+            return AIMessage(content=message)
+        return message
+
+    def _call(self, llm: Any, prompt: Any, config: Any, controller: ExecutionController):
+        if ANSWER_TAG in (config or {}).get("tags", ()):
+            # stream: os tokens da resposta chegam por callback a `stream()`
+            message = None
+            for chunk in llm.stream(prompt, config=config):
+                message = chunk if message is None else message + chunk
+        else:
+            # Planeamento: invoke, que num LLM com lotes (MedGemmaLangChain) se junta
+            # às chamadas concorrentes de outras sessões
+            message = llm.invoke(prompt, config=config)
+        message = self._message(message if message is not None else "")
+        controller.record_call(prompt.to_string(), message)
+        return message
+
+    async def _acall(self, llm: Any, prompt: Any, config: Any, controller: ExecutionController):
+        if ANSWER_TAG in (config or {}).get("tags", ()):
+            message = None
+            async for chunk in llm.astream(prompt, config=config):
+                message = chunk if message is None else message + chunk
+        else:
+            message = await llm.ainvoke(prompt, config=config)
+        message = self._message(message if message is not None else "")
+        controller.record_call(prompt.to_string(), message)
+        return message
+
+    def _plan(self, inputs: dict[str, Any], config: Any) -> Any:
+        controller = self._controller(inputs)
+        steps = inputs.get("intermediate_steps") or []
+        if steps and controller.exhausted():
+            return controller.stop("budget", _fallback_answer(steps))
+        final = controller.begin_iteration()
+        prompt = self.prepare.invoke(inputs, config=config)
+        if final:
+            message = self._call(self.answer_llm, prompt, answer_config(config), controller)
+        else:
+            message = self._call(self.llm, prompt, config, controller)
+        decision = controller.decide(message, steps, self.tool_names, final)
+        if decision is None:
+            message = self._call(self.answer_llm, prompt, answer_config(config), controller)
+            decision = controller.answer(message, steps, "loop")
+        return decision
+
+    async def _aplan(self, inputs: dict[str, Any], config: Any) -> Any:
+        controller = self._controller(inputs)
+        steps = inputs.get("intermediate_steps") or []
+        if steps and controller.exhausted():
+            return controller.stop("budget", _fallback_answer(steps))
+        final = controller.begin_iteration()
+        prompt = await self.prepare.ainvoke(inputs, config=config)
+        if final:
+            llm, call_config = self.answer_llm, answer_config(config)
+        else:
+            llm, call_config = self.llm, config
+        message = await self._acall(llm, prompt, call_config, controller)
+        decision = controller.decide(message, steps, self.tool_names, final)
+        if decision is None:
+            message = await self._acall(
+                self.answer_llm, prompt, answer_config(config), controller
+            )
+            decision = controller.answer(message, steps, "loop")
+        return decision
+
+
+def execution_report() -> dict[str, Any]:
+    """Iterações, chamadas ao LLM e poupanças do agente desde o arranque do processo"""
+    reasons = ("repair", "loop", "budget")
+    return {
+        "iterations": int(AGENT_ITERATIONS.value()),
+        "llm_calls": int(AGENT_LLM_CALLS.value()),
+        "stops": {
+            reason: int(AGENT_STOPS.value(reason=reason))
+            for reason in ("answer", "loop", "budget", "iterations", "error")
+        },
+        "saved_iterations": {
+            reason: int(AGENT_SAVED.value(kind="iterations", reason=reason)) for reason in reasons
+        },
+        "saved_llm_calls": {
+            reason: int(AGENT_SAVED.value(kind="llm_calls", reason=reason)) for reason in reasons
+        },
+    }
@@ -1,13 +1,49 @@
+from __future__ import annotations
+
 import logging
-from typing import Any
+import queue
+import time
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    # Apenas para anotações: langchain só é importado quando o agente é criado
+    from langchain.agents import AgentExecutor
+    from langchain.tools import Tool
+    from langchain_core.language_models.llms import LLM
 
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain.prompts import ChatPromptTemplate
-from langchain.tools import Tool
-from langchain_core.language_models.llms import LLM
+    from config.medgemma_config import GenerationProfile, MedGemmaConfig
+    from src.agents.context_budget import ContextBudget
+    from src.agents.execution import ExecutionLimits
+    from src.agents.router import RouteMatch, SymbolicRouter
+    from src.llm.scheduler import LLMScheduler, Priority
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = """És um Assistente Médico Inteligente especializado
+            em Suporte à Decisão Clínica.
+
+            O TEU PAPEL:
+            - Analisar dados de pacientes (vitais, medicações, histórico)
+            - Consultar guidelines médicos para recomendações
+            - Alertar sobre riscos (interações, valores anómalos)
+            - EXPLICAR a lógica por trás de cada recomendação
+
+            REGRAS CRÍTICAS:
+            1. Se usou uma ferramenta, SEMPRE explicar o resultado ao utilizador.
+            2. Ser preciso com números e métricas (não aproximar).
+            3. Se não souber, dizer honestamente.
+            4. Citar fontes quando disponível.
+
+            FLUXO RECOMENDADO:
+            1. Para perguntas de DADOS → Use QueryDatabase
+            2. Para perguntas de CONTEXTO/GUIDELINES → Use RAGSearch
+            3. Para CÁLCULOS clínicos → Use ClinicalCalculator
+            4. Use múltiplas ferramentas se necessário (ex: Query + RAG)
+
+            Responda sempre em português de portugal.
+"""
+
 
 class MedicalDecisionAgent:
     """
@@ -36,6 +72,12 @@ class MedicalDecisionAgent:
         db_postgres: Any,
         vector_db: Any,
         mongo_db: Any,
+        scheduler: LLMScheduler | None = None,
+        context_budget: ContextBudget | None = None,
+        router: SymbolicRouter | None = None,
+        profiles: dict[str, GenerationProfile] | None = None,
+        default_profile: str | None = None,
+        execution_limits: ExecutionLimits | None = None,
     ):
         """
         Args:
@@ -44,63 +86,420 @@ class MedicalDecisionAgent:
             db_postgres: Conexão PostgreSQL
             vector_db: Base de dados vectorial (ChromaDB/FAISS)
             mongo_db: Conexão MongoDB
+            scheduler: Escalonador partilhado que controla o acesso ao LLM (opcional)
+            context_budget: Orçamento de tokens do prompt (default: 2048 de contexto,
+                tokens estimados por caracteres)
+            router: Router simbólico que responde a perguntas óbvias sem o agente LLM
+                (opcional)
+            profiles: Perfis de geração que as perguntas podem escolher (default:
+                `GENERATION_PROFILES`, ex: "fast-triage", "detailed")
+            default_profile: Perfil das perguntas que não indicam outro (None =
+                parâmetros com que o LLM foi criado)
+            execution_limits: Iterações, tokens e segundos por pergunta no agente LLM
+                (default: `ExecutionLimits.from_env()`)
         """
         self.llm = llm
         self.tools = tools
         self.db_postgres = db_postgres
         self.vector_db = vector_db
         self.mongo_db = mongo_db
-        self.agent = self._create_agent()
+        self.scheduler = scheduler
+        if context_budget is None:
+            from src.agents.context_budget import ContextBudget
 
-    def _create_agent(self) -> AgentExecutor:
-        """Cria o agente com tools e prompt configurados"""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """És um Assistente Médico Inteligente especializado
-            em Suporte à Decisão Clínica.
+            context_budget = ContextBudget()
+        self.context_budget = context_budget
+        self.router = router
+        if profiles is None:
+            from config.medgemma_config import GENERATION_PROFILES
 
-            O TEU PAPEL:
-            - Analisar dados de pacientes (vitais, medicações, histórico)
-            - Consultar guidelines médicos para recomendações
-            - Alertar sobre riscos (interações, valores anómalos)
-            - EXPLICAR a lógica por trás de cada recomendação
+            profiles = GENERATION_PROFILES
+        self.profiles = profiles
+        self.default_profile = default_profile
+        if execution_limits is None:
+            from src.agents.execution import ExecutionLimits
 
-            REGRAS CRÍTICAS:
-            1. Se usou uma ferramenta, SEMPRE explicar o resultado ao utilizador.
-            2. Ser preciso com números e métricas (não aproximar).
-            3. Se não souber, dizer honestamente.
-            4. Citar fontes quando disponível.
+            execution_limits = ExecutionLimits.from_env()
+        self.execution_limits = execution_limits
+        self._agents: dict[str | None, AgentExecutor] = {}
+        self.agent = self._agent_for(default_profile)
 
-            FLUXO RECOMENDADO:
-            1. Para perguntas de DADOS → Use QueryDatabase
-            2. Para perguntas de CONTEXTO/GUIDELINES → Use RAGSearch
-            3. Para CÁLCULOS clínicos → Use ClinicalCalculator
-            4. Use múltiplas ferramentas se necessário (ex: Query + RAG)
+    def _profile_kwargs(self, profile: str | None) -> dict[str, Any]:
+        """Argumentos por chamada do perfil, nos nomes do provider do LLM"""
+        if profile is None:
+            return {}
+        if profile not in self.profiles:
+            raise ValueError(
+                f"Perfil de geração desconhecido: {profile}. "
+                f"Disponíveis: {', '.join(self.profiles)}"
+            )
+        from src.llm.medgemma import profile_kwargs
 
-            Responda sempre em português de portugal.
-"""),
+        return profile_kwargs(self.llm, self.profiles[profile])
+
+    def _llm_for(self, profile: str | None) -> Any:
+        """LLM com os parâmetros de geração do perfil (None = os do próprio LLM)"""
+        kwargs = self._profile_kwargs(profile)
+        return self.llm.bind(**kwargs) if kwargs else self.llm
+
+    def _agent_for(self, profile: str | None) -> AgentExecutor:
+        """Agente do perfil (criado no primeiro uso e reutilizado)"""
+        if profile not in self._agents:
+            self._agents[profile] = self._create_agent(profile)
+        return self._agents[profile]
+
+    def _create_agent(self, profile: str | None = None) -> AgentExecutor:
+        """Cria o agente com tools, prompt e perfil de geração configurados"""
+        from dataclasses import replace
+
+        from langchain.agents import AgentExecutor
+        from langchain.agents.format_scratchpad.tools import format_to_tool_messages
+        from langchain.prompts import ChatPromptTemplate
+        from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+        from src.agents.execution import AgentPlanner
+        from src.agents.text_tools import TextToolCallingChat, supports_tool_calling
+
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
+            ("placeholder", "{chat_history}"),
             ("human", "{input}"),
             ("placeholder", "{agent_scratchpad}"),
         ])
 
-        agent = create_tool_calling_agent(self.llm, self.tools, prompt)
+        # Histórico e observações das ferramentas ajustados ao orçamento antes de cada
+        # chamada: o prompt não cresce com o número de iterações
+        budget = self.context_budget
+        # Providers de texto (MedGemma, Ollama, pool, servidor local) não têm tool
+        # calling nativo: tool calls em JSON no texto, interpretadas pelo wrapper
+        tool_llm = self.llm
+        if not supports_tool_calling(tool_llm):
+            tool_llm = TextToolCallingChat(llm=tool_llm)
+        llm = tool_llm.bind_tools(self.tools)
+        if profile is not None:
+            llm = llm.bind(**self._profile_kwargs(profile))
+            # Reserva para a geração igual ao máximo do perfil: perfis curtos
+            # deixam mais contexto para o prompt
+            budget = replace(
+                budget, reserve_for_generation=self.profiles[profile].max_new_tokens
+            )
+        fit = RunnableLambda(lambda inputs: budget.fit(inputs, fixed_text=SYSTEM_PROMPT))
+        prepare = (
+            fit
+            | RunnablePassthrough.assign(
+                agent_scratchpad=lambda x: format_to_tool_messages(x["intermediate_steps"])
+            )
+            | prompt
+        )
+        # Equivalente a `create_tool_calling_agent` (perfil ligado depois das tools), com
+        # tool calls reparadas localmente, deteção de ciclos e orçamento por pergunta
+        planner = AgentPlanner(
+            prepare,
+            llm,
+            answer_llm=self._llm_for(profile),
+            tool_names=[tool.name for tool in self.tools],
+            limits=self.execution_limits,
+            count_tokens=budget.count_tokens,
+        )
 
         return AgentExecutor(
-            agent=agent,
+            agent=planner.as_runnable(),
             tools=self.tools,
-            verbose=True,
+            # Passos intermédios só em modo debug; para análise de latência usar tracing
+            verbose=logger.isEnabledFor(logging.DEBUG),
+            # Só tool calls irrecuperáveis chegam aqui (o planner repara as restantes)
             handle_parsing_errors=True,
-            max_iterations=5,
+            max_iterations=self.execution_limits.max_iterations,
+        )
+
+    def _callbacks(
+        self,
+        priority: Priority | None,
+        tenant: str,
+        timeout: float | None,
+        route: str,
+        profile: str | None,
+        asynchronous: bool = False,
+    ) -> list:
+        """
+        Callbacks por pergunta (escalonador e tracing, se configurados)
+
+        `asynchronous`: a pergunta corre no event loop; a espera pelo escalonador
+        é uma corrotina em vez de bloquear uma thread do executor.
+        """
+        from src.observability.tracing import get_tracer
+
+        callbacks = []
+        tracer = get_tracer()
+        if tracer.enabled:
+            from src.observability.agent_tracing import TracingCallbackHandler
+
+            callbacks.append(TracingCallbackHandler(
+                tracer,
+                count_tokens=self.context_budget.count_tokens,
+                tenant=tenant,
+                **{"agent.route": route, "agent.profile": profile or "llm"},
+            ))
+
+        if self.scheduler is not None:
+            from src.llm.scheduler import (
+                AsyncSchedulerCallbackHandler,
+                Priority,
+                SchedulerCallbackHandler,
+            )
+
+            handler = AsyncSchedulerCallbackHandler if asynchronous else SchedulerCallbackHandler
+            callbacks.append(handler(
+                self.scheduler,
+                priority=priority if priority is not None else Priority.INTERACTIVE,
+                tenant=tenant,
+                timeout=timeout,
+            ))
+        return callbacks
+
+    def _phrase_messages(self, inputs: dict[str, Any], observation: str) -> list:
+        """Prompt do fast path "phrase": o LLM só redige a resposta a partir do resultado"""
+        match: RouteMatch = inputs["route"]
+        budget = self.context_budget
+        observation = budget.truncate(observation, budget.max_observation_tokens)
+        return [
+            ("system", SYSTEM_PROMPT),
+            *inputs["chat_history"],
+            ("human", (
+                f"{inputs['input']}\n\n"
+                f"Resultado de {match.route.tool} ({match.tool_input}):\n{observation}\n\n"
+                "Responde à pergunta com base neste resultado."
+            )),
+        ]
+
+    def _route_tool(self, match: RouteMatch) -> Tool:
+        return next(t for t in self.tools if t.name == match.route.tool)
+
+    def _answer_routed(self, inputs: dict[str, Any], config: Any) -> dict[str, str]:
+        """Fast path: ferramenta determinística e, se preciso, uma chamada ao LLM"""
+        from src.agents.execution import answer_config
+
+        match: RouteMatch = inputs["route"]
+        observation = str(self._route_tool(match).invoke(match.tool_input, config=config))
+        if match.answer == "direct":
+            return {"output": match.direct_answer(observation)}
+
+        # stream (e não invoke) para os tokens chegarem por callback a `stream()`
+        llm = self._llm_for(inputs["profile"])
+        chunks = llm.stream(
+            self._phrase_messages(inputs, observation), config=answer_config(config)
+        )
+        return {"output": "".join(str(getattr(c, "content", c)) for c in chunks)}
+
+    async def _aanswer_routed(self, inputs: dict[str, Any], config: Any) -> dict[str, str]:
+        from src.agents.execution import answer_config
+
+        match: RouteMatch = inputs["route"]
+        tool = self._route_tool(match)
+        observation = str(await tool.ainvoke(match.tool_input, config=config))
+        if match.answer == "direct":
+            return {"output": match.direct_answer(observation)}
+
+        messages = self._phrase_messages(inputs, observation)
+        llm = self._llm_for(inputs["profile"])
+        chunks = [c async for c in llm.astream(messages, config=answer_config(config))]
+        return {"output": "".join(str(getattr(c, "content", c)) for c in chunks)}
+
+    def _prepare(
+        self,
+        question: str,
+        chat_history: list | None,
+        priority: Priority | None,
+        tenant: str,
+        timeout: float | None,
+        callbacks: list | None = None,
+        profile: str | None = None,
+        asynchronous: bool = False,
+    ) -> tuple[Any, dict[str, Any], dict[str, Any], str]:
+        """
+        Escolhe o fast path do router ou o agente LLM: (runnable, inputs, config, rota)
+
+        Perfil de geração: o pedido na pergunta, senão o da rota (fast path),
+        senão `default_profile`.
+        """
+        from src.agents.router import LLM_ROUTE
+
+        match = None
+        if self.router is not None:
+            match = self.router.match(question, tools=[t.name for t in self.tools])
+        route = match.route.name if match is not None else LLM_ROUTE
+        if profile is None:
+            profile = match.route.profile if match is not None else self.default_profile
+
+        inputs = {"input": question, "chat_history": chat_history or []}
+        config = {"callbacks": [
+            *(callbacks or []),
+            *self._callbacks(priority, tenant, timeout, route, profile, asynchronous),
+        ]}
+        if match is None:
+            from src.agents.execution import CONTROLLER_KEY, ExecutionController
+
+            inputs[CONTROLLER_KEY] = ExecutionController(
+                self.execution_limits, self.context_budget.count_tokens, timeout=timeout
+            )
+            return self._agent_for(profile), inputs, config, route
+
+        from langchain_core.runnables import RunnableLambda
+
+        runnable = RunnableLambda(
+            self._answer_routed, afunc=self._aanswer_routed, name="FastPath"
         )
+        self._profile_kwargs(profile)  # perfil desconhecido falha antes da ferramenta
+        return runnable, {**inputs, "route": match, "profile": profile}, config, route
+
+    @staticmethod
+    def _record_execution(inputs: dict[str, Any]) -> None:
+        """Métricas de iterações/chamadas poupadas (só perguntas do agente LLM)"""
+        from src.agents.execution import CONTROLLER_KEY
+
+        if (controller := inputs.get(CONTROLLER_KEY)) is not None:
+            controller.record()
 
-    def query(self, question: str) -> str:
-        """Executa uma pergunta no agente"""
+    def _invoke(self, question: str, chat_history: list | None, *args, **kwargs) -> str:
+        """Executa a pergunta pelo fast path do router ou pelo agente LLM"""
+        from src.agents.router import record_route
+
+        runnable, inputs, config, route = self._prepare(question, chat_history, *args, **kwargs)
+        start = time.perf_counter()
         try:
-            response = self.agent.invoke({"input": question})
-            return response.get("output", "")
+            response = runnable.invoke(inputs, config=config)
+        finally:
+            self._record_execution(inputs)
+        record_route(route, time.perf_counter() - start)
+        return response.get("output", "")
+
+    async def _ainvoke(self, question: str, chat_history: list | None, *args, **kwargs) -> str:
+        """Como `_invoke`, com ferramentas assíncronas (I/O sem bloquear a thread)"""
+        from src.agents.router import record_route
+
+        runnable, inputs, config, route = self._prepare(
+            question, chat_history, *args, asynchronous=True, **kwargs
+        )
+        start = time.perf_counter()
+        try:
+            response = await runnable.ainvoke(inputs, config=config)
+        finally:
+            self._record_execution(inputs)
+        record_route(route, time.perf_counter() - start)
+        return response.get("output", "")
+
+    def query(
+        self,
+        question: str,
+        chat_history: list | None = None,
+        priority: Priority | None = None,
+        tenant: str = "default",
+        timeout: float | None = None,
+        profile: str | None = None,
+    ) -> str:
+        """
+        Executa uma pergunta no agente
+
+        Args:
+            question: Pergunta do utilizador
+            chat_history: Mensagens anteriores da conversa, ex: [("human", "..."), ("ai", "...")]
+            priority: Classe de prioridade no escalonador (default: interativa)
+            tenant: Tenant para o limite de concorrência do escalonador
+            timeout: Prazo em segundos; expirado na fila do LLM a pergunta é descartada
+            profile: Perfil de geração, ex: "fast-triage" para respostas curtas ou
+                "detailed" (default: o da rota do router ou `default_profile`)
+        """
+        try:
+            return self._invoke(
+                question, chat_history, priority, tenant, timeout, profile=profile
+            )
         except Exception as e:
             logger.error(f"Erro na query do agente: {e}")
             return f"Erro ao processar pergunta: {str(e)}"
 
+    async def aquery(
+        self,
+        question: str,
+        chat_history: list | None = None,
+        priority: Priority | None = None,
+        tenant: str = "default",
+        timeout: float | None = None,
+        profile: str | None = None,
+    ) -> str:
+        """Versão assíncrona de `query` (argumentos iguais)"""
+        try:
+            return await self._ainvoke(
+                question, chat_history, priority, tenant, timeout, profile=profile
+            )
+        except Exception as e:
+            logger.error(f"Erro na query do agente: {e}")
+            return f"Erro ao processar pergunta: {str(e)}"
+
+    def stream(
+        self,
+        question: str,
+        chat_history: list | None = None,
+        priority: Priority | None = None,
+        tenant: str = "default",
+        timeout: float | None = None,
+        profile: str | None = None,
+        result: dict[str, str] | None = None,
+    ) -> Iterator[str]:
+        """
+        Executa uma pergunta no agente, devolvendo os tokens à medida que são gerados
+
+        O agente corre no event loop partilhado (`src.db.loop`), por isso muitas
+        sessões em simultâneo não ocupam uma thread cada durante o I/O; os tokens
+        chegam por callback. Só as chamadas que geram a resposta (marcadas com
+        `ANSWER_TAG`: resposta final do planner, fast path do router) são emitidas
+        token a token; as de planeamento (tool calls, texto antes de uma
+        ferramenta) não. Uma resposta que não veio token a token é devolvida num
+        só fragmento no fim. Argumentos iguais a `query`.
+
+        Args:
+            result: Se indicado, recebe "output" com a resposta final (a guardar no
+                histórico em vez do texto emitido)
+        """
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        from src.agents.execution import ANSWER_TAG
+        from src.db.loop import submit
+
+        tokens: queue.Queue = queue.Queue()
+        done = object()
+        result = {} if result is None else result
+
+        class _TokenQueue(BaseCallbackHandler):
+            run_inline = True
+
+            def on_llm_new_token(self, token: str, *, tags=None, **kwargs) -> None:
+                if ANSWER_TAG in (tags or ()):
+                    tokens.put(token)
+
+        async def _run():
+            try:
+                result["output"] = await self._ainvoke(
+                    question, chat_history, priority, tenant, timeout, [_TokenQueue()],
+                    profile=profile,
+                )
+            except Exception as e:
+                logger.error(f"Erro na query do agente: {e}")
+                result["output"] = f"Erro ao processar pergunta: {str(e)}"
+            finally:
+                tokens.put(done)
+
+        future = submit(_run())
+
+        streamed = []
+        while (token := tokens.get()) is not done:
+            streamed.append(token)
+            yield token
+        future.result()
+
+        if not streamed:
+            # Resposta do planeamento, fallback ou erro: não foi emitida token a token
+            yield result.get("output", "")
+
 
 def create_medgemma_agent(
     tools: list[Tool],
@@ -109,6 +508,7 @@ def create_medgemma_agent(
     mongo_db: Any,
     provider: str = "huggingface",
     model_size: str = "2b",
+    config: MedGemmaConfig | None = None,
     **kwargs,
 ) -> MedicalDecisionAgent:
     """
@@ -121,6 +521,8 @@ def create_medgemma_agent(
         mongo_db: Conexão MongoDB
         provider: "huggingface", "ollama", ou "vertexai"
         model_size: "2b" ou "7b" (apenas HuggingFace)
+        config: Configuração completa (substitui provider/model_size); os perfis de
+            geração da configuração ficam disponíveis por pergunta
         **kwargs: Argumentos adicionais para o LLM
 
     Returns:
@@ -147,20 +549,44 @@ def create_medgemma_agent(
             use_quantization=False
         )
     """
+    from src.agents.context_budget import ContextBudget, TokenCounter
+    from src.agents.router import SymbolicRouter
     from src.llm.medgemma import get_medgemma_llm
 
+    profiles = None
+    default_profile = None
+    max_length = kwargs.get("max_length", 2048)
+    if config is not None:
+        provider, model_size = config.provider, config.model_size
+        max_length = kwargs.get("max_length", config.max_length)
+        profiles = config.all_profiles()
+        default_profile = config.generation_profile
+
     logger.info(f"A criar agente MedGemma (provider={provider}, size={model_size})")
 
     llm = get_medgemma_llm(
         provider=provider,
         model_size=model_size,
+        config=config,
         **kwargs
     )
 
+    # Contagem com o tokenizer do modelo (já carregado no provider HuggingFace)
+    context_budget = ContextBudget(
+        max_context_tokens=max_length,
+        counter=TokenCounter.for_llm(
+            llm, kwargs.get("model_name", f"google/medgemma-{model_size}")
+        ),
+    )
+
     return MedicalDecisionAgent(
         llm=llm,
         tools=tools,
         db_postgres=db_postgres,
         vector_db=vector_db,
         mongo_db=mongo_db,
+        context_budget=context_budget,
+        router=SymbolicRouter(),
+        profiles=profiles,
+        default_profile=default_profile,
     )
@@ -0,0 +1,269 @@
+"""
+Router simbólico (fast path) antes do LLM
+
+Perguntas óbvias não precisam de uma ida e volta ao LLM só para escolher a
+ferramenta. O router reconhece-as por regras (palavras-chave + regex) e,
+opcionalmente, por um classificador de intenção pequeno em CPU, e envia-as
+diretamente para a ferramenta determinística:
+- "direct": a resposta é o resultado da ferramenta (ex: IMC com peso e altura)
+- "phrase": o LLM só redige a resposta a partir do resultado (uma chamada, sem
+  decisão de ferramentas)
+
+O resto segue para o agente LLM (rota "llm"). Cada pergunta conta em
+`helth_router_requests_total{route=...}` e a latência em
+`helth_router_latency_seconds{route=...}`; `route_report()` calcula a taxa de
+acerto por rota e o tempo poupado face à rota "llm".
+
+Exemplo:
+    router = SymbolicRouter()
+    router.match("Qual o IMC de um paciente com 85kg e 1.70m?")
+    # RouteMatch(route=Route(name="imc", ...), tool_input="imc:85,1.70", ...)
+"""
+
+import re
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any, Literal
+
+from src.observability.metrics import REGISTRY
+
+# Rota das perguntas que seguem para o agente LLM
+LLM_ROUTE = "llm"
+
+ROUTE_REQUESTS = REGISTRY.counter(
+    "helth_router_requests_total", "Perguntas por rota do router simbólico"
+)
+ROUTE_LATENCY = REGISTRY.histogram(
+    "helth_router_latency_seconds", "Tempo de resposta por rota do router simbólico"
+)
+
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+_WEIGHT = re.compile(_NUMBER + r"\s*(?:kg|quilos?)\b", re.IGNORECASE)
+_HEIGHT_M = re.compile(r"\b(\d(?:[.,]\d+)?)\s*m\b", re.IGNORECASE)
+_HEIGHT_CM = re.compile(r"\b(\d{3})\s*cm\b", re.IGNORECASE)
+_BLOOD_PRESSURE = re.compile(r"\b(\d{2,3})\s*/\s*(\d{2,3})\b")
+# Id do paciente: token com pelo menos um dígito a seguir a "paciente"
+_PATIENT_ID = re.compile(
+    r"\bpaciente\s+(?:id\s*|n\.?º\s*)?([A-Za-z0-9_-]*\d[A-Za-z0-9_-]*)", re.IGNORECASE
+)
+
+# Pedidos que vão além do cálculo: o resultado é redigido pelo LLM
+_OPEN_QUESTION = re.compile(
+    r"o que fazer|como tratar|tratamento|terap[êe]utica|medica[çc][ãa]o|devo|"
+    r"porqu[eê]|explica|recomend",
+    re.IGNORECASE,
+)
+
+
+def _number(value: str) -> float:
+    return float(value.replace(",", "."))
+
+
+def _extract_imc(question: str) -> str | None:
+    weight = _WEIGHT.search(question)
+    if weight is None:
+        return None
+    if height := _HEIGHT_M.search(question):
+        meters = _number(height.group(1))
+    elif height := _HEIGHT_CM.search(question):
+        meters = _number(height.group(1)) / 100
+    else:
+        return None
+    return f"imc:{_number(weight.group(1)):g},{meters:g}"
+
+
+def _extract_blood_pressure(question: str) -> str | None:
+    match = _BLOOD_PRESSURE.search(question)
+    if match is None:
+        return None
+    systolic, diastolic = (int(v) for v in match.groups())
+    if not (60 <= systolic <= 300 and 30 <= diastolic <= 200 and systolic > diastolic):
+        return None
+    return f"pa:{systolic},{diastolic}"
+
+
+def _extract_patient_id(question: str) -> str | None:
+    match = _PATIENT_ID.search(question)
+    return match.group(1) if match else None
+
+
+def _extract_question(question: str) -> str | None:
+    return question.strip() or None
+
+
+@dataclass(frozen=True)
+class Route:
+    """Regra do router: intenção → ferramenta determinística"""
+
+    name: str
+    tool: str
+    keywords: re.Pattern
+    extract: Callable[[str], str | None]
+    answer: Literal["direct", "phrase"] = "direct"
+    # Perfil de geração da resposta "phrase" (curta: só redige o resultado)
+    profile: str | None = "fast-triage"
+
+
+@dataclass(frozen=True)
+class RouteMatch:
+    route: Route
+    tool_input: str
+    answer: Literal["direct", "phrase"]
+    confidence: float = 1.0
+
+    def direct_answer(self, observation: str) -> str:
+        return f"{observation}\n\n(Cálculo determinístico: {self.route.tool} `{self.tool_input}`)"
+
+
+DEFAULT_ROUTES: tuple[Route, ...] = (
+    Route(
+        name="imc",
+        tool="ClinicalCalculator",
+        keywords=re.compile(r"\b(imc|bmi)\b|massa corporal", re.IGNORECASE),
+        extract=_extract_imc,
+    ),
+    Route(
+        name="pressao_arterial",
+        tool="ClinicalCalculator",
+        keywords=re.compile(r"press[ãa]o|tens[ãa]o|\bpa\b|hipertens", re.IGNORECASE),
+        extract=_extract_blood_pressure,
+    ),
+    Route(
+        name="estado_paciente",
+        tool="PatientFeatures",
+        keywords=re.compile(
+            r"como (?:est[áa]|vai)|estado|evolu[çc][ãa]o|resumo|situa[çc][ãa]o", re.IGNORECASE
+        ),
+        extract=_extract_patient_id,
+        answer="phrase",
+    ),
+    Route(
+        name="guidelines",
+        tool="RAGSearch",
+        keywords=re.compile(r"guidelines?|diretriz|directriz|norma de orienta", re.IGNORECASE),
+        extract=_extract_question,
+        answer="phrase",
+    ),
+)
+
+
+class SymbolicRouter:
+    """Classifica perguntas em rotas determinísticas (ou None → agente LLM)"""
+
+    def __init__(
+        self,
+        routes: Sequence[Route] = DEFAULT_ROUTES,
+        intent_model: Callable[[str], tuple[str, float]] | None = None,
+        min_confidence: float = 0.8,
+    ):
+        """
+        Args:
+            routes: Regras por ordem de prioridade
+            intent_model: Classificador opcional (CPU) pergunta → (rota, confiança);
+                complementa as palavras-chave, ex: um pipeline TF-IDF + regressão
+                logística treinado com perguntas rotuladas
+            min_confidence: Confiança mínima do classificador para aceitar a rota
+        """
+        self.routes = list(routes)
+        self.intent_model = intent_model
+        self.min_confidence = min_confidence
+
+    def match(self, question: str, tools: Sequence[str] | None = None) -> RouteMatch | None:
+        """
+        Rota determinística da pergunta
+
+        Só há fast path se exatamente uma rota reconhecer a pergunta e conseguir
+        extrair o input da ferramenta; perguntas ambíguas seguem para o LLM.
+
+        Args:
+            question: Pergunta do utilizador
+            tools: Nomes das ferramentas disponíveis (rotas sem ferramenta são ignoradas)
+        """
+        intent, confidence = None, 1.0
+        if self.intent_model is not None:
+            intent, confidence = self.intent_model(question)
+            if confidence < self.min_confidence:
+                intent = None
+
+        matches = []
+        for route in self.routes:
+            if tools is not None and route.tool not in tools:
+                continue
+            if intent != route.name and not route.keywords.search(question):
+                continue
+            tool_input = route.extract(question)
+            if tool_input is not None:
+                matches.append((route, tool_input))
+
+        if len(matches) != 1:
+            return None
+
+        route, tool_input = matches[0]
+        answer = route.answer
+        if answer == "direct" and _OPEN_QUESTION.search(question):
+            answer = "phrase"
+        return RouteMatch(
+            route=route,
+            tool_input=tool_input,
+            answer=answer,
+            confidence=confidence if intent == route.name else 1.0,
+        )
+
+    @property
+    def route_names(self) -> list[str]:
+        return [route.name for route in self.routes]
+
+
+def record_route(route: str, seconds: float) -> None:
+    ROUTE_REQUESTS.inc(route=route)
+    ROUTE_LATENCY.observe(seconds, route=route)
+
+
+def route_report(routes: Sequence[str] | None = None) -> dict[str, Any]:
+    """
+    Taxa de acerto e tempo poupado por rota (desde o arranque do processo)
+
+    O tempo poupado por pergunta é a diferença entre a latência média da rota
+    "llm" e a da rota; sem perguntas na rota "llm" não é estimado.
+    """
+    if routes is None:
+        routes = [route.name for route in DEFAULT_ROUTES]
+    names = [*routes, LLM_ROUTE]
+    total = sum(ROUTE_REQUESTS.value(route=name) for name in names)
+    llm_count = ROUTE_LATENCY.count(route=LLM_ROUTE)
+    llm_mean = ROUTE_LATENCY.sum(route=LLM_ROUTE) / llm_count if llm_count else None
+
+    report: dict[str, Any] = {"total": int(total), "routes": {}, "saved_seconds": 0.0}
+    for name in names:
+        hits = int(ROUTE_REQUESTS.value(route=name))
+        count = ROUTE_LATENCY.count(route=name)
+        mean = ROUTE_LATENCY.sum(route=name) / count if count else None
+        saved = None
+        if name != LLM_ROUTE and llm_mean is not None and mean is not None:
+            saved = llm_mean - mean
+            report["saved_seconds"] += saved * count
+        report["routes"][name] = {
+            "hits": hits,
+            "hit_rate": hits / total if total else 0.0,
+            "mean_ms": mean * 1000 if mean is not None else None,
+            "saved_ms_per_hit": saved * 1000 if saved is not None else None,
+        }
+    return report
+
+
+def format_route_report(report: dict[str, Any]) -> str:
+    """Relatório de `route_report()` em tabela de texto"""
+
+    def _ms(value: float | None) -> str:
+        return f"{value:.1f}" if value is not None else "-"
+
+    lines = [f"{'rota':18} {'perguntas':>9} {'taxa':>7} {'média ms':>10} {'poupado ms':>11}"]
+    for name, stats in report["routes"].items():
+        lines.append(
+            f"{name:18} {stats['hits']:9d} {stats['hit_rate']:7.1%} "
+            f"{_ms(stats['mean_ms']):>10} {_ms(stats['saved_ms_per_hit']):>11}"
+        )
+    lines.append(
+        f"{report['total']} perguntas, {report['saved_seconds']:.2f}s poupados no fast path"
+    )
+    return "\n".join(lines)
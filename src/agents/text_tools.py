@@ -0,0 +1,261 @@
+"""
+Tool calling em texto para LLMs sem `bind_tools`
+
+Os providers do repositório (MedGemmaLangChain, Ollama, MedGemmaOllamaPool,
+MedGemmaLocalServer) são LLMs de texto: recebem uma string e devolvem uma
+string, sem tool calling nativo. `TextToolCallingChat` embrulha qualquer um
+deles num chat model com `bind_tools`:
+
+- as mensagens (sistema, histórico, tool calls e resultados) são convertidas
+  num prompt de texto, com a lista de ferramentas e o formato pedido
+  ({"name": ..., "input": ...})
+- a resposta é interpretada com os mesmos parsers tolerantes do agente
+  (`src.agents.execution`): um JSON de tool call vira `tool_calls`, o resto é
+  a resposta ao utilizador
+- em streaming, uma resposta que começa como tool call (ex: "{", "```") é
+  retida até ao fim e não chega aos tokens; texto normal passa logo
+
+Exemplo:
+    llm = TextToolCallingChat(llm=get_medgemma_llm("ollama"))
+    agent = MedicalDecisionAgent(llm=llm, tools=tools, ...)
+"""
+
+import json
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+from uuid import uuid4
+
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManager,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.agents.execution import calls_in_text
+
+# Inícios de resposta que podem ser uma tool call (retidos em streaming)
+_TOOL_CALL_MARKERS = ("{", "[", "```", "<tool_call>")
+
+# O modelo não deve escrever os turnos seguintes da conversa
+_TURN_STOPS = ["\nUtilizador:", "\nResultado ("]
+
+# A chamada interna não repete os callbacks (escalonador, tracing) da externa; um
+# manager vazio (e não []) porque `LLM.agenerate` não aceita uma lista vazia
+_NO_CALLBACKS = {"callbacks": CallbackManager(handlers=[])}
+
+
+def supports_tool_calling(llm: Any) -> bool:
+    """True se `llm` tem tool calling nativo (`bind_tools` implementado)"""
+    bind_tools = getattr(type(llm), "bind_tools", None)
+    return bind_tools is not None and bind_tools is not BaseChatModel.bind_tools
+
+
+def _content(value: Any) -> str:
+    """Texto devolvido por um LLM (string) ou chat model (mensagem)"""
+    content = getattr(value, "content", value)
+    return content if isinstance(content, str) else str(content)
+
+
+class TextToolCallingChat(BaseChatModel):
+    """Chat model com tool calling por texto sobre um LLM de texto"""
+
+    llm: Any
+    tools: list[dict[str, str]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "text-tool-calling"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "TextToolCallingChat":
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+
+        specs = []
+        for tool in tools:
+            function = convert_to_openai_tool(tool)["function"]
+            specs.append({"name": function["name"], "description": function["description"]})
+        bound = self.model_copy(update={"tools": specs})
+        return bound.bind(**kwargs) if kwargs else bound
+
+    # ------------------------------------------------------------------
+    # Prompt
+    # ------------------------------------------------------------------
+
+    def _instructions(self) -> str:
+        listing = "\n".join(f"- {t['name']}: {t['description']}" for t in self.tools)
+        return (
+            f"Ferramentas disponíveis:\n{listing}\n\n"
+            "Para usar uma ferramenta, responde APENAS com um objeto JSON, sem mais texto:\n"
+            '{"name": "<ferramenta>", "input": "<input da ferramenta>"}\n'
+            "Depois de receberes o resultado, responde ao utilizador em texto."
+        )
+
+    def _prompt(self, messages: list[BaseMessage]) -> str:
+        parts: list[str] = []
+        tool_names: dict[str, str] = {}
+        for message in messages:
+            content = _content(message)
+            if message.type == "system":
+                parts.append(content)
+            elif message.type == "human":
+                parts.append(f"Utilizador: {content}")
+            elif message.type == "ai" and getattr(message, "tool_calls", None):
+                for call in message.tool_calls:
+                    tool_names[call["id"]] = call["name"]
+                    args = call["args"]
+                    tool_input = args.get("__arg1", args) if isinstance(args, dict) else args
+                    call_json = json.dumps(
+                        {"name": call["name"], "input": tool_input}, ensure_ascii=False
+                    )
+                    parts.append(f"Assistente: {call_json}")
+            elif message.type == "ai":
+                parts.append(f"Assistente: {content}")
+            elif message.type == "tool":
+                name = tool_names.get(getattr(message, "tool_call_id", ""), "ferramenta")
+                parts.append(f"Resultado ({name}): {content}")
+            else:
+                parts.append(content)
+        if self.tools:
+            # Instruções a seguir ao prompt de sistema (ou no início)
+            at = 1 if messages and messages[0].type == "system" else 0
+            parts.insert(at, self._instructions())
+        parts.append("Assistente:")
+        return "\n\n".join(parts)
+
+    def _stop(self, stop: list[str] | None) -> list[str]:
+        return [*(stop or []), *_TURN_STOPS]
+
+    # ------------------------------------------------------------------
+    # Resposta
+    # ------------------------------------------------------------------
+
+    def _tool_calls(self, text: str) -> list[dict[str, Any]]:
+        if not self.tools:
+            return []
+        calls = calls_in_text(text, [t["name"] for t in self.tools])
+        return [
+            {
+                "name": name,
+                "args": args if isinstance(args, dict) else {"__arg1": args},
+                "id": f"call_{uuid4().hex[:12]}",
+            }
+            for name, args in calls
+        ]
+
+    def _message(self, text: str) -> AIMessage:
+        text = text.strip()
+        calls = self._tool_calls(text) if text.startswith(_TOOL_CALL_MARKERS) else []
+        if calls:
+            return AIMessage(content="", tool_calls=calls)
+        return AIMessage(content=text)
+
+    def _final_chunk(self, text: str, run_manager: Any) -> ChatGenerationChunk:
+        """Texto retido em streaming: tool calls ou, afinal, resposta normal"""
+        message = self._message(text)
+        if message.tool_calls:
+            chunks = [
+                {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False),
+                 "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ]
+            return ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=chunks))
+        return self._text_chunk(text, run_manager)
+
+    @staticmethod
+    def _text_chunk(text: str, run_manager: Any) -> ChatGenerationChunk:
+        chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+        if run_manager is not None:
+            run_manager.on_llm_new_token(text, chunk=chunk)
+        return chunk
+
+    def _hold(self, buffer: str) -> bool:
+        """True enquanto o início da resposta pode ainda ser uma tool call"""
+        head = buffer.lstrip()
+        if not self.tools or not head:
+            return bool(self.tools)
+        return head.startswith(_TOOL_CALL_MARKERS) or any(
+            marker.startswith(head) for marker in _TOOL_CALL_MARKERS
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = self.llm.invoke(
+            self._prompt(messages), config=_NO_CALLBACKS, stop=self._stop(stop), **kwargs
+        )
+        return ChatResult(generations=[ChatGeneration(message=self._message(_content(text)))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = await self.llm.ainvoke(
+            self._prompt(messages), config=_NO_CALLBACKS, stop=self._stop(stop), **kwargs
+        )
+        return ChatResult(generations=[ChatGeneration(message=self._message(_content(text)))])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        pieces = self.llm.stream(
+            self._prompt(messages), config=_NO_CALLBACKS, stop=self._stop(stop), **kwargs
+        )
+        buffer = ""
+        holding = True
+        for piece in pieces:
+            piece = _content(piece)
+            if not holding:
+                yield self._text_chunk(piece, run_manager)
+                continue
+            buffer += piece
+            if not self._hold(buffer):
+                holding = False
+                yield self._text_chunk(buffer, run_manager)
+        if holding and buffer:
+            yield self._final_chunk(buffer, run_manager)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        pieces = self.llm.astream(
+            self._prompt(messages), config=_NO_CALLBACKS, stop=self._stop(stop), **kwargs
+        )
+        buffer = ""
+        holding = True
+        async for piece in pieces:
+            piece = _content(piece)
+            if not holding:
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+                if run_manager is not None:
+                    await run_manager.on_llm_new_token(piece, chunk=chunk)
+                yield chunk
+                continue
+            buffer += piece
+            if not self._hold(buffer):
+                holding = False
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=buffer))
+                if run_manager is not None:
+                    await run_manager.on_llm_new_token(buffer, chunk=chunk)
+                yield chunk
+        if holding and buffer:
+            chunk = self._final_chunk(buffer, None)
+            if run_manager is not None and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
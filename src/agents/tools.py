@@ -0,0 +1,297 @@
+"""
+Ferramentas determinísticas do agente médico
+
+- QueryDatabase: consultas SQL (só leitura) à base transacional
+- RAGSearch: pesquisa semântica na base de conhecimento (ChromaDB)
+- ClinicalCalculator: cálculos clínicos em lógica pura
+- PatientFeatures: features pré-calculadas do paciente (feature store)
+
+QueryDatabase e RAGSearch aceitam as ligações síncronas (Engine SQLAlchemy,
+cliente ChromaDB) ou os adaptadores assíncronos de `src.db`; com estes, o
+agente em modo assíncrono (`ainvoke`) não bloqueia a thread durante o I/O.
+"""
+
+import logging
+import math
+import re
+from typing import Any
+
+from langchain.tools import Tool
+
+from src.db.async_stores import AsyncChroma, AsyncPostgres
+from src.db.loop import run_sync
+from src.observability.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+# Coleção ChromaDB com guidelines e documentos clínicos
+RAG_COLLECTION = "conhecimento_medico"
+
+# Limites do que entra no prompt do LLM: linhas por consulta, caracteres por
+# célula e por documento (o orçamento final é aplicado em ContextBudget)
+MAX_QUERY_ROWS = 50
+MAX_CELL_CHARS = 120
+MAX_DOCUMENT_CHARS = 1200
+
+# Tempo máximo de uma consulta do agente (statement_timeout da transação)
+QUERY_TIMEOUT_MS = 5000
+
+# Primeiro filtro (mensagem clara ao LLM); a garantia é a transação só de leitura,
+# que também rejeita CTEs com escrita (ex: WITH d AS (DELETE ...) SELECT ...)
+_READ_ONLY_SQL = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+
+def _clip(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[: max_chars - 1].rstrip() + "…"
+
+
+def _read_only(sql: str) -> str | None:
+    """Consulta normalizada, ou None se não for uma única consulta de leitura"""
+    sql = sql.strip().rstrip(";")
+    if not _READ_ONLY_SQL.match(sql) or ";" in sql:
+        return None
+    return sql
+
+
+def _format_rows(columns: list[str], rows: list, max_rows: int) -> str:
+    if not rows:
+        return "Sem resultados."
+
+    lines = [" | ".join(columns)]
+    lines += [" | ".join(_clip(str(v), MAX_CELL_CHARS) for v in row) for row in rows[:max_rows]]
+    if len(rows) > max_rows:
+        lines.append(f"... (resultado truncado a {max_rows} linhas)")
+    return "\n".join(lines)
+
+
+def query_database(
+    engine: Any, sql: str, max_rows: int = MAX_QUERY_ROWS, timeout_ms: int = QUERY_TIMEOUT_MS
+) -> str:
+    """
+    Executa uma consulta SQL numa transação só de leitura e devolve o resultado em texto
+
+    Args:
+        engine: Engine SQLAlchemy (PostgreSQL)
+        sql: Consulta SELECT
+        max_rows: Número máximo de linhas devolvidas
+        timeout_ms: Tempo máximo da consulta (statement_timeout)
+    """
+    from sqlalchemy import text
+
+    sql = _read_only(sql)
+    if sql is None:
+        return "Apenas é permitida uma consulta SELECT."
+
+    with (
+        get_tracer().span("db.query", **{"db.system": "postgresql"}) as span,
+        engine.connect() as conn,
+    ):
+        # Primeira instrução da transação (autobegin); a ligação faz rollback ao fechar
+        conn.execute(text("SET TRANSACTION READ ONLY"))
+        conn.execute(
+            text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(timeout_ms)}
+        )
+        result = conn.execute(text(sql))
+        columns = list(result.keys())
+        rows = result.fetchmany(max_rows + 1)
+        span.set(**{"db.rows": len(rows)})
+
+    return _format_rows(columns, rows, max_rows)
+
+
+async def aquery_database(
+    postgres: AsyncPostgres,
+    sql: str,
+    max_rows: int = MAX_QUERY_ROWS,
+    timeout_ms: int = QUERY_TIMEOUT_MS,
+) -> str:
+    """Versão assíncrona de `query_database` (pool psycopg assíncrono)"""
+    sql = _read_only(sql)
+    if sql is None:
+        return "Apenas é permitida uma consulta SELECT."
+
+    with get_tracer().span("db.query", **{"db.system": "postgresql"}) as span:
+        columns, rows = await postgres.fetch(
+            sql, max_rows=max_rows + 1, read_only=True, timeout_ms=timeout_ms
+        )
+        span.set(**{"db.rows": len(rows)})
+
+    return _format_rows(columns, rows, max_rows)
+
+
+def _format_documents(result: dict) -> str:
+    documents = result.get("documents", [[]])[0]
+    metadatas = result.get("metadatas", [[]])[0] or [{}] * len(documents)
+    if not documents:
+        return "Nenhum documento relevante encontrado."
+
+    return "\n\n".join(
+        f"[{(meta or {}).get('source', 'desconhecida')}] {_clip(doc, MAX_DOCUMENT_CHARS)}"
+        for doc, meta in zip(documents, metadatas, strict=False)
+    )
+
+
+def rag_search(vector_db: Any, query: str, k: int = 4) -> str:
+    """
+    Pesquisa os `k` documentos mais relevantes na base de conhecimento
+
+    Args:
+        vector_db: Cliente ChromaDB
+        query: Texto a pesquisar
+        k: Número de documentos
+    """
+    with get_tracer().span("db.vector_search", **{"db.system": "chromadb", "k": k}):
+        collection = vector_db.get_or_create_collection(RAG_COLLECTION)
+        result = collection.query(query_texts=[query], n_results=k)
+
+    return _format_documents(result)
+
+
+async def arag_search(chroma: AsyncChroma, query: str, k: int = 4) -> str:
+    """Versão assíncrona de `rag_search` (cliente HTTP ChromaDB assíncrono)"""
+    with get_tracer().span("db.vector_search", **{"db.system": "chromadb", "k": k}):
+        result = await chroma.query(RAG_COLLECTION, query, k)
+
+    return _format_documents(result)
+
+
+def calcular_imc(peso: float, altura: float) -> str:
+    """Calcula o Índice de Massa Corporal (peso em kg, altura em m)"""
+    imc = peso / (altura ** 2)
+    categoria = (
+        "Baixo peso" if imc < 18.5
+        else "Peso normal" if imc < 25
+        else "Sobrepeso" if imc < 30
+        else "Obesidade"
+    )
+    return f"IMC: {imc:.1f} ({categoria})"
+
+
+def classificar_pressao_arterial(sistolica: float, diastolica: float) -> str:
+    """Classificação da pressão arterial no consultório (ESC/ESH 2018)"""
+    if sistolica <= 0 or diastolica <= 0:
+        return "Valores de pressão arterial inválidos."
+
+    grades = [
+        (180, 110, "Hipertensão grau 3"),
+        (160, 100, "Hipertensão grau 2"),
+        (140, 90, "Hipertensão grau 1"),
+        (130, 85, "Normal-alta"),
+        (120, 80, "Normal"),
+    ]
+    categoria = next(
+        (nome for s, d, nome in grades if sistolica >= s or diastolica >= d), "Ótima"
+    )
+    if categoria.startswith("Hipertensão") and sistolica >= 140 and diastolica < 90:
+        categoria = "Hipertensão sistólica isolada"
+    return f"PA: {sistolica:.0f}/{diastolica:.0f} mmHg ({categoria})"
+
+
+def clinical_calculator(expression: str) -> str:
+    """
+    Calculadora clínica
+
+    Input: 'imc:peso,altura' (ex: 'imc:70,1.75') ou 'pa:sistolica,diastolica'
+    (ex: 'pa:140,90')
+    """
+    calculators = {"imc": calcular_imc, "pa": classificar_pressao_arterial}
+    name, _, args = expression.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")]
+        calculator = calculators.get(name.strip().lower())
+        # Valores nulos, negativos ou não finitos (ex: altura 0 extraída do texto)
+        valid = all(0 < v < math.inf for v in values)
+        if calculator is not None and len(values) == 2 and valid:
+            return calculator(*values)
+    except ValueError:
+        pass
+    return "Cálculo não suportado. Formatos: 'imc:peso,altura', 'pa:sistolica,diastolica'"
+
+
+def patient_features(feature_store: Any, patient_id: str) -> str:
+    """
+    Features pré-calculadas de um paciente (leitura por chave, sem SQL)
+
+    Args:
+        feature_store: FeatureStore
+        patient_id: Id do paciente
+    """
+    patient_id = patient_id.strip().strip("'\"")
+    with get_tracer().span("db.feature_lookup", **{"db.system": "sqlite"}):
+        features = feature_store.get(patient_id)
+    if features is None:
+        return f"Sem features para o paciente {patient_id}."
+    return "; ".join(f"{name}: {value}" for name, value in features.items() if value is not None)
+
+
+def build_tools(
+    db_postgres: Any, vector_db: Any, mongo_db: Any, feature_store: Any = None
+) -> list[Tool]:
+    """
+    Cria as ferramentas do agente ligadas às bases de dados
+
+    Args:
+        db_postgres: Engine SQLAlchemy (PostgreSQL)
+        vector_db: Cliente ChromaDB
+        mongo_db: Base de dados MongoDB (reservado para ferramentas sobre logs)
+        feature_store: FeatureStore (opcional): ferramenta PatientFeatures
+
+    Com adaptadores assíncronos (`AsyncPostgres`, `AsyncChroma`) as ferramentas
+    têm versão `coroutine`; a versão síncrona corre no event loop partilhado.
+    """
+    tools = [
+        Tool(
+            name="ClinicalCalculator",
+            func=clinical_calculator,
+            description=(
+                "Cálculos clínicos. Input: 'imc:peso,altura' ex: 'imc:70,1.75' ou "
+                "'pa:sistolica,diastolica' ex: 'pa:140,90'"
+            ),
+        ),
+    ]
+
+    if isinstance(db_postgres, AsyncPostgres):
+        tools.append(Tool(
+            name="QueryDatabase",
+            func=lambda sql: run_sync(aquery_database(db_postgres, sql)),
+            coroutine=lambda sql: aquery_database(db_postgres, sql),
+            description=(
+                "Consulta dados de pacientes na tabela saude_transacional. "
+                "Input: uma consulta SQL SELECT"
+            ),
+        ))
+    elif db_postgres is not None:
+        tools.append(Tool(
+            name="QueryDatabase",
+            func=lambda sql: query_database(db_postgres, sql),
+            description=(
+                "Consulta dados de pacientes na tabela saude_transacional. "
+                "Input: uma consulta SQL SELECT"
+            ),
+        ))
+
+    if isinstance(vector_db, AsyncChroma):
+        tools.append(Tool(
+            name="RAGSearch",
+            func=lambda query: run_sync(arag_search(vector_db, query)),
+            coroutine=lambda query: arag_search(vector_db, query),
+            description="Pesquisa guidelines e contexto clínico. Input: pergunta em texto",
+        ))
+    elif vector_db is not None:
+        tools.append(Tool(
+            name="RAGSearch",
+            func=lambda query: rag_search(vector_db, query),
+            description="Pesquisa guidelines e contexto clínico. Input: pergunta em texto",
+        ))
+
+    if feature_store is not None:
+        tools.append(Tool(
+            name="PatientFeatures",
+            func=lambda patient_id: patient_features(feature_store, patient_id),
+            description=(
+                "Resumo pré-calculado de um paciente (HbA1c e IMC recentes, tendência do IMC, "
+                "risco, categorias codificadas). Input: id do paciente"
+            ),
+        ))
+
+    return tools
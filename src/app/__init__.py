@@ -0,0 +1,3 @@
+"""
+Interface Streamlit do sistema HELTH
+"""
@@ -0,0 +1,191 @@
+"""
+Recursos partilhados da aplicação Streamlit
+
+O Streamlit volta a executar `app.py` a cada interação. Tudo o que é caro de
+criar (modelo, pools de ligações) fica em `st.cache_resource` e é partilhado por
+todas as sessões do processo; resultados de consultas ficam em `st.cache_data`
+com TTL. Cada sessão só cria o seu próprio `MedicalDecisionAgent` (barato),
+reutilizando o LLM e as ligações partilhadas.
+"""
+
+import logging
+import os
+
+import streamlit as st
+
+from config import MedGemmaConfig
+
+logger = logging.getLogger(__name__)
+
+
+
+@st.cache_resource(show_spinner="A carregar MedGemma...")
+def get_llm():
+    """LLM partilhado por todas as sessões (carregado uma vez por processo)"""
+    from src.llm import get_medgemma_llm
+
+    config = MedGemmaConfig.from_env()
+    logger.info(
+        f"A carregar LLM partilhado (provider={config.provider}, "
+        f"perfil={config.generation_profile})"
+    )
+    return get_medgemma_llm(config=config)
+
+
+@st.cache_resource
+def get_context_budget():
+    """Orçamento de tokens do prompt, com o tokenizer do modelo (partilhado)"""
+    from src.agents.context_budget import ContextBudget, TokenCounter
+
+    config = MedGemmaConfig.from_env()
+    return ContextBudget(
+        max_context_tokens=config.max_length,
+        counter=TokenCounter.for_llm(get_llm(), f"google/medgemma-{config.model_size}"),
+    )
+
+
+@st.cache_resource
+def get_scheduler():
+    """Escalonador partilhado: limita chamadas simultâneas ao LLM neste processo"""
+    from src.llm.scheduler import LLMScheduler
+    from src.observability import start_metrics_server
+
+    if port := os.getenv("METRICS_PORT"):
+        start_metrics_server(int(port))
+
+    tenant_limit = os.getenv("LLM_TENANT_CONCURRENCY")
+    return LLMScheduler(
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "1")),
+        max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+        per_tenant_limit=int(tenant_limit) if tenant_limit else None,
+    )
+
+
+@st.cache_resource
+def get_postgres_engine():
+    """Engine SQLAlchemy com pool de ligações PostgreSQL"""
+    from sqlalchemy import create_engine
+
+    url = (
+        f"postgresql+psycopg://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
+        f"@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}"
+        f"/{os.getenv('POSTGRES_DB')}"
+    )
+    return create_engine(url, pool_size=5, max_overflow=10, pool_pre_ping=True)
+
+
+@st.cache_resource
+def get_mongo_db():
+    """Base de dados MongoDB (o MongoClient gere o seu próprio pool)"""
+    from pymongo import MongoClient
+
+    client = MongoClient(
+        host=os.getenv("MONGO_HOST", "localhost"),
+        port=int(os.getenv("MONGO_PORT", "27017")),
+        maxPoolSize=20,
+    )
+    return client[os.getenv("MONGO_DB", "helth_db")]
+
+
+@st.cache_resource
+def get_vector_db():
+    """Cliente HTTP ChromaDB"""
+    import chromadb
+
+    return chromadb.HttpClient(
+        host=os.getenv("CHROMA_HOST", "localhost"),
+        port=int(os.getenv("CHROMA_PORT", "8000")),
+    )
+
+
+@st.cache_resource
+def get_async_stores():
+    """
+    Adaptadores assíncronos (PostgreSQL, MongoDB, ChromaDB) usados pelas ferramentas
+
+    Abertos no event loop partilhado: as consultas de todas as sessões correm
+    nessa thread em vez de bloquearem uma thread cada.
+    """
+    from src.db import AsyncStores, run_sync
+
+    stores = AsyncStores.from_env()
+    run_sync(stores.open())
+    return stores
+
+
+@st.cache_resource
+def get_feature_store():
+    """Feature store por paciente (ficheiro local; LRU partilhada pelas sessões)"""
+    from src.db import FeatureStore
+
+    return FeatureStore(os.getenv("FEATURE_STORE_PATH", "features_pacientes.db"))
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_dataset_overview(limit: int = 1000):
+    """Amostra de saude_transacional (cache de 10 min)"""
+    import pandas as pd
+    from sqlalchemy import text
+
+    with get_postgres_engine().connect() as conn:
+        return pd.read_sql(
+            text("SELECT * FROM saude_transacional LIMIT :limit"), conn, params={"limit": limit}
+        )
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_patient_profile(patient_id: str) -> dict | None:
+    """Registo mais recente de um paciente (cache de 1 min)"""
+    from sqlalchemy import text
+
+    from src.db.validation import PATIENT_ID_COLUMN, RECORD_ID_COLUMN
+
+    # registo_id (BIGSERIAL) cresce com a ingestão: o maior é o mais recente
+    query = text(
+        f"SELECT * FROM saude_transacional WHERE {PATIENT_ID_COLUMN} = :patient_id "
+        f"ORDER BY {RECORD_ID_COLUMN} DESC LIMIT 1"
+    )
+    with get_postgres_engine().connect() as conn:
+        row = conn.execute(query, {"patient_id": patient_id}).mappings().first()
+    return dict(row) if row else None
+
+
+def get_session_agent():
+    """
+    Agente da sessão atual
+
+    Criado na primeira interação da sessão e guardado em `st.session_state`; usa
+    o LLM e as ligações partilhadas, por isso não há recarregamento do modelo.
+    """
+    if "agent" not in st.session_state:
+        from src.agents.nesy_agent import MedicalDecisionAgent
+        from src.agents.router import SymbolicRouter
+        from src.agents.tools import build_tools
+
+        stores = get_async_stores()
+        config = MedGemmaConfig.from_env()
+
+        st.session_state.agent = MedicalDecisionAgent(
+            llm=get_llm(),
+            tools=build_tools(
+                stores.postgres, stores.chroma, stores.mongo, feature_store=get_feature_store()
+            ),
+            db_postgres=stores.postgres,
+            vector_db=stores.chroma,
+            mongo_db=stores.mongo,
+            context_budget=get_context_budget(),
+            scheduler=get_scheduler(),
+            router=SymbolicRouter(),
+            profiles=config.all_profiles(),
+            default_profile=config.generation_profile,
+        )
+    return st.session_state.agent
+
+
+def get_session_tenant() -> str:
+    """Identificador da sessão usado como tenant no escalonador"""
+    if "tenant" not in st.session_state:
+        from uuid import uuid4
+
+        st.session_state.tenant = uuid4().hex
+    return st.session_state.tenant
@@ -0,0 +1,54 @@
+"""
+Acesso assíncrono a dados (PostgreSQL, MongoDB, ChromaDB), event loop partilhado,
+sincronização incremental para o ChromaDB, feature store por paciente,
+validação na ingestão, layout/rollups das coleções temporais do MongoDB e
+deteção de quase-duplicados
+"""
+
+from .async_stores import AsyncChroma, AsyncMongo, AsyncPostgres, AsyncStore, AsyncStores
+from .dedup import NearDuplicateIndex
+from .feature_store import FEATURES, Feature, FeatureStore
+from .loop import get_loop, run_sync, submit
+from .mongo_storage import CollectionLayout, Rollup, ensure_layouts, run_rollups
+from .validation import (
+    PATIENT_ID_COLUMN,
+    RECORD_ID_COLUMN,
+    ColumnRule,
+    RowRule,
+    ValidationResult,
+    ensure_record_id,
+    quarantine,
+    validate,
+)
+from .vector_sync import MongoSource, PostgresSource, SyncState, VectorSync
+
+__all__ = [
+    "AsyncChroma",
+    "AsyncMongo",
+    "AsyncPostgres",
+    "AsyncStore",
+    "AsyncStores",
+    "CollectionLayout",
+    "ColumnRule",
+    "FEATURES",
+    "Feature",
+    "FeatureStore",
+    "MongoSource",
+    "NearDuplicateIndex",
+    "PATIENT_ID_COLUMN",
+    "PostgresSource",
+    "RECORD_ID_COLUMN",
+    "Rollup",
+    "RowRule",
+    "SyncState",
+    "ValidationResult",
+    "VectorSync",
+    "ensure_layouts",
+    "ensure_record_id",
+    "get_loop",
+    "quarantine",
+    "run_rollups",
+    "run_sync",
+    "submit",
+    "validate",
+]
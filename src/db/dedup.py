@@ -0,0 +1,296 @@
+"""
+Deteção de quase-duplicados com MinHash + LSH
+
+O crawler volta a gravar as mesmas notícias (às vezes com título ou URL
+ligeiramente diferentes) e o corpus do RAG acumula chunks repetidos, que
+gastam embeddings, espaço no índice e tokens no prompt. Este índice rejeita
+textos cuja semelhança de Jaccard estimada (shingles de caracteres) com um
+texto já visto passa o limiar:
+
+- MinHash: assinatura de `num_perm` mínimos por texto, calculada em NumPy
+  (shingles de `shingle_size` bytes empacotados em inteiros + hashing
+  multiply-shift), sem ciclos por shingle
+- LSH: a assinatura é dividida em bandas; só os textos que partilham uma
+  banda são candidatos (consulta O(bandas), não O(textos)) e os candidatos
+  são confirmados pela semelhança estimada
+
+O índice vive em memória e pode ser gravado/carregado (`save`/`load`, .npz).
+
+Exemplo:
+    index = NearDuplicateIndex.load_or_create("noticias.npz", threshold=0.8)
+    if index.insert_unique(url, title) is None:
+        collection.insert_one(...)          # não é duplicado
+    index.save()
+"""
+
+import logging
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any
+
+from src.observability.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEDUP_CHECKS = REGISTRY.counter(
+    "helth_dedup_checks_total", "Textos verificados no índice de duplicados por resultado"
+)
+
+DEFAULT_DEDUP_DIR = "~/.cache/helth/dedup"
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def dedup_path(name: str, dedup_dir: str | None = None) -> Path:
+    """Ficheiro de um índice (argumento, DEDUP_DIR ou default)"""
+    root = dedup_dir or os.getenv("DEDUP_DIR") or DEFAULT_DEDUP_DIR
+    return Path(root).expanduser() / f"{name}.npz"
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos nem pontuação, espaços colapsados"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def _lsh_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    """
+    (bandas, linhas por banda) com limiar LSH (1/b)^(1/r) o mais alto possível
+    sem passar `threshold`: favorece não perder duplicados; os falsos
+    candidatos são eliminados pela semelhança estimada
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below, key=lambda o: (1 / o[0]) ** (1 / o[1])) if below else options[-1]
+
+
+class NearDuplicateIndex:
+    """Índice MinHash/LSH de textos por chave (ex: URL, id do documento)"""
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        seed: int = 1,
+        path: str | Path | None = None,
+        name: str = "default",
+    ):
+        """
+        Args:
+            threshold: Semelhança de Jaccard a partir da qual é duplicado
+            num_perm: Tamanho da assinatura (mais = estimativa mais precisa)
+            shingle_size: Bytes por shingle (máx. 8)
+            seed: Semente das funções de hash (tem de ser igual entre execuções)
+            path: Ficheiro usado por `save()` sem argumentos
+            name: Nome nas métricas (ex: "noticias", "rag")
+        """
+        import numpy as np
+
+        if not 1 <= shingle_size <= 8:
+            raise ValueError("shingle_size tem de estar entre 1 e 8 bytes")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.path = Path(path) if path is not None else None
+        self.name = name
+        self.bands, self.rows = _lsh_bands(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        # Multiply-shift: h(x) = (a·x + b) mod 2^64 >> 32, com `a` ímpar
+        self._a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self._weights = np.uint64(256) ** np.arange(shingle_size - 1, -1, -1, dtype=np.uint64)
+
+        self._signatures: dict[str, Any] = {}
+        self._buckets: list[dict[bytes, set[str]]] = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    # ------------------------------------------------------------------
+    # Assinaturas
+    # ------------------------------------------------------------------
+
+    def signature(self, text: str):
+        """Assinatura MinHash (uint32[num_perm]) ou None se o texto estiver vazio"""
+        import numpy as np
+
+        data = np.frombuffer(normalize_text(text).encode("utf-8"), dtype=np.uint8)
+        if data.size == 0:
+            return None
+        if data.size < self.shingle_size:
+            data = np.pad(data, (0, self.shingle_size - data.size))
+        # Cada shingle de k bytes empacotado num inteiro (sem colisões)
+        windows = np.lib.stride_tricks.sliding_window_view(data, self.shingle_size)
+        shingles = np.unique(windows.astype(np.uint64) @ self._weights)
+        with np.errstate(over="ignore"):
+            hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature) -> list[bytes]:
+        return [
+            signature[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)
+        ]
+
+    # ------------------------------------------------------------------
+    # Consulta e inserção
+    # ------------------------------------------------------------------
+
+    def query(self, text: str, exclude: str | None = None) -> list[tuple[str, float]]:
+        """Chaves quase-duplicadas de `text`, com a semelhança estimada (maior primeiro)"""
+        signature = self.signature(text)
+        return [] if signature is None else self._query_signature(signature, exclude)
+
+    def _query_signature(self, signature, exclude: str | None) -> list[tuple[str, float]]:
+        import numpy as np
+
+        candidates: set[str] = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature), strict=True):
+            candidates.update(bucket.get(key, ()))
+        candidates.discard(exclude)
+        matches = []
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= self.threshold:
+                matches.append((candidate, similarity))
+        return sorted(matches, key=lambda m: m[1], reverse=True)
+
+    def add(self, key: str, text: str) -> None:
+        """Indexa `text` com a chave `key` (substitui a versão anterior da chave)"""
+        signature = self.signature(text)
+        self.remove(key)
+        if signature is not None:
+            self._insert(key, signature)
+
+    def _insert(self, key: str, signature) -> None:
+        self._signatures[key] = signature
+        for bucket, band in zip(self._buckets, self._band_keys(signature), strict=True):
+            bucket.setdefault(band, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket, band in zip(self._buckets, self._band_keys(signature), strict=True):
+            keys = bucket.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[band]
+
+    def insert_unique(self, key: str, text: str) -> str | None:
+        """
+        Indexa `text` se não for quase-duplicado de outro texto
+
+        Devolve None se foi indexado, ou a chave do texto existente mais
+        semelhante (e nesse caso não indexa). A versão anterior da própria
+        chave não conta como duplicado (atualizações do mesmo documento).
+        """
+        signature = self.signature(text)
+        if signature is None:
+            DEDUP_CHECKS.inc(index=self.name, result="empty")
+            return None
+        matches = self._query_signature(signature, exclude=key)
+        if matches:
+            DEDUP_CHECKS.inc(index=self.name, result="duplicate")
+            return matches[0][0]
+        self.remove(key)
+        self._insert(key, signature)
+        DEDUP_CHECKS.inc(index=self.name, result="unique")
+        return None
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    def save(self, path: str | Path | None = None) -> Path:
+        """Grava chaves e assinaturas em .npz (escrita atómica)"""
+        import numpy as np
+
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("Indicar o ficheiro do índice")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        keys = list(self._signatures)
+        signatures = (
+            np.stack([self._signatures[k] for k in keys])
+            if keys else np.empty((0, self.num_perm), dtype=np.uint32)
+        )
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            np.savez(
+                f,
+                keys=np.array(keys, dtype=str),
+                signatures=signatures,
+                params=np.array([self.threshold, self.num_perm, self.shingle_size, self.seed]),
+            )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(
+        cls, path: str | Path, name: str = "default", threshold: float | None = None
+    ) -> "NearDuplicateIndex":
+        """
+        Carrega um índice gravado (parâmetros do ficheiro; bandas reconstruídas)
+
+        `threshold` substitui o limiar gravado: as assinaturas não dependem dele,
+        só as bandas LSH, reconstruídas aqui de qualquer forma.
+        """
+        import numpy as np
+
+        with np.load(Path(path)) as data:
+            stored, num_perm, shingle_size, seed = data["params"].tolist()
+            if threshold is not None and threshold != stored:
+                logger.info(f"Índice de duplicados {path}: limiar {stored:g} -> {threshold:g}")
+            index = cls(
+                threshold=stored if threshold is None else threshold,
+                num_perm=int(num_perm),
+                shingle_size=int(shingle_size),
+                seed=int(seed),
+                path=path,
+                name=name,
+            )
+            for key, signature in zip(data["keys"].tolist(), data["signatures"], strict=True):
+                index._insert(key, signature)
+        return index
+
+    @classmethod
+    def load_or_create(cls, path: str | Path, **kwargs: Any) -> "NearDuplicateIndex":
+        """
+        Índice gravado em `path`, ou um novo (vazio) associado a `path`
+
+        Os parâmetros pedidos prevalecem sobre os gravados: um limiar diferente
+        aplica-se às assinaturas já gravadas; num_perm, shingle_size ou seed
+        diferentes tornam-nas incomparáveis (ValueError: apagar o ficheiro para
+        recriar o índice).
+        """
+        path = Path(path)
+        if path.exists():
+            try:
+                index = cls.load(
+                    path, name=kwargs.get("name", "default"), threshold=kwargs.get("threshold")
+                )
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Índice de duplicados ilegível ({path}: {e}); a recriar")
+            else:
+                mismatched = [
+                    f"{param}={getattr(index, param)} (pedido {kwargs[param]})"
+                    for param in ("num_perm", "shingle_size", "seed")
+                    if param in kwargs and kwargs[param] != getattr(index, param)
+                ]
+                if mismatched:
+                    raise ValueError(
+                        f"Índice de duplicados {path} gravado com outros parâmetros: "
+                        f"{', '.join(mismatched)}; apagar o ficheiro para o recriar"
+                    )
+                return index
+        return cls(path=path, **kwargs)
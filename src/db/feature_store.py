@@ -0,0 +1,396 @@
+"""
+Feature store por paciente: features pré-calculadas com leitura O(1)
+
+Em vez de o agente reagregar as linhas de saude_transacional e repetir as
+transformações de `tratamento_dados` a cada pergunta, as features são
+definidas uma vez (`FEATURES`) e materializadas por paciente numa tabela
+SQLite com chave primária (WAL: leituras não bloqueiam a ingestão).
+
+Atualização incremental: por paciente guarda-se também um estado agregável
+(número de registos, últimos valores não nulos e somas para o declive do
+IMC). Um lote novo só lê o estado dos pacientes que traz e funde-o, sem
+voltar às linhas antigas (`FeatureStore.update`, chamado na ingestão).
+
+Leitura: `get(patient_id)` passa por uma LRU em processo; um miss é uma
+consulta por chave primária. Escritas de outros processos (ex: ingestão)
+invalidam a LRU através de `PRAGMA data_version`, verificado no máximo uma
+vez por `refresh_interval`.
+
+Exemplo:
+    store = FeatureStore("features_pacientes.db")
+    store.rebuild(engine)                  # backfill a partir do PostgreSQL
+    store.get("P001")
+    # {"n_registos": 3, "hba1c_recente": 7.4, "imc_tendencia": 0.35, ...}
+"""
+
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal
+
+from src.ML.diabetes_dataset import CATEGORY_MAPPINGS
+from src.observability.metrics import REGISTRY
+
+from .validation import PATIENT_ID_COLUMN, RECORD_ID_COLUMN
+
+logger = logging.getLogger(__name__)
+
+FEATURE_LOOKUPS = REGISTRY.counter(
+    "helth_feature_store_lookups_total", "Leituras da feature store por resultado (hit, miss)"
+)
+FEATURE_UPDATES = REGISTRY.counter(
+    "helth_feature_store_updates_total", "Pacientes atualizados na feature store"
+)
+
+DEFAULT_PATH = "features_pacientes.db"
+
+# Mudar FEATURES ou o estado obriga a incrementar (e a correr rebuild)
+FEATURES_VERSION = 1
+
+# Pacientes por consulta IN (...) ao ler estados (limite de parâmetros do SQLite)
+_STATE_BATCH = 500
+
+
+@dataclass(frozen=True)
+class Feature:
+    """
+    Definição de uma feature a partir de uma coluna de saude_transacional
+
+    - latest: último valor não nulo
+    - trend: declive da regressão linear do valor pelo número do registo
+      (variação média por registo)
+    - category: último valor, codificado com CATEGORY_MAPPINGS (-1 = desconhecido)
+    """
+
+    name: str
+    column: str
+    kind: Literal["latest", "trend", "category"] = "latest"
+
+
+FEATURES: tuple[Feature, ...] = (
+    Feature("hba1c_recente", "hba1c"),
+    Feature("glicose_jejum_recente", "glucose_fasting"),
+    Feature("imc_recente", "bmi"),
+    Feature("imc_tendencia", "bmi", "trend"),
+    Feature("pressão_sistólica_recente", "systolic_bp"),
+    Feature("pressão_diastólica_recente", "diastolic_bp"),
+    Feature("pontuação_risco_diabetes", "diabetes_risk_score"),
+    Feature("género", "gender", "category"),
+    Feature("étnia", "ethnicity", "category"),
+    Feature("nível_educacional", "education_level", "category"),
+    Feature("nível_renda", "income_level", "category"),
+    Feature("status_emprego", "employment_status", "category"),
+    Feature("status_tabagismo", "smoking_status", "category"),
+    Feature("estágio_diabetes", "diabetes_stage", "category"),
+)
+
+FEATURE_NAMES: tuple[str, ...] = ("n_registos", *(f.name for f in FEATURES))
+
+
+def _scalar(value: Any) -> Any:
+    """Valor numpy/pandas → tipo JSON (NaN → None)"""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _slope(sums: list[float]) -> float | None:
+    """Declive a partir de [n, Σx, Σy, Σxy, Σx²] (None com menos de 2 pontos)"""
+    n, sx, sy, sxy, sxx = sums
+    denominator = n * sxx - sx * sx
+    if n < 2 or denominator == 0:
+        return None
+    return round((n * sxy - sx * sy) / denominator, 4)
+
+
+def features_from_state(state: dict[str, Any]) -> dict[str, Any]:
+    """Vetor de features (dict ordenado como FEATURE_NAMES) a partir do estado"""
+    features: dict[str, Any] = {"n_registos": state["n"]}
+    for feature in FEATURES:
+        if feature.kind == "trend":
+            features[feature.name] = _slope(state["trend"].get(feature.column, [0] * 5))
+            continue
+        value = state["latest"].get(feature.column)
+        if feature.kind == "category":
+            value = CATEGORY_MAPPINGS[feature.column].get(value, -1)
+        features[feature.name] = value
+    return features
+
+
+def merge_state(old: dict[str, Any] | None, new: dict[str, Any]) -> dict[str, Any]:
+    """Funde o estado de um lote (registos mais recentes) no estado anterior"""
+    if old is None:
+        return new
+    trend = dict(old["trend"])
+    for column, sums in new["trend"].items():
+        previous = trend.get(column, [0] * 5)
+        trend[column] = [a + b for a, b in zip(previous, sums, strict=True)]
+    return {"n": old["n"] + new["n"], "latest": {**old["latest"], **new["latest"]}, "trend": trend}
+
+
+class FeatureStore:
+    """Features por paciente em SQLite, com LRU em processo para as leituras"""
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_PATH,
+        id_column: str = PATIENT_ID_COLUMN,
+        order_column: str | None = None,
+        cache_size: int = 10_000,
+        refresh_interval: float = 1.0,
+    ):
+        """
+        Args:
+            path: Ficheiro SQLite (":memory:" para testes)
+            id_column: Coluna que identifica o paciente
+            order_column: Coluna que ordena os registos de um paciente (ex: data
+                da consulta); sem ela vale a ordem das linhas de cada lote
+            cache_size: Pacientes na LRU
+            refresh_interval: Segundos entre verificações de escritas externas
+        """
+        self.path = str(path)
+        self.id_column = id_column
+        self.order_column = order_column
+        self.cache_size = cache_size
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.RLock()
+        self._cache: OrderedDict[str, dict[str, Any] | None] = OrderedDict()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS features ("
+            "patient_id TEXT PRIMARY KEY, features TEXT NOT NULL, state TEXT NOT NULL, "
+            "version INTEGER NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._data_version = self._read_data_version()
+        self._checked_at = time.monotonic()
+
+        stale = self._conn.execute(
+            "SELECT COUNT(*) FROM features WHERE version != ?", (FEATURES_VERSION,)
+        ).fetchone()[0]
+        if stale:
+            logger.warning(
+                f"Feature store {self.path}: {stale} pacientes com features de outra versão "
+                "(executar rebuild)"
+            )
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_external_writes(self) -> None:
+        """Limpa a LRU se outra ligação escreveu desde a última verificação"""
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._cache.clear()
+
+    def get(self, patient_id: Any) -> dict[str, Any] | None:
+        """Features do paciente (None se não existir)"""
+        key = str(patient_id).strip()
+        with self._lock:
+            self._check_external_writes()
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                FEATURE_LOOKUPS.inc(result="hit")
+                features = self._cache[key]
+                return dict(features) if features is not None else None
+
+            FEATURE_LOOKUPS.inc(result="miss")
+            row = self._conn.execute(
+                "SELECT features FROM features WHERE patient_id = ?", (key,)
+            ).fetchone()
+            features = json.loads(row[0]) if row else None
+            # Pacientes inexistentes também ficam na LRU (até uma escrita)
+            self._cache[key] = features
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return dict(features) if features is not None else None
+
+    def vector(self, patient_id: Any) -> list[Any] | None:
+        """Features do paciente como lista, pela ordem de FEATURE_NAMES"""
+        features = self.get(patient_id)
+        if features is None:
+            return None
+        return [features.get(name) for name in FEATURE_NAMES]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def _batch_states(self, df: Any) -> dict[str, dict[str, Any]]:
+        """Estado agregado de cada paciente num lote (vetorizado por groupby)"""
+        import numpy as np
+        import pandas as pd
+
+        ids = df[self.id_column].astype(str).str.strip()
+        group = df.groupby(ids, sort=False)
+        counts = group.size()
+        states = {
+            key: {"n": int(n), "latest": {}, "trend": {}} for key, n in counts.items()
+        }
+
+        latest_columns = sorted({
+            f.column for f in FEATURES if f.kind != "trend" and f.column in df.columns
+        })
+        if latest_columns:
+            # groupby.last ignora nulos: último valor não nulo de cada coluna
+            last = group[latest_columns].last()
+            for key, row in zip(last.index, last.itertuples(index=False), strict=True):
+                states[key]["latest"] = {
+                    column: value
+                    for column, value in zip(latest_columns, map(_scalar, row), strict=True)
+                    if value is not None
+                }
+
+        position = group.cumcount().to_numpy(np.float64)
+        for column in sorted({f.column for f in FEATURES if f.kind == "trend"}):
+            if column not in df.columns:
+                continue
+            y = pd.to_numeric(df[column], errors="coerce").to_numpy(np.float64)
+            valid = ~np.isnan(y)
+            x = np.where(valid, position, 0.0)
+            y = np.where(valid, y, 0.0)
+            parts = {"n": valid.astype(np.float64), "sx": x, "sy": y, "sxy": x * y, "sxx": x * x}
+            sums = pd.DataFrame(parts).groupby(ids.to_numpy(), sort=False).sum()
+            for key, row in zip(sums.index, sums.itertuples(index=False), strict=True):
+                states[key]["trend"][column] = [float(v) for v in row]
+        return states
+
+    def _stored_states(self, keys: list[str]) -> dict[str, dict[str, Any]]:
+        stored = {}
+        for start in range(0, len(keys), _STATE_BATCH):
+            chunk = keys[start : start + _STATE_BATCH]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT patient_id, state FROM features WHERE patient_id IN ({placeholders})",
+                chunk,
+            )
+            stored.update((key, json.loads(state)) for key, state in rows)
+        return stored
+
+    @staticmethod
+    def _shift_positions(state: dict[str, Any], offset: int) -> dict[str, Any]:
+        """Desloca x (número do registo) dos registos de um lote em `offset`"""
+        if not offset:
+            return state
+        trend = {}
+        for column, (n, sx, sy, sxy, sxx) in state["trend"].items():
+            # x' = x + offset: Σx' = Σx + n·o, Σx'y = Σxy + o·Σy, Σx'² = Σx² + 2o·Σx + n·o²
+            trend[column] = [
+                n,
+                sx + n * offset,
+                sy,
+                sxy + offset * sy,
+                sxx + 2 * offset * sx + n * offset * offset,
+            ]
+        return {**state, "trend": trend}
+
+    def update(self, df: Any) -> int:
+        """
+        Funde um lote de registos (DataFrame) nas features dos seus pacientes
+
+        Os registos de cada paciente no lote são posteriores aos já guardados.
+        Devolve o número de pacientes atualizados.
+        """
+        if self.id_column not in df.columns:
+            raise ValueError(f"Coluna de paciente em falta no lote: {self.id_column}")
+        df = df[df[self.id_column].notna()]
+        if df.empty:
+            return 0
+        if self.order_column is not None and self.order_column in df.columns:
+            df = df.sort_values(self.order_column, kind="stable")
+
+        batch = self._batch_states(df)
+        now = time.time()
+        with self._lock:
+            stored = self._stored_states(list(batch))
+            rows = []
+            for key, new in batch.items():
+                old = stored.get(key)
+                new = self._shift_positions(new, old["n"] if old else 0)
+                state = merge_state(old, new)
+                rows.append((
+                    key,
+                    json.dumps(features_from_state(state), ensure_ascii=False),
+                    json.dumps(state, ensure_ascii=False),
+                    FEATURES_VERSION,
+                    now,
+                ))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO features (patient_id, features, state, version, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT(patient_id) DO UPDATE SET "
+                    "features = excluded.features, state = excluded.state, "
+                    "version = excluded.version, updated_at = excluded.updated_at",
+                    rows,
+                )
+            for key in batch:
+                self._cache.pop(key, None)
+            self._data_version = self._read_data_version()
+
+        FEATURE_UPDATES.inc(len(rows))
+        return len(rows)
+
+    def rebuild(
+        self, engine: Any, table: str = "saude_transacional", chunksize: int = 50_000
+    ) -> int:
+        """
+        Recalcula todas as features a partir da tabela (ex: depois de mudar FEATURES)
+
+        Lê a tabela em blocos pela ordem de `order_column` (se definida) e de
+        `registo_id` (a ordem de ingestão), e funde cada bloco como na ingestão:
+        o resultado é o mesmo das atualizações incrementais. Devolve o número
+        de pacientes.
+        """
+        import pandas as pd
+        from sqlalchemy import inspect, text
+
+        columns = {column["name"] for column in inspect(engine).get_columns(table)}
+        keys = [c for c in (self.order_column, RECORD_ID_COLUMN) if c and c in columns]
+        if RECORD_ID_COLUMN not in columns:
+            # Sem registo_id (ex: SQLite) a ordem das linhas não é garantida
+            logger.warning(
+                f"{table} sem {RECORD_ID_COLUMN}: features *_recente e tendências "
+                "dependem da ordem de leitura"
+            )
+        order = f" ORDER BY {', '.join(keys)}" if keys else ""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM features")
+            self._cache.clear()
+
+        with engine.connect() as conn:
+            for chunk in pd.read_sql(text(f"SELECT * FROM {table}{order}"), conn,
+                                      chunksize=chunksize):
+                self.update(chunk)
+        total = len(self)
+        logger.info(f"✓ Feature store reconstruída: {total} pacientes")
+        return total
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,49 @@
+"""
+Event loop partilhado para I/O assíncrono
+
+Uma única thread corre o loop asyncio do processo: as ligações assíncronas
+(PostgreSQL, MongoDB, ChromaDB) e os agentes de todas as sessões correm aqui,
+em vez de uma thread bloqueada por pedido.
+"""
+
+import asyncio
+import threading
+from collections.abc import Coroutine
+from concurrent.futures import Future
+from typing import Any
+
+_loop: asyncio.AbstractEventLoop | None = None
+_thread: threading.Thread | None = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Loop partilhado (criado e arrancado numa thread daemon no primeiro uso)"""
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(
+                target=_loop.run_forever, name="helth-async-io", daemon=True
+            )
+            _thread.start()
+        return _loop
+
+
+def submit(coro: Coroutine) -> Future:
+    """Agenda `coro` no loop partilhado e devolve um Future thread-safe"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro: Coroutine, timeout: float | None = None) -> Any:
+    """
+    Executa `coro` no loop partilhado e espera pelo resultado
+
+    Para código síncrono (ex: ferramentas chamadas por `AgentExecutor.invoke`);
+    não pode ser chamado a partir do próprio loop (bloquearia).
+    """
+    loop = get_loop()
+    if threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError("run_sync chamado dentro do event loop partilhado")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
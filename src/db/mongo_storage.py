@@ -0,0 +1,342 @@
+"""
+Organização das coleções temporais do MongoDB (logs_saude, noticias_saude)
+
+Sem índices, as coleções só crescem e cada consulta percorre-as por inteiro.
+Aqui cada coleção tem um layout (`CollectionLayout`):
+- logs_saude: coleção time-series (MongoDB >= 5.0), agrupada internamente em
+  buckets por paciente e tempo, com expiração automática (TTL) dos logs
+  brutos. Em servidores antigos (ou numa coleção normal já existente) o
+  fallback é um índice TTL sobre o campo temporal.
+- noticias_saude: coleção normal com índice (source, crawled_at).
+- Índices compostos (meta, tempo desc) para as consultas do agente: logs
+  recentes de um paciente e notícias recentes de uma fonte
+  (`recent_logs`, `recent_news`).
+
+Rollups (`Rollup`): agregações periódicas em coleções de resumo (contagens
+por paciente/hora e por fonte/dia) com `$merge`, idempotentes. Cada passagem
+recalcula desde a última marca menos um bucket (apanha dados atrasados); os
+resumos sobrevivem à expiração dos logs brutos.
+
+Notas:
+- Coleções normais existentes não passam a time-series sozinhas:
+  `migrate_to_timeseries` copia-as para uma coleção nova (a antiga fica com
+  sufixo _legacy_<data>).
+- Coleções time-series não suportam change streams nem têm índice em `_id`:
+  `MongoSource.for_layout` (vector_sync) faz polling por (tempo, meta). As
+  expirações por TTL não aparecem no polling: só a reconciliação do
+  vector_sync as retira do ChromaDB.
+
+Exemplo:
+    ensure_layouts(db)                       # no arranque / deploy
+    run_rollups(db)                          # periódico (scripts/mongo_storage.py)
+    recent_logs(db, patient_id="P001", hours=24)
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any, Literal
+
+from src.observability.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_DURATION = REGISTRY.histogram(
+    "helth_mongo_rollup_duration_seconds", "Duração de cada rollup do MongoDB"
+)
+
+# Marcas dos rollups (um documento por rollup)
+ROLLUP_STATE_COLLECTION = "_rollups"
+
+_UNIT_DELTA = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def _days(env: str, default: int | None) -> int | None:
+    """Dias de retenção a partir do ambiente ("" ou "0" = sem expiração)"""
+    value = os.getenv(env)
+    if value is None:
+        return default
+    return int(value) if value.strip() not in ("", "0") else None
+
+
+@dataclass(frozen=True)
+class CollectionLayout:
+    """
+    Layout de uma coleção temporal
+
+    - time_field: campo datetime de cada documento
+    - meta_field: campo que identifica a série (ex: paciente, fonte)
+    - timeseries: criar como coleção time-series (se o servidor suportar)
+    - ttl_days: expiração dos documentos (None = nunca)
+    - indexes: índices compostos extra, ex: [("source", 1), ("crawled_at", -1)]
+    """
+
+    name: str
+    time_field: str
+    meta_field: str | None = None
+    timeseries: bool = False
+    granularity: Literal["seconds", "minutes", "hours"] = "minutes"
+    ttl_days: int | None = None
+    indexes: tuple[tuple[tuple[str, int], ...], ...] = ()
+
+    @property
+    def ttl_seconds(self) -> int | None:
+        return self.ttl_days * 86400 if self.ttl_days else None
+
+    @property
+    def query_index(self) -> list[tuple[str, int]]:
+        """Índice das consultas por janela recente: (meta, tempo desc)"""
+        keys = [(self.meta_field, 1)] if self.meta_field else []
+        return [*keys, (self.time_field, -1)]
+
+
+def default_layouts() -> list[CollectionLayout]:
+    """Layouts de logs_saude e noticias_saude (retenção via LOGS_TTL_DAYS/NEWS_TTL_DAYS)"""
+    return [
+        CollectionLayout(
+            name="logs_saude",
+            time_field="timestamp",
+            meta_field="patient_id",
+            timeseries=True,
+            ttl_days=_days("LOGS_TTL_DAYS", 90),
+        ),
+        CollectionLayout(
+            name="noticias_saude",
+            time_field="crawled_at",
+            meta_field="source",
+            ttl_days=_days("NEWS_TTL_DAYS", None),
+            indexes=((("url", 1),),),
+        ),
+    ]
+
+
+def _supports_timeseries(db: Any) -> bool:
+    return tuple(db.client.server_info()["versionArray"][:2]) >= (5, 0)
+
+
+def _collection_info(db: Any, name: str) -> dict | None:
+    return next(iter(db.list_collections(filter={"name": name})), None)
+
+
+def _ensure_ttl_index(collection: Any, layout: CollectionLayout) -> None:
+    """TTL por índice (coleções normais); atualiza a expiração se já existir"""
+    index_name = f"{layout.time_field}_ttl"
+    existing = collection.index_information().get(index_name)
+    if layout.ttl_seconds is None:
+        if existing:
+            collection.drop_index(index_name)
+        return
+    if existing is None:
+        collection.create_index(
+            [(layout.time_field, 1)], name=index_name, expireAfterSeconds=layout.ttl_seconds
+        )
+    elif existing.get("expireAfterSeconds") != layout.ttl_seconds:
+        collection.database.command(
+            "collMod",
+            collection.name,
+            index={"name": index_name, "expireAfterSeconds": layout.ttl_seconds},
+        )
+
+
+def ensure_layout(db: Any, layout: CollectionLayout) -> str:
+    """
+    Cria a coleção (ou ajusta a existente) e os índices do layout
+
+    Idempotente: pode correr em cada arranque. Devolve o tipo resultante
+    ("timeseries" ou "collection").
+    """
+    info = _collection_info(db, layout.name)
+    if info is None and layout.timeseries and _supports_timeseries(db):
+        options = {"timeField": layout.time_field, "granularity": layout.granularity}
+        if layout.meta_field:
+            options["metaField"] = layout.meta_field
+        kwargs = {"expireAfterSeconds": layout.ttl_seconds} if layout.ttl_seconds else {}
+        db.create_collection(layout.name, timeseries=options, **kwargs)
+        logger.info(f"✓ Coleção time-series criada: {layout.name}")
+        info = _collection_info(db, layout.name)
+
+    collection = db[layout.name]
+    kind = "timeseries" if info and info.get("type") == "timeseries" else "collection"
+    if kind == "timeseries":
+        current = info.get("options", {}).get("expireAfterSeconds")
+        if current != layout.ttl_seconds:
+            db.command("collMod", layout.name, expireAfterSeconds=layout.ttl_seconds or "off")
+    else:
+        if layout.timeseries and info is not None:
+            logger.warning(
+                f"{layout.name} é uma coleção normal: TTL por índice "
+                "(migrate_to_timeseries para converter)"
+            )
+        _ensure_ttl_index(collection, layout)
+
+    collection.create_index(layout.query_index)
+    if kind == "timeseries" or layout.ttl_seconds is None:
+        # Janelas recentes sem meta (o índice TTL já cobre o tempo nas normais)
+        collection.create_index([(layout.time_field, -1)])
+    for keys in layout.indexes:
+        collection.create_index(list(keys))
+    return kind
+
+
+def ensure_layouts(db: Any, layouts: list[CollectionLayout] | None = None) -> dict[str, str]:
+    """Aplica todos os layouts; devolve {coleção: tipo}"""
+    return {layout.name: ensure_layout(db, layout) for layout in layouts or default_layouts()}
+
+
+def migrate_to_timeseries(
+    db: Any, layout: CollectionLayout, batch_size: int = 10_000
+) -> int:
+    """
+    Converte uma coleção normal em time-series (cópia em lotes)
+
+    A original é renomeada para <nome>_legacy_<data> e não é apagada.
+    Documentos sem o campo temporal recebem a data de criação do `_id`.
+    Devolve o número de documentos copiados.
+    """
+    info = _collection_info(db, layout.name)
+    if info is None or info.get("type") == "timeseries":
+        return 0
+    if not _supports_timeseries(db):
+        raise RuntimeError("Coleções time-series exigem MongoDB >= 5.0")
+
+    legacy = f"{layout.name}_legacy_{datetime.now(UTC):%Y%m%d%H%M%S}"
+    db[layout.name].rename(legacy)
+    ensure_layout(db, layout)
+
+    copied, batch = 0, []
+    target = db[layout.name]
+    for doc in db[legacy].find({}).sort("_id", 1):
+        if not isinstance(doc.get(layout.time_field), datetime):
+            doc[layout.time_field] = doc["_id"].generation_time
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            copied += len(target.insert_many(batch, ordered=False).inserted_ids)
+            batch = []
+    if batch:
+        copied += len(target.insert_many(batch, ordered=False).inserted_ids)
+    logger.info(f"✓ {copied} documentos migrados para {layout.name} (original: {legacy})")
+    return copied
+
+
+# ----------------------------------------------------------------------
+# Rollups
+# ----------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Rollup:
+    """
+    Resumo periódico: contagens por (grupo, bucket temporal) numa coleção
+
+    O `_id` de cada resumo é {grupo..., bucket}: o `$merge` substitui os
+    buckets recalculados sem duplicar.
+    """
+
+    name: str
+    source: str
+    target: str
+    time_field: str
+    group_fields: tuple[str, ...]
+    unit: Literal["hour", "day"] = "hour"
+    # Campos numéricos somados além da contagem
+    sum_fields: tuple[str, ...] = ()
+
+    def pipeline(self, start: datetime, end: datetime) -> list[dict]:
+        group_id = {name: f"${name}" for name in self.group_fields}
+        group_id["bucket"] = {"$dateTrunc": {"date": f"${self.time_field}", "unit": self.unit}}
+        group = {"_id": group_id, "count": {"$sum": 1}}
+        group.update({f"{name}_sum": {"$sum": f"${name}"} for name in self.sum_fields})
+        return [
+            {"$match": {self.time_field: {"$gte": start, "$lt": end}}},
+            {"$group": group},
+            {"$set": {"updated_at": "$$NOW"}},
+            {"$merge": {"into": self.target, "on": "_id", "whenMatched": "replace"}},
+        ]
+
+
+DEFAULT_ROLLUPS: tuple[Rollup, ...] = (
+    Rollup(
+        name="logs_saude_horario",
+        source="logs_saude",
+        target="logs_saude_horario",
+        time_field="timestamp",
+        group_fields=("patient_id",),
+        unit="hour",
+    ),
+    Rollup(
+        name="noticias_saude_diario",
+        source="noticias_saude",
+        target="noticias_saude_diario",
+        time_field="crawled_at",
+        group_fields=("source",),
+        unit="day",
+    ),
+)
+
+
+def _truncate(moment: datetime, unit: str) -> datetime:
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if unit == "day" else moment
+
+
+def run_rollup(db: Any, rollup: Rollup, now: datetime | None = None) -> tuple[datetime, datetime]:
+    """
+    Recalcula os buckets desde a última marca (menos um bucket) até agora
+
+    Sem marca (primeira passagem) agrega o histórico inteiro. Devolve a
+    janela agregada.
+    """
+    now = now or datetime.now(UTC)
+    state = db[ROLLUP_STATE_COLLECTION]
+    mark = (state.find_one({"_id": rollup.name}) or {}).get("until")
+    if mark is None:
+        start = datetime(1970, 1, 1, tzinfo=UTC)
+    else:
+        if mark.tzinfo is None:
+            mark = mark.replace(tzinfo=UTC)
+        start = _truncate(mark, rollup.unit) - _UNIT_DELTA[rollup.unit]
+
+    begin = time.perf_counter()
+    db[rollup.source].aggregate(rollup.pipeline(start, now))
+    ROLLUP_DURATION.observe(time.perf_counter() - begin, rollup=rollup.name)
+    state.update_one({"_id": rollup.name}, {"$set": {"until": now}}, upsert=True)
+    return start, now
+
+
+def run_rollups(db: Any, rollups: tuple[Rollup, ...] = DEFAULT_ROLLUPS) -> None:
+    """Uma passagem de todos os rollups (coleções de origem inexistentes são ignoradas)"""
+    existing = set(db.list_collection_names())
+    for rollup in rollups:
+        if rollup.source not in existing:
+            continue
+        start, end = run_rollup(db, rollup)
+        logger.info(f"Rollup {rollup.name}: {start:%Y-%m-%d %H:%M} → {end:%Y-%m-%d %H:%M}")
+
+
+# ----------------------------------------------------------------------
+# Consultas por janela recente (usam o índice (meta, tempo desc))
+# ----------------------------------------------------------------------
+
+
+def recent_logs(
+    db: Any, patient_id: str | None = None, hours: float = 24, limit: int = 100
+) -> list[dict]:
+    """Logs mais recentes (de um paciente, se indicado) nas últimas `hours` horas"""
+    query: dict[str, Any] = {"timestamp": {"$gte": datetime.now(UTC) - timedelta(hours=hours)}}
+    if patient_id is not None:
+        query["patient_id"] = patient_id
+    return list(db["logs_saude"].find(query).sort("timestamp", -1).limit(limit))
+
+
+def recent_news(
+    db: Any, source: str | None = None, days: float = 7, limit: int = 20
+) -> list[dict]:
+    """Notícias mais recentes (de uma fonte, se indicada) nos últimos `days` dias"""
+    query: dict[str, Any] = {"crawled_at": {"$gte": datetime.now(UTC) - timedelta(days=days)}}
+    if source is not None:
+        query["source"] = source
+    return list(
+        db["noticias_saude"].find(query, {"_id": 0}).sort("crawled_at", -1).limit(limit)
+    )
@@ -0,0 +1,286 @@
+"""
+Validação na ingestão e quarentena de registos inválidos
+
+O esquema é declarativo (`ColumnRule` por coluna e `RowRule` entre colunas):
+tipo, intervalo plausível e conjunto de categorias permitidas. Cada bloco lido
+do CSV é validado com máscaras vetorizadas (NumPy/pandas), sem ciclos por
+linha; as categorias são verificadas sobre os valores distintos (via
+Categorical) e não linha a linha.
+
+As linhas válidas seguem normalizadas (números convertidos, espaços à volta
+das categorias removidos); as inválidas vão em bloco para a tabela de
+quarentena com o motivo, em vez de só serem descobertas mais tarde (ou
+convertidas em -1 por `tratamento_dados`).
+
+Identificação: cada linha de saude_transacional tem de trazer o paciente
+(`PATIENT_ID_COLUMN`, obrigatório no esquema), usado pela feature store e pelo
+perfil na app. O diabetes_dataset.csv original não tem esta coluna: a
+ingestão falha com a lista das colunas em falta em vez de gravar linhas que
+não se associam a nenhum paciente. Como um paciente pode ter vários
+registos, `ensure_record_id` acrescenta à tabela um id único por linha
+(`RECORD_ID_COLUMN`), usado pela sincronização com o ChromaDB.
+
+Exemplo:
+    result = validate(chunk)
+    result.valid.to_sql("saude_transacional", engine, if_exists="append", index=False)
+    ensure_record_id(engine)
+    quarantine(result.invalid, engine, source="saude.csv")
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any, Literal
+
+from src.ML.diabetes_dataset import CATEGORY_MAPPINGS
+from src.observability.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_ROWS = REGISTRY.counter(
+    "helth_ingest_validation_rows_total", "Linhas validadas na ingestão por resultado"
+)
+VALIDATION_FAILURES = REGISTRY.counter(
+    "helth_ingest_validation_failures_total", "Falhas de validação por regra"
+)
+
+QUARANTINE_TABLE = "saude_quarentena"
+REASON_COLUMN = "motivo"
+
+# Paciente de cada registo (obrigatório) e id único de cada linha de saude_transacional
+PATIENT_ID_COLUMN = "patient_id"
+RECORD_ID_COLUMN = "registo_id"
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    """
+    Regra de uma coluna
+
+    - kind: "int", "float" ou "category" (texto; sem `allowed`, qualquer valor)
+    - min_value/max_value: intervalo plausível (inclusivo)
+    - allowed: categorias permitidas (depois de remover espaços)
+    - required: a coluna tem de existir e não pode ter nulos
+    """
+
+    column: str
+    kind: Literal["int", "float", "category"] = "float"
+    min_value: float | None = None
+    max_value: float | None = None
+    allowed: frozenset[str] | None = None
+    required: bool = False
+
+
+@dataclass(frozen=True)
+class RowRule:
+    """Regra entre colunas: expressão `DataFrame.eval` que tem de ser verdadeira"""
+
+    name: str
+    expression: str
+    columns: tuple[str, ...]
+
+
+def _categories(column: str) -> frozenset[str]:
+    return frozenset(CATEGORY_MAPPINGS[column])
+
+
+# Esquema de saude_transacional (diabetes_dataset.csv); colunas fora do
+# esquema passam sem validação
+SAUDE_SCHEMA: tuple[ColumnRule, ...] = (
+    ColumnRule(PATIENT_ID_COLUMN, "category", required=True),
+    ColumnRule("age", "int", 0, 120, required=True),
+    ColumnRule("gender", "category", allowed=_categories("gender"), required=True),
+    ColumnRule("ethnicity", "category", allowed=_categories("ethnicity")),
+    ColumnRule("education_level", "category", allowed=_categories("education_level")),
+    ColumnRule("income_level", "category", allowed=_categories("income_level")),
+    ColumnRule("employment_status", "category", allowed=_categories("employment_status")),
+    ColumnRule("smoking_status", "category", allowed=_categories("smoking_status")),
+    ColumnRule("diabetes_stage", "category", allowed=_categories("diabetes_stage")),
+    ColumnRule("bmi", "float", 10, 80),
+    ColumnRule("waist_to_hip_ratio", "float", 0.4, 2.0),
+    ColumnRule("systolic_bp", "int", 60, 260),
+    ColumnRule("diastolic_bp", "int", 30, 160),
+    ColumnRule("heart_rate", "int", 25, 250),
+    ColumnRule("glucose_fasting", "float", 30, 600),
+    ColumnRule("glucose_postprandial", "float", 30, 800),
+    ColumnRule("hba1c", "float", 3, 20),
+    ColumnRule("insulin_level", "float", 0, 300),
+    ColumnRule("cholesterol_total", "float", 50, 600),
+    ColumnRule("hdl_cholesterol", "float", 5, 200),
+    ColumnRule("ldl_cholesterol", "float", 10, 400),
+    ColumnRule("triglycerides", "float", 10, 2000),
+    ColumnRule("diabetes_risk_score", "float", 0, 100),
+    ColumnRule("alcohol_consumption_per_week", "float", 0, 100),
+    ColumnRule("physical_activity_minutes_per_week", "float", 0, 5000),
+    ColumnRule("sleep_hours_per_day", "float", 0, 24),
+    ColumnRule("screen_time_hours_per_day", "float", 0, 24),
+    ColumnRule("diet_score", "float", 0, 10),
+    ColumnRule("hypertension_history", "int", 0, 1),
+    ColumnRule("family_history_diabetes", "int", 0, 1),
+    ColumnRule("cardiovascular_history", "int", 0, 1),
+    ColumnRule("diagnosed_diabetes", "int", 0, 1),
+)
+
+SAUDE_ROW_RULES: tuple[RowRule, ...] = (
+    RowRule("pa_sistolica_maior", "systolic_bp > diastolic_bp", ("systolic_bp", "diastolic_bp")),
+)
+
+
+@dataclass
+class ValidationResult:
+    """Linhas válidas (normalizadas), inválidas (com motivo) e falhas por regra"""
+
+    valid: Any
+    invalid: Any
+    failures: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return len(self.valid) + len(self.invalid)
+
+
+def _check_numeric(series: Any, rule: ColumnRule) -> tuple[Any, dict[str, Any]]:
+    """Converte a coluna e devolve (valores, {motivo: máscara de falha})"""
+    import numpy as np
+    import pandas as pd
+
+    values = series if pd.api.types.is_numeric_dtype(series) else pd.to_numeric(
+        series, errors="coerce"
+    )
+    array = values.to_numpy(np.float64, na_value=np.nan)
+    missing = np.isnan(array)
+    masks = {}
+    if values is not series:
+        # Não numérico: havia valor e a conversão deu NaN
+        masks["tipo"] = missing & series.notna().to_numpy()
+    if rule.kind == "int":
+        fractional = ~missing & (array != np.floor(array))
+        masks["tipo"] = masks["tipo"] | fractional if "tipo" in masks else fractional
+    out_of_range = np.zeros(len(array), dtype=bool)
+    if rule.min_value is not None:
+        out_of_range |= array < rule.min_value
+    if rule.max_value is not None:
+        out_of_range |= array > rule.max_value
+    masks["intervalo"] = out_of_range
+    if rule.required:
+        masks["nulo"] = series.isna().to_numpy()
+    return values, masks
+
+
+def _check_category(series: Any, rule: ColumnRule) -> tuple[Any, dict[str, Any]]:
+    """Remove espaços e verifica as categorias sobre os valores distintos"""
+    import numpy as np
+    import pandas as pd
+
+    categorical = series.astype("category")
+    categories = categorical.cat.categories.astype(str)
+    stripped = categories.str.strip()
+    codes = categorical.cat.codes.to_numpy()
+    masks = {}
+    if rule.allowed is not None:
+        # Uma verificação por categoria distinta, propagada pelos códigos (-1 = nulo)
+        bad = np.append(~stripped.isin(rule.allowed), False)
+        masks["categoria"] = bad[codes]
+    if rule.required:
+        masks["nulo"] = codes == -1
+    if stripped.equals(categories):
+        return series, masks
+    lookup = np.append(stripped.to_numpy(dtype=object), None)
+    return pd.Series(lookup[codes], index=series.index, dtype=object), masks
+
+
+def validate(
+    df: Any,
+    schema: tuple[ColumnRule, ...] = SAUDE_SCHEMA,
+    row_rules: tuple[RowRule, ...] = SAUDE_ROW_RULES,
+) -> ValidationResult:
+    """
+    Valida um bloco e separa as linhas válidas das inválidas
+
+    Colunas obrigatórias em falta invalidam o ficheiro (ValueError), não linhas.
+    """
+    import numpy as np
+
+    missing = [r.column for r in schema if r.required and r.column not in df.columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias em falta: {', '.join(missing)}")
+
+    normalized = {}
+    rule_masks: dict[str, Any] = {}
+    for rule in schema:
+        if rule.column not in df.columns:
+            continue
+        check = _check_category if rule.kind == "category" else _check_numeric
+        values, masks = check(df[rule.column], rule)
+        if values is not df[rule.column]:
+            normalized[rule.column] = values
+        for reason, mask in masks.items():
+            if np.any(mask):
+                rule_masks[f"{rule.column}:{reason}"] = mask
+    # Só as colunas alteradas são substituídas (sem copiar o bloco inteiro)
+    normalized = df.assign(**normalized) if normalized else df
+
+    for rule in row_rules:
+        if not all(column in df.columns for column in rule.columns):
+            continue
+        present = normalized[list(rule.columns)].notna().all(axis=1).to_numpy()
+        holds = normalized.eval(rule.expression).to_numpy(bool)
+        mask = present & ~holds
+        if mask.any():
+            rule_masks[rule.name] = mask
+
+    bad = np.zeros(len(df), dtype=bool)
+    for mask in rule_masks.values():
+        bad |= mask
+
+    invalid = df[bad].copy()
+    if len(invalid):
+        # Motivos só para as linhas inválidas
+        reasons = np.full(len(invalid), "", dtype=object)
+        for name, mask in rule_masks.items():
+            reasons[mask[bad]] += name + ";"
+        invalid[REASON_COLUMN] = [reason.rstrip(";") for reason in reasons]
+
+    failures = {name: int(mask.sum()) for name, mask in rule_masks.items()}
+    for name, count in failures.items():
+        VALIDATION_FAILURES.inc(count, rule=name)
+    VALIDATION_ROWS.inc(len(df) - len(invalid), result="valid")
+    VALIDATION_ROWS.inc(len(invalid), result="quarantined")
+    valid = normalized[~bad] if len(invalid) else normalized
+    return ValidationResult(valid=valid, invalid=invalid, failures=failures)
+
+
+def quarantine(
+    invalid: Any, engine: Any, source: str | None = None, table: str = QUARANTINE_TABLE
+) -> int:
+    """Grava as linhas inválidas (valores originais + motivo) na quarentena, em bloco"""
+    if invalid is None or invalid.empty:
+        return 0
+    # Tudo em texto: valores inválidos (ex: "abc" numa coluna numérica) não
+    # colidem com o tipo das colunas já criadas na tabela
+    data = invalid.drop(columns=[REASON_COLUMN])
+    rows = data.astype(str).where(data.notna(), None)
+    rows[REASON_COLUMN] = invalid[REASON_COLUMN]
+    rows["origem"] = source
+    rows["quarentena_em"] = datetime.now(UTC)
+    rows.to_sql(table, engine, if_exists="append", index=False, chunksize=10_000)
+    logger.warning(f"{len(rows)} registos em quarentena ({table})")
+    return len(rows)
+
+
+def ensure_record_id(engine: Any, table: str = "saude_transacional") -> None:
+    """
+    Acrescenta a `table` o id único por linha (`RECORD_ID_COLUMN`), se faltar
+
+    As linhas já gravadas recebem um id; as seguintes (`to_sql` sem a coluna)
+    recebem-no por omissão da sequência. Só PostgreSQL (noutras bases, ex: o
+    SQLite dos benchmarks, não faz nada).
+    """
+    from sqlalchemy import text
+
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {RECORD_ID_COLUMN} BIGSERIAL"
+        ))
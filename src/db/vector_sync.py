@@ -0,0 +1,516 @@
+"""
+Sincronização incremental das bases transacionais para o ChromaDB
+
+Em vez de reindexar tudo, cada fonte guarda uma marca (high-water mark) e só
+lê o que mudou desde a última passagem; as alterações são convertidas em
+documentos e enviadas ao ChromaDB em lotes (`upsert`/`delete`). O custo de
+cada passagem é proporcional às alterações, não ao tamanho do corpus.
+
+Fontes:
+- PostgresSource: tabela (ex: saude_transacional) com paginação por
+  (marca, id). A marca por omissão é a coluna de sistema `xmin` (transação
+  que escreveu a linha): apanha inserções e atualizações sem alterar o
+  esquema. Alternativa: uma expressão numérica, ex:
+  "extract(epoch from updated_at)".
+- MongoSource: change streams (inserções, atualizações e remoções; exige
+  replica set) com polling por `_id`/campo de atualização como fallback. O
+  backfill da primeira passagem grava a sua posição com o resume token:
+  uma falha a meio retoma na página seguinte. Coleções time-series (ex:
+  logs_saude) não têm change streams nem índice em `_id`: o polling usa o
+  campo temporal e o meta (`MongoSource.for_layout`), como o índice
+  (meta, tempo) do layout.
+
+Remoções: os change streams trazem-nas; no PostgreSQL (e no polling do
+MongoDB) só com uma coluna de remoção lógica ou com `VectorSync.reconcile`,
+que compara apenas os ids e deve correr com pouca frequência. As expirações
+por TTL (logs_saude) também só saem do índice na reconciliação
+(scripts/vector_sync.py agenda-a de hora a hora para essas coleções).
+
+Duplicados: com `dedup` (src.db.dedup.NearDuplicateIndex), documentos
+quase-iguais a outros já indexados não chegam ao ChromaDB.
+
+Exemplo:
+    sync = VectorSync(
+        chroma.get_or_create_collection(RAG_COLLECTION),
+        [PostgresSource(engine), MongoSource(db["logs_saude"], text_field="texto")],
+        SyncState("vector_sync.json"),
+    )
+    sync.run_forever(interval=2.0)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from src.observability.metrics import REGISTRY
+
+from .validation import RECORD_ID_COLUMN
+
+logger = logging.getLogger(__name__)
+
+SYNC_CHANGES = REGISTRY.counter(
+    "helth_vector_sync_changes_total", "Documentos enviados ao ChromaDB por fonte e operação"
+)
+SYNC_DURATION = REGISTRY.histogram(
+    "helth_vector_sync_duration_seconds", "Duração de cada passagem de sincronização"
+)
+SYNC_LAST_SUCCESS = REGISTRY.gauge(
+    "helth_vector_sync_last_success_timestamp",
+    "Fim da última passagem bem-sucedida (epoch); frescura = agora - valor",
+)
+
+# Limite de caracteres do texto de cada documento (o resto não é pesquisável)
+MAX_DOCUMENT_CHARS = 4000
+
+
+@dataclass
+class Change:
+    """Alteração de um registo: `document=None` significa remoção"""
+
+    id: str
+    document: str | None
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+
+def render_record(record: dict[str, Any], exclude: set[str] | None = None) -> str:
+    """Registo em texto "campo: valor; ..." (campos vazios omitidos)"""
+    exclude = exclude or set()
+    text = "; ".join(
+        f"{key}: {value}"
+        for key, value in record.items()
+        if key not in exclude and value is not None and value != ""
+    )
+    return text[:MAX_DOCUMENT_CHARS]
+
+
+class SyncState:
+    """Marcas de cada fonte num ficheiro JSON (escrito atomicamente)"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.marks: dict[str, Any] = {}
+        if self.path.exists():
+            self.marks = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def get(self, source: str) -> Any:
+        return self.marks.get(source)
+
+    def set(self, source: str, mark: Any) -> None:
+        self.marks[source] = mark
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps(self.marks, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+# ----------------------------------------------------------------------
+# Fontes
+# ----------------------------------------------------------------------
+
+
+class PostgresSource:
+    """Linhas novas ou alteradas de uma tabela PostgreSQL, por ordem da marca"""
+
+    XMIN = "xmin::text::bigint"
+
+    def __init__(
+        self,
+        engine: Any,
+        table: str = "saude_transacional",
+        id_column: str = RECORD_ID_COLUMN,
+        change_expression: str = XMIN,
+        deleted_column: str | None = None,
+        page_size: int = 1000,
+    ):
+        """
+        Args:
+            engine: Engine SQLAlchemy
+            table: Tabela a sincronizar
+            id_column: Coluna com o id único de cada registo (em saude_transacional,
+                acrescentada na ingestão por `ensure_record_id`)
+            change_expression: Expressão numérica que cresce a cada escrita
+            deleted_column: Coluna de remoção lógica (verdadeira = remover do índice)
+            page_size: Linhas por consulta
+        """
+        self.engine = engine
+        self.table = table
+        self.id_column = id_column
+        self.change_expression = change_expression
+        self.deleted_column = deleted_column
+        self.page_size = page_size
+        self.name = f"postgres:{table}"
+
+    def _horizon(self, conn: Any) -> int | None:
+        """
+        Transação ativa mais antiga (só com `xmin`)
+
+        Transações que começaram antes mas fazem commit depois de uma passagem
+        têm `xmin` menor do que a marca; a marca gravada nunca passa deste
+        limite, para essas linhas serem lidas na passagem seguinte. Assume que
+        não houve wraparound do contador de transações desde a última passagem.
+        """
+        from sqlalchemy import text
+
+        if self.change_expression != self.XMIN:
+            return None
+        horizon = conn.execute(
+            text("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        ).scalar()
+        return int(horizon) % 2**32
+
+    def changes(self, mark: Any) -> Iterator[tuple[list[Change], Any]]:
+        """Páginas de alterações, cada uma com a marca a gravar depois de aplicada"""
+        from sqlalchemy import text
+
+        last_value, last_id = mark if mark else (None, None)
+        select = f"SELECT {self.change_expression} AS _sync_mark, * FROM {self.table}"
+        order = f"ORDER BY 1, {self.id_column}::text LIMIT :limit"
+        after = f"WHERE ({self.change_expression}, {self.id_column}::text) > (:value, :last_id)"
+
+        with self.engine.connect() as conn:
+            horizon = self._horizon(conn)
+            while True:
+                sql = text(f"{select} {order}" if last_value is None else
+                           f"{select} {after} {order}")
+                params = {"value": last_value, "last_id": last_id, "limit": self.page_size}
+                rows = conn.execute(sql, params).mappings().all()
+                if not rows:
+                    return
+
+                page = []
+                for row in rows:
+                    record = dict(row)
+                    value = record.pop("_sync_mark")
+                    last_value = value if isinstance(value, int) else float(value)
+                    last_id = str(record[self.id_column])
+                    deleted = self.deleted_column and record.get(self.deleted_column)
+                    page.append(Change(
+                        id=last_id,
+                        document=None if deleted else render_record(record),
+                        metadata={"source": self.name, self.id_column: last_id},
+                    ))
+
+                if horizon is not None and last_value >= horizon:
+                    yield page, [horizon - 1, ""]
+                else:
+                    yield page, [last_value, last_id]
+                if len(rows) < self.page_size:
+                    return
+
+    def ids(self) -> Iterator[str]:
+        """Todos os ids atuais (para `VectorSync.reconcile`)"""
+        from sqlalchemy import text
+
+        where = f"WHERE NOT coalesce({self.deleted_column}, false)" if self.deleted_column else ""
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(
+                text(f"SELECT {self.id_column}::text FROM {self.table} {where}")
+            )
+            for (record_id,) in result:
+                yield record_id
+
+
+def _keyset_after(fields: dict[str, str], position: dict[str, Any]) -> dict:
+    """Filtro MongoDB dos documentos depois de `position` na ordem de `fields`"""
+    branches = []
+    equal: dict[str, Any] = {}
+    for name, key in fields.items():
+        branches.append({**equal, key: {"$gt": position[name]}})
+        equal[key] = position[name]
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+
+class MongoSource:
+    """Documentos novos, alterados ou removidos de uma coleção MongoDB"""
+
+    def __init__(
+        self,
+        collection: Any,
+        text_field: str | None = None,
+        updated_field: str | None = None,
+        use_change_stream: bool = True,
+        page_size: int = 1000,
+        meta_field: str | None = None,
+    ):
+        """
+        Args:
+            collection: Coleção pymongo (ex: db["logs_saude"])
+            text_field: Campo com o texto a indexar (default: todos os campos)
+            updated_field: Campo de data de atualização (polling; default: `_id`,
+                que só apanha inserções)
+            use_change_stream: Tentar change streams antes do polling
+            page_size: Documentos por página
+            meta_field: Segundo campo da ordem do polling, depois de
+                `updated_field` (time-series: o meta, ex: "patient_id")
+        """
+        self.collection = collection
+        self.text_field = text_field
+        self.updated_field = updated_field
+        self.meta_field = meta_field
+        self.use_change_stream = use_change_stream
+        self.page_size = page_size
+        self.name = f"mongo:{collection.name}"
+
+    @classmethod
+    def for_layout(cls, collection: Any, layout: Any, **kwargs) -> "MongoSource":
+        """
+        Fonte para uma coleção com `CollectionLayout` (src.db.mongo_storage)
+
+        Time-series: polling por (tempo, meta, `_id`), sem change streams (não
+        suportados) e sem consultas por `_id` (sem índice nessas coleções).
+        """
+        if layout.timeseries:
+            kwargs = {
+                "updated_field": layout.time_field,
+                "meta_field": layout.meta_field,
+                "use_change_stream": False,
+                **kwargs,
+            }
+        return cls(collection, **kwargs)
+
+    def _change(self, doc: dict) -> Change:
+        record_id = str(doc["_id"])
+        if self.text_field:
+            document = str(doc.get(self.text_field) or "")[:MAX_DOCUMENT_CHARS]
+        else:
+            document = render_record(doc, exclude={"_id"})
+        return Change(record_id, document, {"source": self.name, "id": record_id})
+
+    def changes(self, mark: Any) -> Iterator[tuple[list[Change], Any]]:
+        from bson import json_util
+        from pymongo.errors import OperationFailure
+
+        state = json_util.loads(mark) if mark else {}
+        if self.use_change_stream:
+            try:
+                yield from self._stream_changes(state)
+                return
+            except OperationFailure as e:
+                # Ex: servidor standalone (change streams exigem replica set)
+                logger.info(f"{self.name}: change streams indisponíveis ({e}); polling")
+                self.use_change_stream = False
+        yield from self._poll_changes(state)
+
+    def _stream_changes(self, state: dict) -> Iterator[tuple[list[Change], Any]]:
+        from bson import json_util
+
+        token = state.get("resume_token")
+        backfill = state.get("backfill")
+        with self.collection.watch(full_document="updateLookup", resume_after=token) as stream:
+            if token is None or backfill is not None:
+                # Primeira passagem: indexar o que já existe; o stream (já aberto)
+                # guarda as alterações feitas entretanto. A marca leva a posição do
+                # backfill: depois de uma falha continua na página seguinte, e só
+                # a última página aplicada a remove
+                if token is None:
+                    token = stream.resume_token
+                for page, position in self._poll_pages(backfill or {}):
+                    yield page, json_util.dumps({"resume_token": token, "backfill": position})
+                yield [], json_util.dumps({"resume_token": token})
+
+            page: list[Change] = []
+            while (event := stream.try_next()) is not None:
+                record_id = str(event["documentKey"]["_id"])
+                if event["operationType"] == "delete" or event.get("fullDocument") is None:
+                    page.append(Change(record_id, None))
+                else:
+                    page.append(self._change(event["fullDocument"]))
+                if len(page) >= self.page_size:
+                    yield page, json_util.dumps({"resume_token": stream.resume_token})
+                    page = []
+            if page or stream.resume_token != token:
+                yield page, json_util.dumps({"resume_token": stream.resume_token})
+
+    def _poll_changes(self, state: dict) -> Iterator[tuple[list[Change], Any]]:
+        from bson import json_util
+
+        for page, position in self._poll_pages(state):
+            yield page, json_util.dumps(position)
+
+    def _poll_pages(self, state: dict) -> Iterator[tuple[list[Change], dict]]:
+        """Páginas por ordem de (campo de atualização, meta, `_id`), com a posição seguinte"""
+        if self.updated_field:
+            fields = {"value": self.updated_field}
+            if self.meta_field:
+                fields["meta"] = self.meta_field
+            fields["last_id"] = "_id"
+        else:
+            fields = {"value": "_id"}
+        position = {name: state.get(name) for name in fields}
+        sort = [(key, 1) for key in fields.values()]
+        while True:
+            query = {} if position["value"] is None else _keyset_after(fields, position)
+            docs = list(self.collection.find(query).sort(sort).limit(self.page_size))
+            if not docs:
+                return
+
+            position = {name: docs[-1].get(key) for name, key in fields.items()}
+            yield [self._change(doc) for doc in docs], position
+            if len(docs) < self.page_size:
+                return
+
+    def ids(self) -> Iterator[str]:
+        """Todos os ids atuais (para `VectorSync.reconcile`)"""
+        for doc in self.collection.find({}, {"_id": 1}):
+            yield str(doc["_id"])
+
+
+# ----------------------------------------------------------------------
+# Serviço
+# ----------------------------------------------------------------------
+
+
+class VectorSync:
+    """Aplica as alterações das fontes a uma coleção ChromaDB"""
+
+    def __init__(
+        self,
+        collection: Any,
+        sources: list[Any],
+        state: SyncState,
+        batch_size: int = 128,
+        dedup: Any = None,
+    ):
+        """
+        Args:
+            collection: Coleção ChromaDB (calcula os embeddings no `upsert`)
+            sources: PostgresSource/MongoSource (`name`, `changes`, `ids`)
+            state: Marcas gravadas depois de cada página aplicada
+            batch_size: Documentos por pedido ao ChromaDB
+            dedup: NearDuplicateIndex opcional: documentos quase-duplicados de
+                outros já indexados não são enviados (nem calculado o embedding)
+        """
+        self.collection = collection
+        self.sources = sources
+        self.state = state
+        self.batch_size = batch_size
+        self.dedup = dedup
+
+    @staticmethod
+    def document_id(source: Any, record_id: str) -> str:
+        """Id no ChromaDB (prefixado pela fonte para não colidir entre fontes)"""
+        return f"{source.name}:{record_id}"
+
+    def _apply(self, source: Any, page: list[Change]) -> tuple[int, int]:
+        # A última alteração de cada registo na página é a que conta
+        latest = {change.id: change for change in page}
+        upserts = [c for c in latest.values() if c.document is not None]
+        deletes = [self.document_id(source, c.id) for c in latest.values() if c.document is None]
+
+        duplicates = 0
+        if self.dedup is not None:
+            for doc_id in deletes:
+                self.dedup.remove(doc_id)
+            unique = []
+            for change in upserts:
+                doc_id = self.document_id(source, change.id)
+                if self.dedup.insert_unique(doc_id, change.document) is None:
+                    unique.append(change)
+                else:
+                    # Uma versão anterior do próprio registo pode estar indexada
+                    self.dedup.remove(doc_id)
+                    deletes.append(doc_id)
+                    duplicates += 1
+            upserts = unique
+
+        for i in range(0, len(upserts), self.batch_size):
+            batch = upserts[i:i + self.batch_size]
+            self.collection.upsert(
+                ids=[self.document_id(source, c.id) for c in batch],
+                documents=[c.document for c in batch],
+                metadatas=[c.metadata or {"source": source.name} for c in batch],
+            )
+        for i in range(0, len(deletes), self.batch_size):
+            self.collection.delete(ids=deletes[i:i + self.batch_size])
+
+        SYNC_CHANGES.inc(len(upserts), source=source.name, op="upsert")
+        SYNC_CHANGES.inc(len(deletes) - duplicates, source=source.name, op="delete")
+        SYNC_CHANGES.inc(duplicates, source=source.name, op="duplicate")
+        return len(upserts), len(deletes) - duplicates
+
+    def sync_source(self, source: Any) -> dict[str, int]:
+        """Uma passagem por uma fonte; grava a marca depois de cada página"""
+        counts = {"upserts": 0, "deletes": 0}
+        for page, mark in source.changes(self.state.get(source.name)):
+            upserts, deletes = self._apply(source, page)
+            counts["upserts"] += upserts
+            counts["deletes"] += deletes
+            self.state.set(source.name, mark)
+        return counts
+
+    def run_once(self) -> dict[str, dict[str, int]]:
+        """Uma passagem por todas as fontes"""
+        start = time.perf_counter()
+        results = {source.name: self.sync_source(source) for source in self.sources}
+        if self.dedup is not None and self.dedup.path is not None:
+            self.dedup.save()
+        SYNC_DURATION.observe(time.perf_counter() - start)
+        SYNC_LAST_SUCCESS.set(time.time())
+        return results
+
+    def _indexed_ids(self, source: Any, page_size: int = 5000) -> set[str]:
+        ids: set[str] = set()
+        offset = 0
+        while True:
+            result = self.collection.get(
+                where={"source": source.name}, include=[], limit=page_size, offset=offset
+            )
+            ids.update(result["ids"])
+            if len(result["ids"]) < page_size:
+                return ids
+            offset += page_size
+
+    def reconcile(self, source: Any) -> int:
+        """
+        Remove do índice os registos que já não existem na fonte
+
+        Compara apenas ids (não texto nem embeddings), mas percorre todos:
+        correr com pouca frequência, para fontes sem remoções no fluxo de
+        alterações.
+        """
+        current = {self.document_id(source, record_id) for record_id in source.ids()}
+        stale = sorted(self._indexed_ids(source) - current)
+        if self.dedup is not None:
+            for doc_id in stale:
+                self.dedup.remove(doc_id)
+        for i in range(0, len(stale), self.batch_size):
+            self.collection.delete(ids=stale[i:i + self.batch_size])
+        SYNC_CHANGES.inc(len(stale), source=source.name, op="delete")
+        return len(stale)
+
+    def run_forever(
+        self,
+        interval: float = 2.0,
+        reconcile_every: int = 0,
+        stop: threading.Event | None = None,
+    ) -> None:
+        """
+        Sincroniza a cada `interval` segundos até `stop` ser ativado
+
+        Args:
+            interval: Segundos entre passagens (frescura do índice ≈ intervalo)
+            reconcile_every: Passagens entre reconciliações de remoções (0 = nunca)
+            stop: Evento para terminar (ex: noutra thread)
+        """
+        stop = stop or threading.Event()
+        passes = 0
+        while not stop.is_set():
+            try:
+                results = self.run_once()
+                passes += 1
+                for name, counts in results.items():
+                    if counts["upserts"] or counts["deletes"]:
+                        logger.info(f"{name}: {counts['upserts']} upserts, "
+                                    f"{counts['deletes']} remoções")
+                if reconcile_every and passes % reconcile_every == 0:
+                    for source in self.sources:
+                        if removed := self.reconcile(source):
+                            logger.info(f"{source.name}: {removed} remoções (reconciliação)")
+            except Exception as e:
+                logger.error(f"Erro na sincronização: {e}")
+            stop.wait(interval)
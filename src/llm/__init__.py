@@ -1,19 +1,63 @@
 """
 LLM integrations para o sistema HELTH
+
+Os símbolos são carregados de forma preguiçosa (PEP 562): importar ``src.llm``
+não importa langchain/transformers, só o primeiro acesso a um atributo o faz.
 """
 
-from .medgemma import (
-    MedGemmaHuggingFace,
-    MedGemmaLangChain,
-    MedGemmaOllama,
-    MedGemmaVertexAI,
-    get_medgemma_llm,
-)
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .medgemma import (
+        MedGemmaHuggingFace,
+        MedGemmaLangChain,
+        MedGemmaOllama,
+        MedGemmaVertexAI,
+        get_medgemma_llm,
+        llm_kwargs,
+        profile_kwargs,
+    )
+    from .model_server import MedGemmaLocalServer
+    from .ollama_pool import MedGemmaOllamaPool, OllamaPool
+
+# Nome público -> submódulo onde está definido
+_LAZY_ATTRS = {
+    "MedGemmaHuggingFace": ".medgemma",
+    "MedGemmaLangChain": ".medgemma",
+    "MedGemmaOllama": ".medgemma",
+    "MedGemmaVertexAI": ".medgemma",
+    "get_medgemma_llm": ".medgemma",
+    "llm_kwargs": ".medgemma",
+    "profile_kwargs": ".medgemma",
+    "MedGemmaLocalServer": ".model_server",
+    "MedGemmaOllamaPool": ".ollama_pool",
+    "OllamaPool": ".ollama_pool",
+}
 
 __all__ = [
     "MedGemmaHuggingFace",
     "MedGemmaLangChain",
+    "MedGemmaLocalServer",
     "MedGemmaOllama",
+    "MedGemmaOllamaPool",
     "MedGemmaVertexAI",
+    "OllamaPool",
     "get_medgemma_llm",
+    "llm_kwargs",
+    "profile_kwargs",
 ]
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value  # acessos seguintes não passam por __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,385 @@
+"""
+Inferência offline em lote (ex: resumos MedGemma de uma coorte durante a noite)
+
+Em vez de `generate` prompt a prompt:
+1. Os prompts são ordenados por comprimento (em tokens) para minimizar padding
+2. São agrupados em lotes dinâmicos: cada lote cabe em `max_batch_tokens`
+   (prompt + tokens gerados × tamanho do lote); com falta de memória na GPU o
+   lote é dividido ao meio e o limite reduzido para os seguintes
+3. Os resultados são escritos em bloco (JSONL, PostgreSQL ou MongoDB) e os ids
+   concluídos ficam num checkpoint, para retomar o job sem repetir trabalho.
+   O checkpoint é escrito depois do destino: uma falha entre os dois repete
+   o lote ao retomar, e por isso os destinos são idempotentes por `id`
+
+Exemplo:
+    model = MedGemmaHuggingFace(model_name="google/medgemma-2b")
+    job = BatchInferenceJob(model, JsonlSink("resumos.jsonl"), Checkpoint("resumos.ckpt"))
+    stats = job.run(read_jsonl("registos.jsonl"))
+    print(stats.tokens_per_second)
+"""
+
+import json
+import logging
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Limite por omissão quando não há GPU para estimar memória livre
+DEFAULT_MAX_BATCH_TOKENS = 16_384
+
+
+@dataclass
+class BatchItem:
+    id: str
+    prompt: str
+
+
+@dataclass
+class BatchStats:
+    prompts: int = 0
+    skipped: int = 0
+    batches: int = 0
+    prompt_tokens: int = 0
+    padding_tokens: int = 0
+    generated_tokens: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.generated_tokens / self.elapsed_s if self.elapsed_s else 0.0
+
+    def summary(self) -> str:
+        padding = self.padding_tokens / max(1, self.prompt_tokens + self.padding_tokens)
+        return (
+            f"{self.prompts} prompts ({self.skipped} já concluídos) em {self.batches} lotes, "
+            f"{self.elapsed_s:.1f}s: {self.generated_tokens} tokens gerados, "
+            f"{self.tokens_per_second:.1f} tokens/s, padding {padding:.1%}"
+        )
+
+
+# ----------------------------------------------------------------------
+# Fontes
+# ----------------------------------------------------------------------
+
+
+def read_jsonl(
+    path: str | Path, id_field: str = "id", prompt_field: str = "prompt"
+) -> Iterator[BatchItem]:
+    """Uma linha JSON por registo, ex: {"id": "42", "prompt": "..."}"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield BatchItem(str(record[id_field]), record[prompt_field])
+
+
+def read_postgres(engine: Any, sql: str) -> Iterator[BatchItem]:
+    """Consulta cujas duas primeiras colunas são (id, prompt)"""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(text(sql))
+        for row in result:
+            yield BatchItem(str(row[0]), row[1])
+
+
+def read_mongo(
+    collection: Any,
+    query: dict | None = None,
+    id_field: str = "_id",
+    prompt_field: str = "prompt",
+) -> Iterator[BatchItem]:
+    projection = {id_field: 1, prompt_field: 1}
+    for doc in collection.find(query or {}, projection):
+        yield BatchItem(str(doc[id_field]), doc[prompt_field])
+
+
+# ----------------------------------------------------------------------
+# Destinos (escrita em bloco)
+# ----------------------------------------------------------------------
+
+
+class JsonlSink:
+    """Acrescenta linhas ao ficheiro; ids já escritos (ex: lote repetido) são ignorados"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._written: set[str] | None = None
+
+    def _written_ids(self) -> set[str]:
+        if self._written is None:
+            self._written = set()
+            if self.path.exists():
+                with self.path.open(encoding="utf-8") as f:
+                    rows = (json.loads(line) for line in f if line.strip())
+                    self._written = {str(row["id"]) for row in rows if "id" in row}
+        return self._written
+
+    def write(self, rows: list[dict]) -> None:
+        written = self._written_ids()
+        rows = [row for row in rows if str(row["id"]) not in written]
+        with self.path.open("a", encoding="utf-8") as f:
+            f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        written.update(str(row["id"]) for row in rows)
+
+
+class PostgresSink:
+    """Insere por bloco; linhas com o mesmo `id` são substituídas na mesma transação"""
+
+    def __init__(self, engine: Any, table: str):
+        self.engine = engine
+        self.table = table
+
+    def write(self, rows: list[dict]) -> None:
+        import pandas as pd
+        from sqlalchemy import bindparam, inspect, text
+
+        delete = text(f"DELETE FROM {self.table} WHERE id IN :ids").bindparams(
+            bindparam("ids", expanding=True)
+        )
+        with self.engine.begin() as conn:
+            if inspect(conn).has_table(self.table):
+                conn.execute(delete, {"ids": [row["id"] for row in rows]})
+            pd.DataFrame(rows).to_sql(
+                self.table, conn, if_exists="append", index=False, method="multi"
+            )
+
+
+class MongoSink:
+    def __init__(self, collection: Any, id_field: str = "_id"):
+        self.collection = collection
+        self.id_field = id_field
+
+    def write(self, rows: list[dict]) -> None:
+        from pymongo import UpdateOne
+
+        self.collection.bulk_write(
+            [
+                UpdateOne({self.id_field: row["id"]}, {"$set": row}, upsert=True)
+                for row in rows
+            ],
+            ordered=False,
+        )
+
+
+class Checkpoint:
+    """Ids concluídos, um por linha (acrescentados depois de cada escrita)"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.done: set[str] = set()
+        if self.path.exists():
+            self.done = {line for line in self.path.read_text().splitlines() if line}
+
+    def add(self, ids: list[str]) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            f.writelines(f"{i}\n" for i in ids)
+        self.done.update(ids)
+
+
+# ----------------------------------------------------------------------
+# Planeamento dos lotes
+# ----------------------------------------------------------------------
+
+
+def estimate_max_batch_tokens(model: Any, safety: float = 0.8) -> int:
+    """
+    Tokens (prompt + geração, somados no lote) que cabem na memória livre da GPU
+
+    Estimativa pelo tamanho da KV cache por token: 2 (K e V) × camadas ×
+    cabeças KV × dimensão da cabeça × bytes do dtype. Sem GPU devolve
+    `DEFAULT_MAX_BATCH_TOKENS`.
+    """
+    device = getattr(model, "device", None)
+    if device is None or device.type != "cuda":
+        return DEFAULT_MAX_BATCH_TOKENS
+
+    import torch
+
+    config = model.config
+    heads = getattr(config, "num_key_value_heads", None) or config.num_attention_heads
+    head_dim = getattr(config, "head_dim", None) or (
+        config.hidden_size // config.num_attention_heads
+    )
+    bytes_per_token = 2 * config.num_hidden_layers * heads * head_dim * model.dtype.itemsize
+    free, _ = torch.cuda.mem_get_info(device)
+    return max(1, int(free * safety / bytes_per_token))
+
+
+def plan_batches(
+    items: list[BatchItem],
+    lengths: dict[str, int],
+    max_batch_tokens: int,
+    max_new_tokens: int,
+    max_batch_size: int = 64,
+) -> list[list[BatchItem]]:
+    """
+    Agrupa prompts por comprimento semelhante
+
+    Com os prompts ordenados, o mais longo de cada lote é o último: um lote
+    aceita mais um prompt enquanto (n + 1) × (comprimento + max_new_tokens)
+    couber em `max_batch_tokens`.
+    """
+    batches: list[list[BatchItem]] = []
+    batch: list[BatchItem] = []
+    for item in sorted(items, key=lambda i: lengths[i.id]):
+        cost = (len(batch) + 1) * (lengths[item.id] + max_new_tokens)
+        if batch and (cost > max_batch_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(item)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _is_out_of_memory(error: BaseException) -> bool:
+    return type(error).__name__ == "OutOfMemoryError" or "out of memory" in str(error)
+
+
+# ----------------------------------------------------------------------
+# Job
+# ----------------------------------------------------------------------
+
+
+class BatchInferenceJob:
+    """Executa prompts em lotes dinâmicos num `MedGemmaHuggingFace` já carregado"""
+
+    def __init__(
+        self,
+        model: Any,
+        sink: Any,
+        checkpoint: Checkpoint | None = None,
+        max_new_tokens: int = 256,
+        max_batch_size: int = 64,
+        max_batch_tokens: int | None = None,
+        flush_every: int = 256,
+        template: str = "{prompt}",
+        generation_kwargs: dict | None = None,
+    ):
+        """
+        Args:
+            model: MedGemmaHuggingFace (ou outro com `tokenizer` e `generate_batch`)
+            sink: Destino com `write(rows)` (JsonlSink, PostgresSink, MongoSink)
+            checkpoint: Ids concluídos; permite retomar um job interrompido
+            max_new_tokens: Tokens gerados por prompt
+            max_batch_size: Prompts por lote (máximo)
+            max_batch_tokens: Tokens por lote (default: estimado pela memória livre)
+            flush_every: Resultados acumulados antes de cada escrita em bloco
+            template: Formato do prompt, ex: "Resume o registo clínico:\\n{prompt}"
+            generation_kwargs: Outros parâmetros de geração (temperature, do_sample, ...)
+        """
+        self.model = model
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.max_new_tokens = max_new_tokens
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens or estimate_max_batch_tokens(
+            getattr(model, "model", None)
+        )
+        self.flush_every = flush_every
+        self.template = template
+        self.generation_kwargs = generation_kwargs or {}
+        self._pending: list[dict] = []
+
+    def count_tokens(self, texts: list[str], add_special_tokens: bool = True) -> list[int]:
+        if not texts:
+            return []
+        encoded = self.model.tokenizer(texts, add_special_tokens=add_special_tokens)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def _generate(self, batch: list[BatchItem]) -> list[str]:
+        """Gera um lote; sem memória, divide-o ao meio e reduz os lotes seguintes"""
+        try:
+            return self.model.generate_batch(
+                [item.prompt for item in batch],
+                max_new_tokens=self.max_new_tokens,
+                **self.generation_kwargs,
+            )
+        except Exception as e:
+            if not _is_out_of_memory(e) or len(batch) == 1:
+                raise
+            self._free_memory()
+            self.max_batch_tokens = max(1, self.max_batch_tokens // 2)
+            logger.warning(
+                f"Sem memória num lote de {len(batch)}; a dividir "
+                f"(max_batch_tokens={self.max_batch_tokens})"
+            )
+            half = len(batch) // 2
+            return self._generate(batch[:half]) + self._generate(batch[half:])
+
+    @staticmethod
+    def _free_memory() -> None:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        self.sink.write(self._pending)
+        if self.checkpoint is not None:
+            self.checkpoint.add([row["id"] for row in self._pending])
+        self._pending = []
+
+    def run(
+        self,
+        items: Iterable[BatchItem],
+        progress: Callable[[BatchStats], None] | None = None,
+    ) -> BatchStats:
+        """
+        Args:
+            items: Prompts a processar (ids já no checkpoint são ignorados)
+            progress: Chamado depois de cada lote com as estatísticas acumuladas
+        """
+        stats = BatchStats()
+        done = self.checkpoint.done if self.checkpoint is not None else set()
+        todo = []
+        for item in items:
+            if item.id in done:
+                stats.skipped += 1
+            else:
+                todo.append(BatchItem(item.id, self.template.format(prompt=item.prompt)))
+        counts = self.count_tokens([item.prompt for item in todo])
+        lengths = {item.id: n for item, n in zip(todo, counts, strict=True)}
+
+        start = time.perf_counter()
+        queue = plan_batches(
+            todo, lengths, self.max_batch_tokens, self.max_new_tokens, self.max_batch_size
+        )
+        while queue:
+            batch = queue.pop(0)
+            budget = self.max_batch_tokens
+            outputs = self._generate(batch)
+            if self.max_batch_tokens < budget and queue:
+                # Houve falta de memória: replanear o resto com o novo limite
+                rest = [item for b in queue for item in b]
+                queue = plan_batches(
+                    rest, lengths, self.max_batch_tokens, self.max_new_tokens,
+                    self.max_batch_size,
+                )
+
+            longest = max(lengths[item.id] for item in batch)
+            stats.batches += 1
+            stats.prompts += len(batch)
+            stats.prompt_tokens += sum(lengths[item.id] for item in batch)
+            stats.padding_tokens += sum(longest - lengths[item.id] for item in batch)
+            stats.generated_tokens += sum(self.count_tokens(outputs, add_special_tokens=False))
+            self._pending += [
+                {"id": item.id, "output": output}
+                for item, output in zip(batch, outputs, strict=True)
+            ]
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+            stats.elapsed_s = time.perf_counter() - start
+            if progress is not None:
+                progress(stats)
+
+        self._flush()
+        stats.elapsed_s = time.perf_counter() - start
+        return stats
@@ -0,0 +1,143 @@
+"""
+Junção de pedidos concorrentes em lotes (várias sessões, um só modelo)
+
+Com o modelo local (`MedGemmaHuggingFace`) partilhado por todas as sessões,
+cada `generate` ocupa a GPU/CPU com um lote de 1: com mais sessões, as
+chamadas só esperam umas pelas outras e o débito fica igual. O
+`GenerationCoalescer` junta os prompts que chegam dentro de uma janela curta
+(`window`, ex: 10 ms) num só `generate_batch` (padding à esquerda, stop
+sequences por sequência), até `max_batch_size` prompts por lote:
+
+- uma thread de trabalho executa os lotes, um de cada vez; enquanto um lote
+  gera, os pedidos seguintes acumulam-se para o próximo
+- só se juntam pedidos com os mesmos parâmetros de geração (perfis diferentes
+  seguem em lotes separados); o grupo com o pedido mais antigo segue primeiro
+- sem memória na GPU, o lote é dividido ao meio (como em `src.llm.batch`)
+
+Exemplo:
+    coalescer = GenerationCoalescer(model, window=0.01, max_batch_size=8)
+    coalescer.generate(["Resumo do doente ..."], stop=["\\nObservation:"])
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.observability.metrics import REGISTRY
+
+from .batch import _is_out_of_memory
+
+logger = logging.getLogger(__name__)
+
+COALESCED_BATCH_SIZE = REGISTRY.histogram(
+    "helth_llm_coalesced_batch_size",
+    "Prompts por lote do modelo local (pedidos concorrentes juntos)",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+COALESCE_WAIT = REGISTRY.histogram(
+    "helth_llm_coalesce_wait_seconds", "Espera de um prompt até o seu lote começar a gerar"
+)
+
+
+@dataclass
+class _Request:
+    prompt: str
+    stop: list[str] | None
+    key: tuple
+    kwargs: dict[str, Any]
+    future: Future = field(default_factory=Future)
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class GenerationCoalescer:
+    """Junta prompts de chamadas concorrentes em lotes de `generate_batch`"""
+
+    def __init__(self, model: Any, window: float = 0.01, max_batch_size: int = 8):
+        """
+        Args:
+            model: MedGemmaHuggingFace (ou outro com `generate_batch(prompts, stop=...)`)
+            window: Segundos que o primeiro prompt de um lote espera por outros
+            max_batch_size: Máximo de prompts por lote (limita memória e latência)
+        """
+        self.model = model
+        self.window = window
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: list[_Request] = []
+        self._cond = threading.Condition()
+        self._worker: threading.Thread | None = None
+
+    def generate(
+        self, prompts: list[str], stop: list[str] | None = None, **kwargs
+    ) -> list[str]:
+        """Gera `prompts` (em lotes partilhados com outras chamadas); bloqueia até terminar"""
+        key = tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+        requests = [_Request(prompt, stop, key, kwargs) for prompt in prompts]
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="llm-coalescer", daemon=True
+                )
+                self._worker.start()
+            self._pending.extend(requests)
+            self._cond.notify()
+        return [request.future.result() for request in requests]
+
+    def _next_batch(self) -> list[_Request]:
+        """Espera pelo primeiro pedido e pela janela; devolve o lote do grupo mais antigo"""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            first = self._pending[0]
+            deadline = first.queued_at + self.window
+            while True:
+                same = sum(1 for r in self._pending if r.key == first.key)
+                remaining = deadline - time.monotonic()
+                if same >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, rest = [], []
+            for request in self._pending:
+                if request.key == first.key and len(batch) < self.max_batch_size:
+                    batch.append(request)
+                else:
+                    rest.append(request)
+            self._pending = rest
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            now = time.monotonic()
+            for request in batch:
+                COALESCE_WAIT.observe(now - request.queued_at)
+            COALESCED_BATCH_SIZE.observe(len(batch))
+            # Prompts de comprimento semelhante lado a lado: menos padding se dividido
+            batch.sort(key=lambda r: len(r.prompt))
+            try:
+                texts = self._generate(batch)
+            except BaseException as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, text in zip(batch, texts, strict=True):
+                request.future.set_result(text)
+
+    def _generate(self, batch: list[_Request]) -> list[str]:
+        try:
+            return self.model.generate_batch(
+                [r.prompt for r in batch], stop=[r.stop for r in batch], **batch[0].kwargs
+            )
+        except Exception as e:
+            if not _is_out_of_memory(e) or len(batch) == 1:
+                raise
+            import torch
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            logger.warning(f"Sem memória num lote de {len(batch)} prompts; a dividir")
+            half = len(batch) // 2
+            return self._generate(batch[:half]) + self._generate(batch[half:])
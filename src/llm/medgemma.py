@@ -10,9 +10,20 @@ Opções de deployment:
 
 import logging
 import os
-
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+import threading
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any
+
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
 from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+from pydantic import PrivateAttr
+
+if TYPE_CHECKING:
+    from config.medgemma_config import GenerationProfile, MedGemmaConfig
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +35,10 @@ class MedGemmaHuggingFace:
     Requisitos:
     - GPU recomendada (mínimo 8GB VRAM para 2B, 16GB para 7B)
     - CPU possível mas lento
+
+    Partilhado entre threads (sessões, junção de pedidos, streaming): cada
+    geração (tokenização incluída) corre sob um lock, uma de cada vez, e o
+    tokenizer nunca é alterado depois de carregado.
     """
 
     def __init__(
@@ -33,31 +48,72 @@ class MedGemmaHuggingFace:
         max_length: int = 2048,
         temperature: float = 0.7,
         use_quantization: bool = True,
+        use_snapshot: bool = True,
+        snapshot_dir: str | None = None,
+        max_new_tokens: int = 512,
+        top_p: float = 0.9,
+        top_k: int = 50,
+        do_sample: bool = True,
     ):
         """
         Args:
             model_name: "google/medgemma-2b" ou "google/medgemma-7b"
             device: "auto", "cuda", "cpu"
-            max_length: Comprimento máximo de geração
+            max_length: Contexto máximo (prompt + tokens gerados)
             temperature: Controla aleatoriedade (0.0 = determinístico, 1.0 = criativo)
             use_quantization: Reduz uso de memória (recomendado para GPUs <16GB)
+            use_snapshot: Guardar/carregar os pesos já convertidos (ver `src.llm.snapshot`)
+            snapshot_dir: Diretório dos snapshots (default: MEDGEMMA_SNAPSHOT_DIR)
+            max_new_tokens, top_p, top_k, do_sample: Defaults de geração (ver
+                `GenerationProfile`); cada chamada pode substituí-los
         """
         self.model_name = model_name
         self.device = device
         self.max_length = max_length
         self.temperature = temperature
+        self.max_new_tokens = max_new_tokens
+        self.top_p = top_p
+        self.top_k = top_k
+        self.do_sample = do_sample
         self.use_quantization = use_quantization
+        self.use_snapshot = use_snapshot
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_path = None
 
         self.model = None
         self.tokenizer = None
+        self._generate_lock = threading.Lock()
         self._load_model()
+        if self.tokenizer.pad_token is None:
+            # Para os lotes (padding); definido uma vez, antes de qualquer geração
+            self.tokenizer.pad_token = self.tokenizer.eos_token
 
     def _load_model(self):
-        """Carrega modelo e tokenizer"""
+        """Carrega modelo e tokenizer (do snapshot local, se existir)"""
         try:
             import torch
             from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
 
+            from .snapshot import (
+                discard_snapshot,
+                has_snapshot,
+                save_snapshot,
+                snapshot_fields,
+                snapshot_key,
+                snapshot_root,
+            )
+
+            if self.use_snapshot:
+                fields = snapshot_fields(self.model_name, self.use_quantization)
+                self.snapshot_path = snapshot_root(self.snapshot_dir) / snapshot_key(fields)
+                if has_snapshot(self.snapshot_path):
+                    try:
+                        self._load_snapshot()
+                        return
+                    except Exception as e:
+                        logger.warning(f"Snapshot inválido ({e}); a carregar do original")
+                        discard_snapshot(self.snapshot_path)
+
             logger.info(f"A carregar MedGemma: {self.model_name}")
 
             # Configuração de quantização (4-bit) para reduzir memória
@@ -92,6 +148,12 @@ class MedGemmaHuggingFace:
 
             logger.info(f"✓ MedGemma carregado com sucesso em {self.device}")
 
+            if self.snapshot_path is not None:
+                # O primeiro carregamento do Hub só agora tem o commit em cache
+                fields = snapshot_fields(self.model_name, self.use_quantization)
+                self.snapshot_path = snapshot_root(self.snapshot_dir) / snapshot_key(fields)
+                save_snapshot(self.snapshot_path, self.model, self.tokenizer, fields)
+
         except ImportError as e:
             raise ImportError(
                 "Dependências em falta. Instalar com:\n"
@@ -101,6 +163,51 @@ class MedGemmaHuggingFace:
             logger.error(f"Erro ao carregar MedGemma: {e}")
             raise
 
+    def _load_snapshot(self):
+        """Carrega pesos já convertidos (mmap) e o tokenizer rápido do snapshot"""
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        logger.info(f"A carregar MedGemma do snapshot: {self.snapshot_path}")
+        self.tokenizer = AutoTokenizer.from_pretrained(self.snapshot_path)
+        # A quantização (se existir) já está no config.json do snapshot
+        self.model = AutoModelForCausalLM.from_pretrained(
+            self.snapshot_path,
+            device_map=self.device,
+            trust_remote_code=True,
+            torch_dtype=torch.float16 if not self.use_quantization else None
+        )
+        logger.info(f"✓ MedGemma carregado do snapshot em {self.device}")
+
+    def _generation_kwargs(self, prompt_tokens: int = 0, **kwargs) -> dict:
+        """
+        Parâmetros de geração (defaults da instância + overrides por chamada)
+
+        `max_length` é o contexto total: com `prompt_tokens`, `max_new_tokens` é
+        limitado ao que resta. Sem amostragem (ou temperatura 0) a geração é greedy.
+        """
+        max_new_tokens = kwargs.get("max_new_tokens", self.max_new_tokens)
+        if prompt_tokens:
+            max_new_tokens = max(1, min(max_new_tokens, self.max_length - prompt_tokens))
+        temperature = kwargs.get("temperature", self.temperature)
+        do_sample = kwargs.get("do_sample", self.do_sample) and temperature > 0
+
+        gen_kwargs = {
+            "max_new_tokens": max_new_tokens,
+            "do_sample": do_sample,
+            "pad_token_id": self.tokenizer.eos_token_id,
+            # Garantir que o modelo saiba quando parar
+        }
+        if do_sample:
+            gen_kwargs.update(
+                temperature=temperature,
+                # Nucleus sampling para controlar diversidade
+                top_p=kwargs.get("top_p", self.top_p),
+                # Top-k sampling para controlar diversidade
+                top_k=kwargs.get("top_k", self.top_k),
+            )
+        return gen_kwargs
+
     def generate(self, prompt: str, **kwargs) -> str:
         """
         Gera resposta do modelo
@@ -114,26 +221,16 @@ class MedGemmaHuggingFace:
         """
         import torch
 
-        # Preparar input
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        with self._generate_lock:
+            # Preparar input
+            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
 
-        # Parâmetros de geração
-        gen_kwargs = {
-            "max_new_tokens": kwargs.get("max_new_tokens", 512),
-            "temperature": kwargs.get("temperature", self.temperature),
-            "do_sample": kwargs.get("do_sample", True),
-            # Habilitar amostragem para respostas mais variadas
-            "top_p": kwargs.get("top_p", 0.9),
-            # Nucleus sampling para controlar diversidade
-            "top_k": kwargs.get("top_k", 50),
-            # Top-k sampling para controlar diversidade
-            "pad_token_id": self.tokenizer.eos_token_id,
-            # Garantir que o modelo saiba quando parar
-        }
+            # Parâmetros de geração
+            gen_kwargs = self._generation_kwargs(inputs["input_ids"].shape[1], **kwargs)
 
-        # Gerar
-        with torch.no_grad():
-            outputs = self.model.generate(**inputs, **gen_kwargs)
+            # Gerar
+            with torch.no_grad():
+                outputs = self.model.generate(**inputs, **gen_kwargs)
 
         # Decodificar (remover prompt original)
         response = self.tokenizer.decode(
@@ -143,23 +240,237 @@ class MedGemmaHuggingFace:
 
         return response.strip()
 
+    def generate_batch(
+        self, prompts: list[str], stop: list[list[str] | None] | None = None, **kwargs
+    ) -> list[str]:
+        """
+        Gera respostas para vários prompts numa só chamada ao modelo
+
+        Os prompts são alinhados à direita (padding à esquerda) para a geração
+        continuar todos ao mesmo tempo. Para menos padding, agrupar prompts de
+        comprimento semelhante (ver `src.llm.batch`).
+
+        Args:
+            prompts: Textos de entrada
+            stop: Stop sequences de cada prompt; uma sequência que as encontra
+                deixa de gerar (as restantes continuam) e é cortada antes delas
+            **kwargs: Parâmetros adicionais (max_new_tokens, temperature, etc.)
+
+        Returns:
+            Textos gerados, pela ordem dos prompts
+        """
+        import torch
+        from transformers import StoppingCriteriaList
+
+        with self._generate_lock:
+            # Padding em Python com padding_side por chamada: o tokenizer partilhado
+            # (ex: contagem de tokens noutras sessões) não muda de estado
+            inputs = self.tokenizer.pad(
+                self.tokenizer(prompts), padding=True, padding_side="left", return_tensors="pt"
+            ).to(self.model.device)
+
+            prompt_length = inputs["input_ids"].shape[1]
+            gen_kwargs = {
+                **self._generation_kwargs(prompt_length, **kwargs),
+                "pad_token_id": self.tokenizer.pad_token_id,
+            }
+            if stop is not None and any(stop):
+                gen_kwargs["stopping_criteria"] = StoppingCriteriaList(
+                    [_StopSequences(self.tokenizer, prompt_length, stop)]
+                )
+            with torch.no_grad():
+                outputs = self.model.generate(**inputs, **gen_kwargs)
+
+        responses = self.tokenizer.batch_decode(
+            outputs[:, prompt_length:], skip_special_tokens=True
+        )
+        if stop is None:
+            return [r.strip() for r in responses]
+        return [cut_at_stop(r, s).strip() for r, s in zip(responses, stop, strict=True)]
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """
+        Gera resposta do modelo token a token
+
+        A geração corre numa thread auxiliar (com o lock de geração: espera pelas
+        outras gerações em curso); fechar o iterador (ex: ao encontrar uma stop
+        sequence) interrompe a geração no passo seguinte.
+
+        Args:
+            prompt: Texto de entrada
+            **kwargs: Parâmetros adicionais (max_new_tokens, temperature, etc.)
+
+        Yields:
+            Fragmentos de texto à medida que são gerados
+        """
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        cancelled = threading.Event()
+
+        class _Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kw):
+                return torch.full(
+                    (input_ids.shape[0],), cancelled.is_set(),
+                    dtype=torch.bool, device=input_ids.device,
+                )
+
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+
+        errors: list[BaseException] = []
+
+        def _run():
+            try:
+                with self._generate_lock:
+                    if cancelled.is_set():
+                        streamer.end()
+                        return
+                    inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+                    gen_kwargs = {
+                        **self._generation_kwargs(inputs["input_ids"].shape[1], **kwargs),
+                        "streamer": streamer,
+                        "stopping_criteria": StoppingCriteriaList([_Cancelled()]),
+                    }
+                    with torch.no_grad():
+                        self.model.generate(**inputs, **gen_kwargs)
+            except BaseException as e:
+                # Terminar o streamer para o consumidor não ficar à espera
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        finished = False
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+            finished = True
+        finally:
+            cancelled.set()
+            if not finished:
+                # Esvaziar o streamer para a thread de geração não bloquear
+                for _ in streamer:
+                    pass
+            thread.join()
+        if errors:
+            raise errors[0]
+
+
+def cut_at_stop(text: str, stop: list[str] | None) -> str:
+    """Texto até à primeira stop sequence (exclusive)"""
+    cut = min((text.find(s) for s in stop or [] if s in text), default=-1)
+    return text[:cut] if cut >= 0 else text
+
+
+class _StopSequences:
+    """
+    Critério de paragem por sequência do lote: cada linha tem as suas stop sequences
+
+    Em cada passo só descodifica os últimos tokens gerados das linhas ainda
+    ativas (o suficiente para conter a stop sequence mais longa).
+    """
+
+    def __init__(self, tokenizer: Any, prompt_length: int, stop: list[list[str] | None]):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop = [s or [] for s in stop]
+        # Um token tem pelo menos um carácter (margem para tokens vazios/especiais)
+        self.window = [max((len(x) for x in s), default=0) + 2 for s in self.stop]
+        self.done = [not s for s in self.stop]
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        generated = input_ids.shape[1] - self.prompt_length
+        for row, stop in enumerate(self.stop):
+            if self.done[row]:
+                continue
+            start = input_ids.shape[1] - min(generated, self.window[row])
+            tail = self.tokenizer.decode(input_ids[row, start:], skip_special_tokens=True)
+            self.done[row] = any(s in tail for s in stop)
+        # Linhas sem stop sequences só param por EOS/max_new_tokens
+        finished = [d and bool(s) for d, s in zip(self.done, self.stop, strict=True)]
+        return torch.tensor(finished, dtype=torch.bool, device=input_ids.device)
+
 
 class MedGemmaLangChain(LLM):
     """
     Wrapper LangChain para MedGemma
     Permite usar MedGemma como qualquer outro LLM do LangChain
+
+    `generate`/`batch`/`abatch` correm todos os prompts num só forward em lote;
+    com `batch_window_ms > 0`, chamadas concorrentes (ex: sessões diferentes)
+    dentro da janela partilham também o lote (ver `src.llm.coalesce`). A
+    junção só compensa com muitas sessões em simultâneo: com poucas, a janela
+    é só espera (por isso desligada por omissão). O streaming (`_stream`) gera
+    sempre sozinho; o agente só o usa na resposta final.
     """
 
     medgemma: MedGemmaHuggingFace
+    batch_window_ms: float = 0.0
+    max_batch_size: int = 8
 
-    def __init__(self, **kwargs):
-        super().__init__()
-        self.medgemma = MedGemmaHuggingFace(**kwargs)
+    _coalescer: Any = PrivateAttr(default=None)
+
+    def __init__(self, batch_window_ms: float = 0.0, max_batch_size: int = 8, **kwargs):
+        """
+        Args:
+            batch_window_ms: Janela para juntar chamadas concorrentes (0 = sem junção)
+            max_batch_size: Máximo de prompts por lote
+            **kwargs: Argumentos de `MedGemmaHuggingFace`
+        """
+        super().__init__(
+            medgemma=MedGemmaHuggingFace(**kwargs),
+            batch_window_ms=batch_window_ms,
+            max_batch_size=max_batch_size,
+        )
+        if batch_window_ms > 0:
+            from .coalesce import GenerationCoalescer
+
+            self._coalescer = GenerationCoalescer(
+                self.medgemma, window=batch_window_ms / 1000, max_batch_size=max_batch_size
+            )
 
     @property
     def _llm_type(self) -> str:
         return "medgemma"
 
+    def _generate_texts(self, prompts: list[str], stop: list[str] | None, **kwargs) -> list[str]:
+        if self._coalescer is not None:
+            return self._coalescer.generate(prompts, stop=stop, **kwargs)
+        texts: list[str] = []
+        for start in range(0, len(prompts), self.max_batch_size):
+            chunk = prompts[start : start + self.max_batch_size]
+            texts += self.medgemma.generate_batch(chunk, stop=[stop] * len(chunk), **kwargs)
+        return texts
+
+    def _generate(
+        self,
+        prompts: list[str],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> LLMResult:
+        """Gera todos os prompts em lote (em vez de um `_call` por prompt)"""
+        texts = self._generate_texts(prompts, stop, **kwargs)
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    async def _agenerate(
+        self,
+        prompts: list[str],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> LLMResult:
+        """Como `_generate`, numa thread (o event loop não bloqueia durante a geração)"""
+        from langchain_core.runnables.config import run_in_executor
+
+        texts = await run_in_executor(None, self._generate_texts, prompts, stop, **kwargs)
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
     def _call(
         self,
         prompt: str,
@@ -168,15 +479,51 @@ class MedGemmaLangChain(LLM):
         **kwargs,
     ) -> str:
         """Executa o modelo"""
-        response = self.medgemma.generate(prompt, **kwargs)
+        return self._generate_texts([prompt], stop, **kwargs)[0]
 
-        # Aplicar stop sequences se fornecidas
-        if stop:
-            for stop_seq in stop:
-                if stop_seq in response:
-                    response = response.split(stop_seq)[0]
+    def _stream(
+        self,
+        prompt: str,
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> Iterator[GenerationChunk]:
+        """Executa o modelo em streaming (usado por `llm.stream` e pelos agentes)"""
+        tokens = self.medgemma.stream(prompt, **kwargs)
+        try:
+            for text in apply_stop(tokens, stop):
+                chunk = GenerationChunk(text=text)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            tokens.close()
 
-        return response
+
+def apply_stop(pieces: Iterator[str], stop: list[str] | None) -> Iterator[str]:
+    """
+    Reemite fragmentos de texto até à primeira stop sequence (exclusive)
+
+    Retém caracteres suficientes para nunca emitir o início de uma stop sequence;
+    encontrada uma, termina sem consumir o resto de `pieces`.
+    """
+    stop = stop or []
+    holdback = max((len(s) for s in stop), default=1) - 1
+    text = ""
+    emitted = 0
+
+    for piece in pieces:
+        text += piece
+        cut = min((text.find(s) for s in stop if s in text), default=-1)
+        end = cut if cut >= 0 else len(text) - holdback
+        if end > emitted:
+            yield text[emitted:end]
+            emitted = end
+        if cut >= 0:
+            return
+
+    if emitted < len(text):
+        yield text[emitted:]
 
 
 class MedGemmaOllama:
@@ -189,11 +536,22 @@ class MedGemmaOllama:
     3. Usar este wrapper
     """
 
-    def __init__(self, model_name: str = "medgemma", base_url: str = "http://localhost:11434"):
+    def __init__(
+        self,
+        model_name: str = "medgemma",
+        base_url: str = "http://localhost:11434",
+        temperature: float = 0.7,
+        top_p: float | None = None,
+        top_k: int | None = None,
+        max_new_tokens: int | None = None,
+    ):
         """
         Args:
             model_name: Nome do modelo no Ollama
             base_url: URL do servidor Ollama
+            temperature: Controla aleatoriedade (0.0 = determinístico, 1.0 = criativo)
+            top_p, top_k: Amostragem (default: do modelo no Ollama)
+            max_new_tokens: Máximo de tokens gerados (`num_predict`)
         """
         try:
             from langchain_community.llms import Ollama
@@ -201,7 +559,10 @@ class MedGemmaOllama:
             self.llm = Ollama(
                 model=model_name,
                 base_url=base_url,
-                temperature=0.7,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+                num_predict=max_new_tokens,
             )
             logger.info(f"✓ MedGemma Ollama conectado: {base_url}")
         except ImportError as err:
@@ -228,12 +589,19 @@ class MedGemmaVertexAI:
         project_id: str | None = None,
         location: str = "us-central1",
         model_name: str = "medgemma-2b",
+        temperature: float = 0.7,
+        top_p: float | None = None,
+        top_k: int | None = None,
+        max_new_tokens: int = 1024,
     ):
         """
         Args:
             project_id: ID do projeto GCP (ou usar GOOGLE_CLOUD_PROJECT env var)
             location: Região GCP
             model_name: Nome do modelo MedGemma
+            temperature: Controla aleatoriedade (0.0 = determinístico, 1.0 = criativo)
+            top_p, top_k: Amostragem (default: do modelo)
+            max_new_tokens: Máximo de tokens gerados (`max_output_tokens`)
         """
         try:
             from langchain_google_vertexai import VertexAI
@@ -246,8 +614,10 @@ class MedGemmaVertexAI:
                 model_name=model_name,
                 project=self.project_id,
                 location=location,
-                temperature=0.7,
-                max_output_tokens=1024,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+                max_output_tokens=max_new_tokens,
             )
             logger.info(f"✓ MedGemma Vertex AI conectado: {self.project_id}")
         except ImportError as err:
@@ -258,32 +628,129 @@ class MedGemmaVertexAI:
         return self.llm
 
 
+def llm_kwargs(config: "MedGemmaConfig") -> dict:
+    """
+    Converte a configuração nos argumentos de `get_medgemma_llm` para cada provider
+
+    Os parâmetros de geração vêm do perfil por omissão da configuração
+    (`config.profile()`), em todos os providers.
+    """
+    generation = config.profile()
+    sampling = {
+        "temperature": generation.temperature if generation.do_sample else 0.0,
+        "top_p": generation.top_p,
+        "top_k": generation.top_k,
+        "max_new_tokens": generation.max_new_tokens,
+    }
+    if config.provider == "huggingface":
+        return {
+            "provider": "huggingface",
+            "model_size": config.model_size,
+            "device": config.device,
+            "use_quantization": config.use_quantization,
+            "use_snapshot": config.use_snapshot,
+            "snapshot_dir": config.snapshot_dir or None,
+            "batch_window_ms": config.batch_window_ms,
+            "max_batch_size": config.max_batch_size,
+            "max_length": config.max_length,
+            **sampling,
+            "do_sample": generation.do_sample,
+        }
+    if config.provider == "ollama":
+        return {
+            "provider": "ollama",
+            "model_name": config.ollama_model_name,
+            "base_url": config.ollama_base_url,
+            **sampling,
+        }
+    if config.provider == "ollama-pool":
+        return {
+            "provider": "ollama-pool",
+            "base_urls": config.ollama_base_urls or [config.ollama_base_url],
+            "model_name": config.ollama_model_name,
+            **sampling,
+        }
+    if config.provider == "local-server":
+        return {
+            "provider": "local-server",
+            "base_url": config.local_server_url,
+            **sampling,
+        }
+    return {
+        "provider": "vertexai",
+        "project_id": config.gcp_project_id or None,
+        "location": config.gcp_location,
+        **sampling,
+    }
+
+
+def profile_kwargs(llm: Any, profile: "GenerationProfile") -> dict:
+    """
+    Argumentos por chamada que aplicam `profile` a `llm` (ex: `llm.bind(**...)`)
+
+    Os wrappers deste módulo aceitam o vocabulário comum de `GenerationProfile`;
+    Ollama e Vertex AI recebem os nomes nativos (greedy = temperatura 0).
+    """
+    temperature = profile.temperature if profile.do_sample else 0.0
+    llm_type = getattr(llm, "_llm_type", "")
+    if llm_type == "ollama-llm":
+        return {
+            "num_predict": profile.max_new_tokens,
+            "temperature": temperature,
+            "top_p": profile.top_p,
+            "top_k": profile.top_k,
+        }
+    if llm_type == "vertexai":
+        return {
+            "max_output_tokens": profile.max_new_tokens,
+            "temperature": temperature,
+            "top_p": profile.top_p,
+            "top_k": profile.top_k,
+        }
+    return profile.to_dict()
+
+
 def get_medgemma_llm(
     provider: str = "huggingface",
     model_size: str = "2b",
+    config: "MedGemmaConfig | None" = None,
     **kwargs
 ) -> LLM:
     """
     Factory function para criar instância MedGemma
 
     Args:
-        provider: "huggingface", "ollama", ou "vertexai"
+        provider: "huggingface", "ollama", "ollama-pool", "local-server" ou "vertexai"
         model_size: "2b" ou "7b" (apenas para huggingface)
+        config: Configuração completa (provider, modelo e perfil de geração);
+            substitui `provider`/`model_size`, `kwargs` têm prioridade
         **kwargs: Parâmetros específicos do provider
 
     Returns:
         Instância LangChain LLM
 
     Exemplo:
+        # A partir da configuração (.env)
+        llm = get_medgemma_llm(config=MedGemmaConfig.from_env())
+
         # HuggingFace (local)
         llm = get_medgemma_llm("huggingface", model_size="2b")
 
         # Ollama (local simplificado)
         llm = get_medgemma_llm("ollama")
 
+        # Várias réplicas Ollama com balanceamento de carga
+        llm = get_medgemma_llm("ollama-pool", base_urls=["http://gpu1:11434", "http://gpu2:11434"])
+
+        # Servidor local do modelo (scripts/model_server.py), partilhado entre processos
+        llm = get_medgemma_llm("local-server", base_url="unix:///tmp/helth-llm.sock")
+
         # Vertex AI (produção)
         llm = get_medgemma_llm("vertexai", project_id="meu-projeto")
     """
+    if config is not None:
+        return get_medgemma_llm(**{**llm_kwargs(config), **kwargs})
+
     if provider == "huggingface":
         model_name = kwargs.pop("model_name", f"google/medgemma-{model_size}")
         return MedGemmaLangChain(model_name=model_name, **kwargs)
@@ -291,11 +758,21 @@ def get_medgemma_llm(
     elif provider == "ollama":
         return MedGemmaOllama(**kwargs).get_llm()
 
+    elif provider == "ollama-pool":
+        from .ollama_pool import MedGemmaOllamaPool
+
+        return MedGemmaOllamaPool.from_urls(**kwargs)
+
+    elif provider == "local-server":
+        from .model_server import MedGemmaLocalServer
+
+        return MedGemmaLocalServer(**kwargs)
+
     elif provider == "vertexai":
         return MedGemmaVertexAI(**kwargs).get_llm()
 
     else:
         raise ValueError(
             f"Provider desconhecido: {provider}. Use 'huggingface', "
-            "'ollama', ou 'vertexai'"
+            "'ollama', 'ollama-pool', 'local-server' ou 'vertexai'"
         )
@@ -0,0 +1,268 @@
+"""
+Servidor local do modelo (uma cópia dos pesos por máquina)
+
+Com `device="cpu"`, cada processo que cria `MedGemmaHuggingFace` (sessões
+Streamlit, ingestão, jobs em lote) carrega a sua própria cópia dos pesos. O
+servidor carrega o modelo uma vez e expõe geração e streaming por HTTP local ou
+Unix socket; os clientes usam o provider "local-server" de `get_medgemma_llm`.
+
+Com `workers > 1` o processo carrega o modelo e só depois faz fork: os workers
+partilham as páginas de memória dos pesos (só leitura, copy-on-write) e aceitam
+ligações do mesmo socket, cada um com o seu GIL.
+
+Protocolo:
+    GET  /health    → {"status": "ok", "model": ..., "pid": ...}
+    POST /generate  {"prompt": ..., "options": {...}}
+                    → NDJSON: {"token": "..."} por fragmento, depois {"done": true}
+                      (fechar a ligação interrompe a geração)
+
+Arranque:
+    python scripts/model_server.py --model google/medgemma-2b --device cpu --workers 2
+    python scripts/model_server.py --url unix:///tmp/helth-llm.sock
+"""
+
+import http.client
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import urlsplit
+
+from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+from .medgemma import apply_stop
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+# Opções aceites do cliente (restantes são ignoradas)
+GENERATION_OPTIONS = {"max_new_tokens", "temperature", "do_sample", "top_p", "top_k"}
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _make_handler(model: Any, slots: threading.Semaphore):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):  # noqa: N802
+            if self.path != "/health":
+                self._json(404, {"error": "not found"})
+                return
+            self._json(200, {"status": "ok", "model": model.model_name, "pid": os.getpid()})
+
+        def do_POST(self):  # noqa: N802
+            if self.path != "/generate":
+                self._json(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = request["prompt"]
+                options = {
+                    k: v for k, v in (request.get("options") or {}).items()
+                    if k in GENERATION_OPTIONS
+                }
+            except (KeyError, TypeError, ValueError) as e:
+                self._json(400, {"error": f"pedido inválido: {e}"})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            with slots:
+                tokens = model.stream(prompt, **options)
+                try:
+                    for token in tokens:
+                        self._chunk({"token": token})
+                    self._chunk({"done": True})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # Cliente desligou (ex: stop sequence): interromper a geração
+                    pass
+                except Exception as e:
+                    logger.error(f"Erro na geração: {e}")
+                    self._chunk({"error": str(e)})
+                    self.wfile.write(b"0\r\n\r\n")
+                finally:
+                    tokens.close()
+
+        def _chunk(self, body: dict) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode() + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(
+    model: Any,
+    url: str = DEFAULT_URL,
+    workers: int = 1,
+    max_concurrency: int = 1,
+) -> None:
+    """
+    Serve `model` (MedGemmaHuggingFace já carregado) até ser interrompido
+
+    Args:
+        model: Modelo carregado (com `stream(prompt, **options)` e `model_name`)
+        url: "http://host:porta" ou "unix:///caminho/do/socket"
+        workers: Processos (fork depois do carregamento; pesos partilhados)
+        max_concurrency: Gerações simultâneas por worker
+    """
+    target = urlsplit(url)
+    handler = _make_handler(model, threading.Semaphore(max_concurrency))
+    if target.scheme == "unix":
+        if os.path.exists(target.path):
+            os.unlink(target.path)
+        server = _UnixHTTPServer(target.path, handler)
+    else:
+        server = ThreadingHTTPServer((target.hostname, target.port or 80), handler)
+
+    children = []
+    for _ in range(workers - 1):
+        pid = os.fork()
+        if pid == 0:
+            children = []
+            break
+        children.append(pid)
+
+    if workers > 1:
+        try:
+            import torch
+
+            torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+        except ImportError:
+            pass
+
+    logger.info(f"Servidor do modelo em {url} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for pid in children:
+            os.waitpid(pid, 0)
+
+
+# ----------------------------------------------------------------------
+# Cliente
+# ----------------------------------------------------------------------
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float | None = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def _connect(url: str, timeout: float | None) -> http.client.HTTPConnection:
+    target = urlsplit(url)
+    if target.scheme == "unix":
+        return _UnixHTTPConnection(target.path, timeout=timeout)
+    return http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+
+
+def stream_generate(
+    url: str, prompt: str, options: dict | None = None, timeout: float | None = 300.0
+) -> Iterator[str]:
+    """Fragmentos gerados pelo servidor; fechar o iterador interrompe a geração"""
+    conn = _connect(url, timeout)
+    try:
+        body = json.dumps({"prompt": prompt, "options": options or {}})
+        conn.request("POST", "/generate", body, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        if response.status != 200:
+            raise RuntimeError(f"Servidor do modelo: HTTP {response.status} {response.read()}")
+        for line in response:
+            message = json.loads(line)
+            if "error" in message:
+                raise RuntimeError(f"Servidor do modelo: {message['error']}")
+            if message.get("done"):
+                return
+            yield message["token"]
+    finally:
+        conn.close()
+
+
+class MedGemmaLocalServer(LLM):
+    """LLM LangChain que gera através do servidor local do modelo"""
+
+    base_url: str = DEFAULT_URL
+    temperature: float = 0.7
+    top_p: float = 0.9
+    top_k: int = 50
+    max_new_tokens: int = 512
+    do_sample: bool = True
+    timeout: float = 300.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "medgemma-local-server"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"base_url": self.base_url}
+
+    def _options(self, **kwargs) -> dict:
+        return {
+            "temperature": kwargs.get("temperature", self.temperature),
+            "top_p": kwargs.get("top_p", self.top_p),
+            "top_k": kwargs.get("top_k", self.top_k),
+            "max_new_tokens": kwargs.get("max_new_tokens", self.max_new_tokens),
+            "do_sample": kwargs.get("do_sample", self.do_sample),
+        }
+
+    def _call(
+        self,
+        prompt: str,
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> Iterator[GenerationChunk]:
+        tokens = stream_generate(self.base_url, prompt, self._options(**kwargs), self.timeout)
+        try:
+            for text in apply_stop(tokens, stop):
+                chunk = GenerationChunk(text=text)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            tokens.close()
@@ -0,0 +1,340 @@
+"""
+Pool de réplicas Ollama com balanceamento de carga
+
+- Encaminhamento por menor número de pedidos em curso (least outstanding requests)
+- Ejeção de réplicas que falham e readmissão após health-check
+- Retry automático noutra réplica
+- Ligações HTTP keep-alive reutilizadas (uma `requests.Session` por réplica)
+"""
+
+import json
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Argumentos de `OllamaPool` aceites por `MedGemmaOllamaPool.from_urls`
+_POOL_ARGS = (
+    "max_connections",
+    "timeout",
+    "max_retries",
+    "failure_threshold",
+    "eject_seconds",
+    "health_check_interval",
+)
+
+
+class NoHealthyReplicaError(RuntimeError):
+    """Nenhuma réplica disponível para atender o pedido"""
+
+
+@dataclass
+class OllamaReplica:
+    """Estado de uma réplica Ollama"""
+
+    base_url: str
+    session: requests.Session = field(repr=False)
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    total_requests: int = 0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+
+class OllamaPool:
+    """
+    Conjunto de servidores Ollama tratados como um único backend
+
+    Exemplo:
+        pool = OllamaPool(["http://gpu1:11434", "http://gpu2:11434"])
+        texto = pool.generate("medgemma", "O que é hipertensão?", {"temperature": 0.5})
+    """
+
+    def __init__(
+        self,
+        base_urls: list[str],
+        max_connections: int = 16,
+        timeout: float = 120.0,
+        max_retries: int = 2,
+        failure_threshold: int = 1,
+        eject_seconds: float = 30.0,
+        health_check_interval: float | None = 10.0,
+    ):
+        """
+        Args:
+            base_urls: URLs dos servidores Ollama
+            max_connections: Ligações keep-alive por réplica
+            timeout: Timeout de cada pedido HTTP (segundos)
+            max_retries: Tentativas adicionais noutras réplicas
+            failure_threshold: Falhas consecutivas até ejetar a réplica
+            eject_seconds: Tempo de ejeção antes de voltar a tentar a réplica
+            health_check_interval: Intervalo do health-check em background (None desativa)
+        """
+        if not base_urls:
+            raise ValueError("É necessário pelo menos um endpoint Ollama")
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.health_check_interval = health_check_interval
+        self.replicas = [
+            OllamaReplica(base_url=url.rstrip("/"), session=self._make_session(max_connections))
+            for url in base_urls
+        ]
+        self._lock = threading.Lock()
+        self._next = 0  # desempate round-robin
+
+        self._stop = threading.Event()
+        if health_check_interval:
+            threading.Thread(
+                target=self._health_loop, args=(health_check_interval,), daemon=True
+            ).start()
+
+    @staticmethod
+    def _make_session(max_connections: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    # ------------------------------------------------------------------
+    # Seleção de réplicas
+    # ------------------------------------------------------------------
+
+    def _acquire(self, exclude: set[str]) -> OllamaReplica:
+        """Escolhe a réplica disponível com menos pedidos em curso"""
+        with self._lock:
+            candidates = [
+                r for r in self.replicas if r.available and r.base_url not in exclude
+            ]
+            if not candidates:
+                # Todas ejetadas: tentar a que volta mais cedo em vez de falhar logo
+                candidates = [r for r in self.replicas if r.base_url not in exclude]
+                candidates = sorted(candidates, key=lambda r: r.ejected_until)[:1]
+            if not candidates:
+                raise NoHealthyReplicaError("Nenhuma réplica Ollama disponível")
+
+            n = len(candidates)
+            start = self._next % n
+            self._next += 1
+            rotated = candidates[start:] + candidates[:start]
+            replica = min(rotated, key=lambda r: r.outstanding)
+            replica.outstanding += 1
+            replica.total_requests += 1
+            return replica
+
+    def _release(self, replica: OllamaReplica, ok: bool) -> None:
+        with self._lock:
+            replica.outstanding -= 1
+            if ok:
+                replica.consecutive_failures = 0
+                return
+            replica.consecutive_failures += 1
+            if replica.consecutive_failures >= self.failure_threshold:
+                replica.ejected_until = time.monotonic() + self.eject_seconds
+                logger.warning(f"Réplica Ollama ejetada: {replica.base_url}")
+
+    # ------------------------------------------------------------------
+    # Health-check
+    # ------------------------------------------------------------------
+
+    def check_health(self) -> dict[str, bool]:
+        """
+        Verifica todas as réplicas (GET /api/tags) e atualiza o estado de ejeção
+
+        Uma sonda falhada conta como uma falha de pedido: a réplica só é ejetada
+        ao fim de `failure_threshold` falhas consecutivas.
+        """
+        status = {}
+        for replica in self.replicas:
+            try:
+                replica.session.get(f"{replica.base_url}/api/tags", timeout=5).raise_for_status()
+                healthy = True
+            except requests.RequestException:
+                healthy = False
+
+            with self._lock:
+                if healthy:
+                    if replica.ejected_until:
+                        logger.info(f"Réplica Ollama readmitida: {replica.base_url}")
+                    replica.ejected_until = 0.0
+                    replica.consecutive_failures = 0
+                else:
+                    # Mesmo limiar de falhas consecutivas dos pedidos
+                    replica.consecutive_failures += 1
+                    if replica.consecutive_failures >= self.failure_threshold:
+                        replica.ejected_until = time.monotonic() + self.eject_seconds
+            status[replica.base_url] = healthy
+        return status
+
+    def _health_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.check_health()
+
+    def close(self) -> None:
+        """Pára o health-check e fecha as ligações"""
+        self._stop.set()
+        for replica in self.replicas:
+            replica.session.close()
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Estado atual de cada réplica"""
+        with self._lock:
+            return [
+                {
+                    "base_url": r.base_url,
+                    "outstanding": r.outstanding,
+                    "available": r.available,
+                    "total_requests": r.total_requests,
+                }
+                for r in self.replicas
+            ]
+
+    # ------------------------------------------------------------------
+    # Pedidos
+    # ------------------------------------------------------------------
+
+    def _post(self, path: str, payload: dict, stream: bool = False):
+        """POST na melhor réplica, com retry noutra réplica em caso de falha"""
+        tried: set[str] = set()
+        last_error: Exception | None = None
+
+        for _ in range(self.max_retries + 1):
+            try:
+                replica = self._acquire(tried)
+            except NoHealthyReplicaError:
+                break
+            tried.add(replica.base_url)
+            try:
+                response = replica.session.post(
+                    f"{replica.base_url}{path}", json=payload, timeout=self.timeout, stream=stream
+                )
+                if response.status_code >= 500:
+                    response.close()
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            except requests.RequestException as e:
+                self._release(replica, ok=False)
+                last_error = e
+                logger.warning(f"Falha em {replica.base_url}: {e}; a tentar outra réplica")
+                continue
+
+            if response.status_code >= 400:
+                # Erro do pedido (ex: modelo inexistente): não é culpa da réplica
+                self._release(replica, ok=True)
+                with response:
+                    response.raise_for_status()
+            return replica, response
+
+        raise NoHealthyReplicaError(
+            f"Pedido falhou em todas as réplicas tentadas: {sorted(tried)}"
+        ) from last_error
+
+    def generate(self, model: str, prompt: str, options: dict | None = None) -> str:
+        """Gera a resposta completa (POST /api/generate, stream=false)"""
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {}}
+        replica, response = self._post("/api/generate", payload)
+        try:
+            return response.json().get("response", "")
+        finally:
+            self._release(replica, ok=True)
+
+    def stream(self, model: str, prompt: str, options: dict | None = None) -> Iterator[str]:
+        """Gera a resposta em streaming (NDJSON), fragmento a fragmento"""
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options or {}}
+        replica, response = self._post("/api/generate", payload, stream=True)
+        ok = False
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
+            ok = True
+        finally:
+            response.close()
+            self._release(replica, ok=ok)
+
+
+class MedGemmaOllamaPool(LLM):
+    """
+    MedGemma servido por várias réplicas Ollama (wrapper LangChain)
+
+    Exemplo:
+        llm = MedGemmaOllamaPool.from_urls(
+            ["http://gpu1:11434", "http://gpu2:11434"], temperature=0.5
+        )
+    """
+
+    pool: Any
+    model_name: str = "medgemma"
+    temperature: float = 0.7
+    top_p: float = 0.9
+    top_k: int = 50
+    max_new_tokens: int | None = None
+
+    @classmethod
+    def from_urls(cls, base_urls: list[str], **kwargs) -> "MedGemmaOllamaPool":
+        pool_kwargs = {k: kwargs.pop(k) for k in _POOL_ARGS if k in kwargs}
+        return cls(pool=OllamaPool(base_urls, **pool_kwargs), **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "medgemma-ollama-pool"
+
+    def _options(self, stop: list[str] | None, **kwargs) -> dict:
+        options = {
+            "temperature": kwargs.get("temperature", self.temperature),
+            "top_p": kwargs.get("top_p", self.top_p),
+            "top_k": kwargs.get("top_k", self.top_k),
+        }
+        if not kwargs.get("do_sample", True):
+            # Greedy (perfis sem amostragem)
+            options["temperature"] = 0.0
+        max_new_tokens = kwargs.get("max_new_tokens", self.max_new_tokens)
+        if max_new_tokens is not None:
+            options["num_predict"] = max_new_tokens
+        if stop:
+            options["stop"] = stop
+        return options
+
+    def _call(
+        self,
+        prompt: str,
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> str:
+        """Executa o modelo na réplica menos ocupada"""
+        return self.pool.generate(self.model_name, prompt, self._options(stop, **kwargs))
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> Iterator[GenerationChunk]:
+        """Executa o modelo em streaming na réplica menos ocupada"""
+        for text in self.pool.stream(self.model_name, prompt, self._options(stop, **kwargs)):
+            chunk = GenerationChunk(text=text)
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
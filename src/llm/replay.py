@@ -0,0 +1,177 @@
+"""
+Gravação e reprodução de respostas do LLM
+
+Permite testar carga do `MedicalDecisionAgent` sem GPU nem Ollama:
+1. `LLMRecorder` (callback) grava as respostas reais do provider, incluindo
+   mensagens com tool calls, num ficheiro JSONL
+2. `ReplayChatModel` devolve essas respostas com latência simulada, medindo
+   só o overhead do nosso código (prompt, dispatch de ferramentas, parsing)
+
+A chave de cada resposta é o prompt em texto (`prompt_key`): igual quer a
+chamada chegue como string (LLM de texto) quer como mensagens (chat model).
+Para as tool calls ficarem gravadas como tal, o recorder deve estar no chat
+model que o agente usa (ex: `TextToolCallingChat` à volta do provider) e não
+no LLM de texto por baixo dele.
+
+Exemplo:
+    recorder = LLMRecorder("gravacoes.jsonl")
+    llm = TextToolCallingChat(llm=get_medgemma_llm("ollama"))
+    llm.callbacks = [recorder]
+    ...  # correr perguntas no agente
+
+    llm = ReplayChatModel.from_file("gravacoes.jsonl", latency="recorded")
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Literal
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    get_buffer_string,
+    messages_from_dict,
+    messages_to_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field, PrivateAttr
+
+
+def prompt_key(messages: list[BaseMessage] | str) -> str:
+    """
+    Chave estável de um prompt
+
+    Mensagens são convertidas no texto que um LLM de texto recebe
+    (`get_buffer_string`, como `ChatPromptValue.to_string`): a gravação de um
+    LLM (`on_llm_start`, string) e a reprodução num chat model (mensagens) dão
+    a mesma chave. Ids e metadados de cada execução não entram.
+    """
+    text = messages if isinstance(messages, str) else get_buffer_string(messages)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class LLMRecorder(BaseCallbackHandler):
+    """Callback que grava prompt, resposta e latência de cada chamada ao LLM"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._pending: dict[UUID, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, key: str) -> None:
+        self._pending[run_id] = {"key": key, "start": time.perf_counter(), "ttft": None}
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._start(run_id, prompt_key(prompts[0]))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._start(run_id, prompt_key(messages[0]))
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        pending = self._pending.get(run_id)
+        if pending is not None and pending["ttft"] is None:
+            pending["ttft"] = time.perf_counter() - pending["start"]
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        pending = self._pending.pop(run_id, None)
+        if pending is None or not response.generations:
+            return
+
+        generation = response.generations[0][0]
+        message = getattr(generation, "message", None)
+        if message is None:
+            message = AIMessage(content=generation.text)
+        record = {
+            "key": pending["key"],
+            "message": messages_to_dict([message])[0],
+            "latency_s": time.perf_counter() - pending["start"],
+            "ttft_s": pending["ttft"],
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._pending.pop(run_id, None)
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model que reproduz respostas gravadas
+
+    A resposta é escolhida pela chave do prompt; sem correspondência (ex: prompt
+    alterado) é um erro (KeyError). Com `strict=False`, usa antes as gravações
+    por ordem, em ciclo (só para carga, quando a resposta exata não importa).
+    """
+
+    records: list[dict[str, Any]] = Field(default_factory=list)
+    latency: Literal["recorded"] | float | None = "recorded"
+    latency_scale: float = 1.0
+    strict: bool = True
+
+    _by_key: dict[str, list[dict[str, Any]]] = PrivateAttr(default_factory=dict)
+    _cursor: dict[str, int] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        for record in self.records:
+            self._by_key.setdefault(record["key"], []).append(record)
+
+    @classmethod
+    def from_file(cls, path: str | Path, **kwargs) -> "ReplayChatModel":
+        """
+        Args:
+            path: Ficheiro JSONL gravado com `LLMRecorder`
+            **kwargs: latency ("recorded", segundos fixos ou None), latency_scale, strict
+        """
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        return cls(records=records, **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools, **kwargs):
+        # As tool calls vêm das gravações; as ferramentas não alteram a resposta
+        return self
+
+    def _next(self, key: str) -> dict[str, Any]:
+        with self._lock:
+            candidates = self._by_key.get(key)
+            if candidates is None:
+                if self.strict:
+                    raise KeyError(f"Prompt sem gravação correspondente (chave {key[:12]})")
+                key, candidates = "*", self.records
+            if not candidates:
+                raise ValueError("Nenhuma gravação carregada")
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            return candidates[i % len(candidates)]
+
+    def _sleep(self, record: dict[str, Any]) -> None:
+        if self.latency is None:
+            return
+        seconds = record.get("latency_s", 0.0) if self.latency == "recorded" else self.latency
+        if seconds:
+            time.sleep(seconds * self.latency_scale)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> ChatResult:
+        record = self._next(prompt_key(messages))
+        self._sleep(record)
+        message = messages_from_dict([record["message"]])[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
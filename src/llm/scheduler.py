@@ -0,0 +1,374 @@
+"""
+Escalonador de pedidos ao LLM
+
+Fica entre o `MedicalDecisionAgent` (ou jobs batch) e o backend do LLM:
+- Fila limitada com rejeição rápida quando o sistema está sobrecarregado
+- Classes de prioridade: pedidos interativos passam à frente de jobs batch
+- Limite de concorrência por tenant
+- Pedidos cujo prazo expira enquanto esperam são descartados
+- Profundidade da fila, tempo de espera e rejeições exportados como métricas
+
+`acquire` bloqueia a thread; `aacquire` espera no event loop (agentes no loop
+partilhado de src.db.loop), sem ocupar uma thread por chamada em fila, e
+devolve a vez ou sai da fila se a tarefa for cancelada.
+"""
+
+import asyncio
+import bisect
+import itertools
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.observability.metrics import REGISTRY
+
+QUEUE_DEPTH = REGISTRY.gauge("helth_llm_queue_depth", "Pedidos à espera de vez no LLM")
+INFLIGHT = REGISTRY.gauge("helth_llm_inflight", "Pedidos em execução no LLM")
+QUEUE_WAIT = REGISTRY.histogram(
+    "helth_llm_queue_wait_seconds", "Tempo de espera na fila até ser admitido"
+)
+REJECTED = REGISTRY.counter("helth_llm_rejected_total", "Pedidos rejeitados ou descartados")
+
+
+class Priority(IntEnum):
+    """Classe de prioridade (menor valor = atendido primeiro)"""
+
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class SchedulerOverloadedError(RuntimeError):
+    """Fila cheia: o pedido é rejeitado sem esperar"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """O prazo do pedido expirou antes de ser admitido"""
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    tenant: str = field(compare=False)
+    deadline: float | None = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    event: threading.Event = field(compare=False, default_factory=threading.Event)
+    granted: bool = field(compare=False, default=False)
+    expired: bool = field(compare=False, default=False)
+    # Aviso extra (ex: acordar uma corrotina no seu loop); chamado com o lock
+    waker: Callable[[], None] | None = field(compare=False, default=None)
+
+    def wake(self) -> None:
+        self.event.set()
+        if self.waker is not None:
+            self.waker()
+
+
+class LLMScheduler:
+    """
+    Controlo de admissão para chamadas ao LLM
+
+    Exemplo:
+        scheduler = LLMScheduler(max_concurrency=2, max_queue=32, per_tenant_limit=1)
+        with scheduler.slot(priority=Priority.BATCH, tenant="coorte", timeout=60):
+            llm.invoke(prompt)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 1,
+        max_queue: int = 64,
+        per_tenant_limit: int | None = None,
+        batch_queue_share: float = 0.5,
+    ):
+        """
+        Args:
+            max_concurrency: Chamadas simultâneas ao LLM
+            max_queue: Máximo de pedidos em espera (acima disto rejeita)
+            per_tenant_limit: Chamadas simultâneas por tenant (None = sem limite)
+            batch_queue_share: Fração da fila que pedidos batch podem ocupar,
+                reservando o resto para pedidos interativos
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.per_tenant_limit = per_tenant_limit
+        self.batch_queue_limit = max(1, int(max_queue * batch_queue_share))
+
+        self._lock = threading.Lock()
+        self._queue: list[_Ticket] = []  # ordenada por (prioridade, ordem de chegada)
+        self._seq = itertools.count()
+        self._running = 0
+        self._running_by_tenant: dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # Admissão
+    # ------------------------------------------------------------------
+
+    def acquire(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        tenant: str = "default",
+        timeout: float | None = None,
+    ) -> float:
+        """
+        Espera por vez para chamar o LLM
+
+        Args:
+            priority: Classe de prioridade
+            tenant: Identificador do tenant (limite de concorrência próprio)
+            timeout: Prazo em segundos; expirado na fila o pedido é descartado
+
+        Returns:
+            Tempo de espera na fila (segundos)
+
+        Raises:
+            SchedulerOverloadedError: fila cheia
+            DeadlineExceededError: prazo expirou antes da admissão
+        """
+        ticket = self._enqueue(priority, tenant, timeout)
+        ticket.event.wait(self._remaining(ticket))
+        return self._admitted(ticket)
+
+    async def aacquire(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        tenant: str = "default",
+        timeout: float | None = None,
+    ) -> float:
+        """
+        Como `acquire`, mas espera no event loop em vez de bloquear a thread
+
+        Cancelada enquanto espera, a tarefa sai da fila (ou devolve a vez, se já
+        tinha sido admitida) antes de propagar o cancelamento.
+        """
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+        ticket = self._enqueue(
+            priority, tenant, timeout, waker=lambda: loop.call_soon_threadsafe(woken.set)
+        )
+        try:
+            await asyncio.wait_for(woken.wait(), self._remaining(ticket))
+        except TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._abandon(ticket)
+            raise
+        return self._admitted(ticket)
+
+    def _enqueue(
+        self,
+        priority: Priority,
+        tenant: str,
+        timeout: float | None,
+        waker: Callable[[], None] | None = None,
+    ) -> _Ticket:
+        """Põe o pedido na fila (ou rejeita-o) e admite o que for possível"""
+        now = time.monotonic()
+        ticket = _Ticket(
+            priority=int(priority),
+            seq=next(self._seq),
+            tenant=tenant,
+            deadline=now + timeout if timeout is not None else None,
+            enqueued_at=now,
+            waker=waker,
+        )
+        label = Priority(priority).name.lower()
+
+        with self._lock:
+            queued = len(self._queue)
+            limit = self.batch_queue_limit if priority >= Priority.BATCH else self.max_queue
+            if queued >= limit:
+                REJECTED.inc(reason="overloaded", priority=label)
+                raise SchedulerOverloadedError(
+                    f"Fila do LLM cheia ({queued} pedidos à espera); tentar mais tarde"
+                )
+            bisect.insort(self._queue, ticket)
+            QUEUE_DEPTH.inc(priority=label)
+            self._dispatch()
+        return ticket
+
+    @staticmethod
+    def _remaining(ticket: _Ticket) -> float | None:
+        return None if ticket.deadline is None else ticket.deadline - time.monotonic()
+
+    def _admitted(self, ticket: _Ticket) -> float:
+        """Depois da espera: tempo de espera se admitido, senão sai da fila e falha"""
+        label = Priority(ticket.priority).name.lower()
+        with self._lock:
+            if not ticket.granted:
+                if not ticket.expired:
+                    self._queue.remove(ticket)
+                    QUEUE_DEPTH.dec(priority=label)
+                REJECTED.inc(reason="deadline", priority=label)
+                raise DeadlineExceededError("Prazo expirou enquanto esperava pelo LLM")
+
+        waited = time.monotonic() - ticket.enqueued_at
+        QUEUE_WAIT.observe(waited, priority=label)
+        return waited
+
+    def _abandon(self, ticket: _Ticket) -> None:
+        """Pedido desistido (ex: tarefa cancelada): sai da fila ou devolve a vez"""
+        label = Priority(ticket.priority).name.lower()
+        with self._lock:
+            if ticket.granted:
+                self._release_locked(ticket.tenant)
+            elif not ticket.expired:
+                self._queue.remove(ticket)
+                QUEUE_DEPTH.dec(priority=label)
+                REJECTED.inc(reason="cancelled", priority=label)
+
+    def release(self, tenant: str = "default") -> None:
+        """Liberta a vez obtida com `acquire`"""
+        with self._lock:
+            self._release_locked(tenant)
+
+    def _release_locked(self, tenant: str) -> None:
+        self._running -= 1
+        # Sem entradas a zero: um tenant por sessão faria o dicionário crescer sempre
+        if self._running_by_tenant[tenant] <= 1:
+            del self._running_by_tenant[tenant]
+        else:
+            self._running_by_tenant[tenant] -= 1
+        INFLIGHT.dec()
+        self._dispatch()
+
+    @contextmanager
+    def slot(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        tenant: str = "default",
+        timeout: float | None = None,
+    ) -> Iterator[float]:
+        """Context manager que envolve `acquire`/`release`"""
+        waited = self.acquire(priority=priority, tenant=tenant, timeout=timeout)
+        try:
+            yield waited
+        finally:
+            self.release(tenant)
+
+    def _dispatch(self) -> None:
+        """Admite os pedidos elegíveis (chamar com o lock adquirido)"""
+        now = time.monotonic()
+        i = 0
+        while i < len(self._queue) and self._running < self.max_concurrency:
+            ticket = self._queue[i]
+            label = Priority(ticket.priority).name.lower()
+
+            if ticket.deadline is not None and ticket.deadline <= now:
+                # Descartar já: não vale a pena ocupar o LLM com resposta que ninguém espera
+                self._queue.pop(i)
+                QUEUE_DEPTH.dec(priority=label)
+                ticket.expired = True
+                ticket.wake()
+                continue
+
+            running = self._running_by_tenant.get(ticket.tenant, 0)
+            if self.per_tenant_limit is not None and running >= self.per_tenant_limit:
+                i += 1  # tenant no limite: não bloqueia os restantes
+                continue
+
+            self._queue.pop(i)
+            QUEUE_DEPTH.dec(priority=label)
+            self._running += 1
+            self._running_by_tenant[ticket.tenant] = running + 1
+            INFLIGHT.inc()
+            ticket.granted = True
+            ticket.wake()
+
+    def stats(self) -> dict[str, Any]:
+        """Estado atual do escalonador"""
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "running": self._running,
+                "running_by_tenant": dict(self._running_by_tenant),
+            }
+
+
+class SchedulerCallbackHandler(BaseCallbackHandler):
+    """
+    Faz passar cada chamada ao LLM de um agente pelo escalonador
+
+    O LangChain invoca `on_llm_start` na thread da chamada, antes de contactar o
+    modelo; bloquear aqui atrasa a chamada até haver vez. `raise_error` faz com que
+    rejeições e prazos expirados interrompam a execução do agente. Para agentes
+    no event loop usar `AsyncSchedulerCallbackHandler`.
+    """
+
+    raise_error = True
+
+    def __init__(
+        self,
+        scheduler: LLMScheduler,
+        priority: Priority = Priority.INTERACTIVE,
+        tenant: str = "default",
+        timeout: float | None = None,
+    ):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.tenant = tenant
+        # O prazo é da pergunta inteira, não de cada chamada ao LLM
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self._active: set[UUID] = set()
+
+    def _timeout(self) -> float | None:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def _acquire(self, run_id: UUID) -> None:
+        self.scheduler.acquire(priority=self.priority, tenant=self.tenant, timeout=self._timeout())
+        self._active.add(run_id)
+
+    def _release(self, run_id: UUID) -> None:
+        if run_id in self._active:
+            self._active.discard(run_id)
+            self.scheduler.release(self.tenant)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs) -> None:
+        self._acquire(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._acquire(run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        self._release(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        self._release(run_id)
+
+
+class AsyncSchedulerCallbackHandler(SchedulerCallbackHandler):
+    """
+    `SchedulerCallbackHandler` para agentes no event loop (`ainvoke`/`astream`)
+
+    Com callbacks síncronos o LangChain executa cada `on_llm_start` no executor
+    por omissão: cada chamada em fila ocuparia uma thread. Aqui a espera é
+    `LLMScheduler.aacquire`, no próprio loop; se a tarefa for cancelada durante
+    a espera, a vez não fica presa.
+    """
+
+    async def _aacquire(self, run_id: UUID) -> None:
+        await self.scheduler.aacquire(
+            priority=self.priority, tenant=self.tenant, timeout=self._timeout()
+        )
+        self._active.add(run_id)
+
+    async def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs) -> None:
+        await self._aacquire(run_id)
+
+    async def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, **kwargs
+    ) -> None:
+        await self._aacquire(run_id)
+
+    async def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        self._release(run_id)
+
+    async def on_llm_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        self._release(run_id)
@@ -0,0 +1,141 @@
+"""
+Snapshots locais do modelo para arranques rápidos
+
+O primeiro carregamento de `MedGemmaHuggingFace` converte os pesos (float16 ou
+quantização 4-bit) e o tokenizer; com quantização isto demora minutos em cada
+processo. Depois do primeiro carregamento, o snapshot guarda os pesos já
+convertidos em safetensors (lidos por mmap) e o tokenizer na forma rápida
+serializada (tokenizer.json). Os arranques seguintes carregam o snapshot.
+
+Estrutura:
+    <MEDGEMMA_SNAPSHOT_DIR>/<modelo>-<formato>-<hash>/
+        model.safetensors, config.json, tokenizer.json, ..., snapshot.json
+
+A chave deriva dos campos de `MedGemmaConfig` que determinam os pesos
+(modelo e quantização), da identidade do checkpoint de origem e das versões
+de torch/transformers; device e parâmetros de geração não entram na chave.
+A identidade é o commit do Hub em cache (um download de uma revisão nova
+invalida o snapshot) ou, num diretório local, o tamanho e o mtime dos
+ficheiros de pesos, config e tokenizer (pesos substituídos no mesmo caminho
+também o invalidam).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = "~/.cache/helth/medgemma"
+MARKER = "snapshot.json"
+
+# Ficheiros de um checkpoint local que entram na sua identidade
+CHECKPOINT_SUFFIXES = (".safetensors", ".bin", ".json", ".model", ".txt")
+
+
+def snapshot_root(snapshot_dir: str | None = None) -> Path:
+    """Diretório base dos snapshots (argumento, MEDGEMMA_SNAPSHOT_DIR ou default)"""
+    root = snapshot_dir or os.getenv("MEDGEMMA_SNAPSHOT_DIR") or DEFAULT_SNAPSHOT_DIR
+    return Path(root).expanduser()
+
+
+def checkpoint_identity(model_name: str) -> str | None:
+    """
+    Identidade dos pesos de origem, sem acesso à rede
+
+    Diretório local: hash de (nome, tamanho, mtime) dos ficheiros de pesos,
+    config e tokenizer. Modelo do Hub: commit da revisão em cache; None se
+    ainda não foi descarregado.
+    """
+    path = Path(model_name).expanduser()
+    if path.is_dir():
+        files = sorted(
+            p for p in path.iterdir() if p.is_file() and p.suffix in CHECKPOINT_SUFFIXES
+        )
+        stats = [(p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in files]
+        return "local-" + hashlib.sha256(json.dumps(stats).encode()).hexdigest()[:16]
+
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return None
+    # .../models--<org>--<nome>/snapshots/<commit>/config.json
+    cached = try_to_load_from_cache(model_name, "config.json")
+    return Path(cached).parent.name if isinstance(cached, str) else None
+
+
+def snapshot_fields(model_name: str, use_quantization: bool) -> dict[str, Any]:
+    """Campos que identificam um snapshot (mudar qualquer um invalida-o)"""
+    import torch
+    import transformers
+
+    return {
+        "model_name": model_name,
+        "format": "nf4" if use_quantization else "float16",
+        "checkpoint": checkpoint_identity(model_name),
+        "torch": torch.__version__.split("+")[0],
+        "transformers": transformers.__version__,
+    }
+
+
+def snapshot_key(fields: dict[str, Any]) -> str:
+    """Nome do diretório do snapshot: legível e único por combinação de campos"""
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:12]
+    name = fields["model_name"].rstrip("/").rsplit("/", 1)[-1]
+    return f"{name}-{fields['format']}-{digest}"
+
+
+def snapshot_path(
+    model_name: str, use_quantization: bool, snapshot_dir: str | None = None
+) -> Path:
+    """Caminho do snapshot para um modelo e quantização"""
+    return snapshot_root(snapshot_dir) / snapshot_key(
+        snapshot_fields(model_name, use_quantization)
+    )
+
+
+def has_snapshot(path: Path) -> bool:
+    """True se o snapshot foi escrito por completo"""
+    return (path / MARKER).is_file()
+
+
+def save_snapshot(path: Path, model: Any, tokenizer: Any, fields: dict[str, Any]) -> bool:
+    """
+    Grava modelo e tokenizer em `path`
+
+    Escreve num diretório temporário e renomeia no fim, para que outro processo
+    nunca veja um snapshot incompleto. Falhas não são fatais (o modelo já está
+    carregado): ficam no log e devolve False.
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.mkdir(parents=True, exist_ok=True)
+        model.save_pretrained(tmp, safe_serialization=True)
+        tokenizer.save_pretrained(tmp)
+        (tmp / MARKER).write_text(
+            json.dumps({**fields, "created": time.time()}, indent=2), encoding="utf-8"
+        )
+        try:
+            tmp.rename(path)
+        except OSError:
+            # Outro processo gravou o mesmo snapshot entretanto
+            if not has_snapshot(path):
+                raise
+        logger.info(f"✓ Snapshot do modelo gravado em {path}")
+        return True
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o snapshot do modelo ({e})")
+        return False
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def discard_snapshot(path: Path) -> None:
+    """Remove um snapshot (ex: corrompido ou incompatível)"""
+    logger.warning(f"A descartar snapshot do modelo: {path}")
+    shutil.rmtree(path, ignore_errors=True)
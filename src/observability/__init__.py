@@ -0,0 +1,36 @@
+"""
+Observabilidade do sistema HELTH (métricas e tracing)
+"""
+
+from .metrics import REGISTRY, Counter, Gauge, Histogram, MetricsRegistry, start_metrics_server
+from .tracing import (
+    JsonlExporter,
+    MemoryExporter,
+    OtlpHttpExporter,
+    Span,
+    Tracer,
+    format_summary,
+    get_tracer,
+    load_spans,
+    set_tracer,
+    summarize,
+)
+
+__all__ = [
+    "REGISTRY",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "JsonlExporter",
+    "MemoryExporter",
+    "MetricsRegistry",
+    "OtlpHttpExporter",
+    "Span",
+    "Tracer",
+    "format_summary",
+    "get_tracer",
+    "load_spans",
+    "set_tracer",
+    "start_metrics_server",
+    "summarize",
+]
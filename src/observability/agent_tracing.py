@@ -0,0 +1,185 @@
+"""
+Callback LangChain que converte a execução do agente em spans
+
+Hierarquia:
+    agent.query
+    └── agent.iteration (uma por decisão do LLM)
+        ├── llm.call   (tokens de prompt/gerados, tempo até 1.º token, tokens/s)
+        └── tool.<nome>
+"""
+
+import time
+from collections.abc import Callable
+from contextvars import Token
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .tracing import Span, Tracer
+
+
+def approx_token_count(text: str) -> int:
+    """Estimativa de tokens (~4 caracteres por token) quando não há tokenizer"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Gera spans de uma pergunta ao agente (uma instância por pergunta)"""
+
+    def __init__(
+        self,
+        tracer: Tracer,
+        count_tokens: Callable[[str], int] = approx_token_count,
+        **query_attributes,
+    ):
+        """
+        Args:
+            tracer: Tracer de destino
+            count_tokens: Contador de tokens (ex: tokenizer do modelo)
+            **query_attributes: Atributos do span raiz (ex: tenant, prioridade)
+        """
+        self.tracer = tracer
+        self.count_tokens = count_tokens
+        self.query_attributes = query_attributes
+
+        self._root: Span | None = None
+        self._root_run: UUID | None = None
+        self._iteration: Span | None = None
+        self._iterations = 0
+        self._spans: dict[UUID, Span] = {}
+        self._llm_state: dict[UUID, dict[str, Any]] = {}
+        self._tokens: dict[UUID, Token] = {}
+
+    # ------------------------------------------------------------------
+    # Pergunta (chain raiz) e iterações
+    # ------------------------------------------------------------------
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id=None, **kwargs):
+        if self._root is None and parent_run_id is None:
+            question = inputs.get("input", "") if isinstance(inputs, dict) else ""
+            self._root = self.tracer.start_span(
+                "agent.query",
+                **self.query_attributes,
+                **{"agent.question_chars": len(str(question))},
+            )
+            self._root_run = run_id
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs):
+        if run_id == self._root_run:
+            self._finish()
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs):
+        if run_id == self._root_run:
+            self._finish(error)
+
+    def on_agent_finish(self, finish, *, run_id: UUID, **kwargs):
+        self._end_iteration()
+
+    def _start_iteration(self) -> Span:
+        self._end_iteration()
+        self._iterations += 1
+        self._iteration = self.tracer.start_span(
+            "agent.iteration", parent=self._root, **{"agent.iteration": self._iterations}
+        )
+        return self._iteration
+
+    def _end_iteration(self, error=None) -> None:
+        if self._iteration is not None:
+            self.tracer.end_span(self._iteration, error=error)
+            self._iteration = None
+
+    def _finish(self, error=None) -> None:
+        self._end_iteration(error)
+        if self._root is not None:
+            self._root.set(**{"agent.iterations": self._iterations})
+            self.tracer.end_span(self._root, error=error)
+            self._root = None
+
+    # ------------------------------------------------------------------
+    # Chamadas ao LLM
+    # ------------------------------------------------------------------
+
+    def _start_llm(self, run_id: UUID, prompt_text: str, serialized) -> None:
+        parent = self._start_iteration() if self._root is not None else None
+        span = self.tracer.start_span(
+            "llm.call",
+            parent=parent,
+            **{
+                "llm.model": (serialized or {}).get("name", "desconhecido"),
+                "llm.prompt_tokens": self.count_tokens(prompt_text),
+                "llm.prompt_chars": len(prompt_text),
+            },
+        )
+        self._spans[run_id] = span
+        self._llm_state[run_id] = {"start": time.perf_counter(), "first": None, "n": 0}
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._start_llm(run_id, "\n".join(prompts), serialized)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        text = "\n".join(str(m.content) for batch in messages for m in batch)
+        self._start_llm(run_id, text, serialized)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        state = self._llm_state.get(run_id)
+        if state is not None:
+            if state["first"] is None:
+                state["first"] = time.perf_counter()
+            state["n"] += 1
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        span = self._spans.pop(run_id, None)
+        state = self._llm_state.pop(run_id, None)
+        if span is None or state is None:
+            return
+
+        elapsed = time.perf_counter() - state["start"]
+        text = "".join(
+            g.text or str(getattr(getattr(g, "message", None), "content", ""))
+            for gens in response.generations for g in gens
+        )
+        generated = state["n"] or self.count_tokens(text)
+        span.set(**{"llm.generated_tokens": generated})
+        if state["first"] is not None:
+            ttft = state["first"] - state["start"]
+            span.set(**{"llm.time_to_first_token_ms": ttft * 1000})
+        if elapsed > 0:
+            span.set(**{"llm.tokens_per_second": generated / elapsed})
+        self.tracer.end_span(span)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._llm_state.pop(run_id, None)
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            self.tracer.end_span(span, error=error)
+
+    # ------------------------------------------------------------------
+    # Ferramentas
+    # ------------------------------------------------------------------
+
+    def on_tool_start(self, serialized, input_str: str, *, run_id: UUID, **kwargs):
+        name = (serialized or {}).get("name", "desconhecida")
+        span = self.tracer.start_span(
+            f"tool.{name}",
+            parent=self._iteration or self._root,
+            **{"tool.input_chars": len(input_str or "")},
+        )
+        self._spans[run_id] = span
+        # Spans criados dentro da ferramenta (ex: db.query) ficam como filhos
+        self._tokens[run_id] = self.tracer.activate(span)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs):
+        self._end_tool(run_id, output=output)
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs):
+        self._end_tool(run_id, error=error)
+
+    def _end_tool(self, run_id: UUID, output=None, error=None) -> None:
+        token = self._tokens.pop(run_id, None)
+        if token is not None:
+            self.tracer.deactivate(token)
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.set(**{"tool.output_chars": len(str(output or ""))})
+            self.tracer.end_span(span, error=error)
@@ -0,0 +1,413 @@
+"""
+Tracing de execuções do agente (spans compatíveis com OpenTelemetry)
+
+Cada pergunta gera uma árvore de spans (pergunta → iteração → chamada LLM /
+ferramenta), exportada para um ficheiro JSONL e/ou para um collector
+OpenTelemetry local via OTLP/HTTP (JSON). Sem exportadores configurados o
+tracer fica desativado e `span()` devolve um span nulo partilhado.
+
+Configuração por variáveis de ambiente:
+    TRACE_JSONL_PATH=traces.jsonl
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import secrets
+import statistics
+import threading
+import time
+import urllib.request
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "helth"
+
+
+@dataclass
+class Span:
+    """Intervalo de tempo nomeado com atributos"""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Span nulo usado quando o tracing está desativado"""
+
+    def set(self, **attributes) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+# ----------------------------------------------------------------------
+# Exportadores
+# ----------------------------------------------------------------------
+
+
+class JsonlExporter:
+    """
+    Escreve um span por linha num ficheiro JSONL
+
+    Como em `OtlpHttpExporter`, `export` só põe o span numa fila: uma thread
+    serializa e escreve os spans em bloco, com o ficheiro sempre aberto.
+    """
+
+    def __init__(self, path: str | Path, batch_size: int = 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self._file = self.path.open("a", encoding="utf-8")
+        self._queue: queue.Queue[Span | None] = queue.Queue(maxsize=10_000)
+        self._thread = threading.Thread(target=self._worker, name="trace-jsonl", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        # Preferível perder spans a bloquear o caminho crítico
+        with suppress(queue.Full):
+            self._queue.put_nowait(span)
+
+    def _worker(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # O que já está na fila segue no mesmo bloco (um flush por bloco)
+            with suppress(queue.Empty):
+                while len(batch) < self.batch_size and batch[-1] is not None:
+                    batch.append(self._queue.get_nowait())
+            lines = [
+                json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+                for span in batch
+                if span is not None
+            ]
+            try:
+                self._file.writelines(lines)
+                self._file.flush()
+            except OSError as e:
+                logger.warning(f"Falha ao escrever {len(lines)} spans em {self.path}: {e}")
+            if batch[-1] is None:
+                break
+        self._file.close()
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class MemoryExporter:
+    """Guarda os spans em memória (benchmarks e testes de carga)"""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """Envia spans em lote para um collector OpenTelemetry (OTLP/HTTP, JSON)"""
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318",
+        batch_size: int = 256,
+        flush_interval: float = 2.0,
+    ):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[Span | None] = queue.Queue(maxsize=10_000)
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        # Preferível perder spans a bloquear o caminho crítico
+        with suppress(queue.Full):
+            self._queue.put_nowait(span)
+
+    def _worker(self) -> None:
+        batch: list[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if span is None:
+                    break
+                batch.append(span)
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._send(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+        self._send(batch)
+
+    def _send(self, spans: list[Span]) -> None:
+        if not spans:
+            return
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [self._encode(s) for s in spans],
+            }],
+        }]}
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload, default=str).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError as e:
+            logger.warning(f"Falha ao exportar {len(spans)} spans para {self.url}: {e}")
+
+    @staticmethod
+    def _encode(span: Span) -> dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+# ----------------------------------------------------------------------
+# Tracer
+# ----------------------------------------------------------------------
+
+_current_span: ContextVar[Span | None] = ContextVar("helth_current_span", default=None)
+
+
+class Tracer:
+    """Cria spans e entrega-os aos exportadores quando terminam"""
+
+    def __init__(self, exporters: list | None = None):
+        self.exporters = list(exporters or [])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def start_span(self, name: str, parent: Span | None = None, **attributes) -> Span:
+        """Inicia um span (filho de `parent` ou do span ativo no contexto)"""
+        parent = parent or _current_span.get()
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+
+    def end_span(self, span: Span, error: BaseException | str | None = None) -> None:
+        """Termina o span e exporta-o"""
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = str(error) or type(error).__name__
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Falha no exportador de spans: {e}")
+
+    def activate(self, span: Span) -> Token:
+        """Torna `span` o pai dos spans criados a seguir neste contexto"""
+        return _current_span.set(span)
+
+    def deactivate(self, token: Token) -> None:
+        # ValueError: token de outro contexto (callbacks noutra thread)
+        with suppress(ValueError):
+            _current_span.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span | _NoopSpan]:
+        """
+        Context manager para medir um bloco de código
+
+        Exemplo:
+            with get_tracer().span("db.query", table="saude_transacional") as span:
+                rows = conn.execute(...)
+                span.set(rows=len(rows))
+        """
+        if not self.exporters:
+            yield NOOP_SPAN
+            return
+
+        span = self.start_span(name, **attributes)
+        token = self.activate(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, error=e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            self.deactivate(token)
+
+    def shutdown(self) -> None:
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+_tracer: Tracer | None = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Tracer global, configurado a partir das variáveis de ambiente no primeiro uso"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                exporters: list = []
+                if path := os.getenv("TRACE_JSONL_PATH"):
+                    exporters.append(JsonlExporter(path))
+                if endpoint := os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+                    exporters.append(OtlpHttpExporter(endpoint))
+                _tracer = Tracer(exporters)
+                if exporters:
+                    # Spans ainda em fila nos exportadores são escritos à saída
+                    atexit.register(_tracer.shutdown)
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> None:
+    """Substitui o tracer global (ex: em benchmarks)"""
+    global _tracer
+    _tracer = tracer
+
+
+# ----------------------------------------------------------------------
+# Relatório
+# ----------------------------------------------------------------------
+
+
+def load_spans(path: str | Path) -> list[dict[str, Any]]:
+    """Lê spans de um ficheiro JSONL"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method="inclusive")[int(q) - 1]
+
+
+def summarize(spans: Iterable[dict[str, Any]]) -> dict[str, dict[str, float]]:
+    """
+    Latência p50/p95/p99 (ms) por etapa
+
+    Além do nome de cada span, as chamadas ao LLM com streaming são divididas em
+    `llm.prefill` (tempo até ao primeiro token) e `llm.decode` (restante geração).
+    """
+    stages: dict[str, list[float]] = {}
+    tokens_per_second: list[float] = []
+    for span in spans:
+        stages.setdefault(span["name"], []).append(span["duration_ms"])
+        attrs = span.get("attributes", {})
+        ttft = attrs.get("llm.time_to_first_token_ms")
+        if ttft is not None:
+            stages.setdefault("llm.prefill", []).append(ttft)
+            stages.setdefault("llm.decode", []).append(span["duration_ms"] - ttft)
+        if attrs.get("llm.tokens_per_second"):
+            tokens_per_second.append(attrs["llm.tokens_per_second"])
+
+    report = {}
+    for name, values in sorted(stages.items()):
+        values.sort()
+        report[name] = {
+            "count": len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99),
+        }
+    if tokens_per_second:
+        report["llm.tokens_per_second"] = {
+            "count": len(tokens_per_second),
+            "mean": statistics.fmean(tokens_per_second),
+        }
+    return report
+
+
+def format_summary(report: dict[str, dict[str, float]]) -> str:
+    """Tabela de texto com o resultado de `summarize`"""
+    lines = [f"{'etapa':32} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}"]
+    for name, row in report.items():
+        if "p50" in row:
+            lines.append(
+                f"{name:32} {row['count']:>6} {row['p50']:>10.1f} "
+                f"{row['p95']:>10.1f} {row['p99']:>10.1f}"
+            )
+        else:
+            lines.append(f"{name:32} {row['count']:>6} média {row['mean']:.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,63 @@
+"""Jobs batch: retomar depois de uma falha entre o destino e o checkpoint"""
+
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.llm.batch import BatchInferenceJob, BatchItem, Checkpoint, JsonlSink, PostgresSink
+
+
+class _Model:
+    def tokenizer(self, texts, add_special_tokens=True):
+        return {"input_ids": [t.split() for t in texts]}
+
+    def generate_batch(self, prompts, **kwargs):
+        return [f"resumo de {p}" for p in prompts]
+
+
+class _CrashingCheckpoint(Checkpoint):
+    """Falha uma vez depois de o destino já ter os resultados"""
+
+    crashed = False
+
+    def add(self, ids):
+        if not _CrashingCheckpoint.crashed:
+            _CrashingCheckpoint.crashed = True
+            raise KeyboardInterrupt
+        super().add(ids)
+
+
+ITEMS = [BatchItem(str(i), f"registo {i}") for i in range(10)]
+
+
+def _run_with_crash(sink, tmp_path):
+    _CrashingCheckpoint.crashed = False
+    checkpoint_path = tmp_path / "job.ckpt"
+    with pytest.raises(KeyboardInterrupt):
+        BatchInferenceJob(
+            _Model(), sink, _CrashingCheckpoint(checkpoint_path), max_batch_tokens=10**6,
+            flush_every=4,
+        ).run(ITEMS)
+    BatchInferenceJob(
+        _Model(), sink, Checkpoint(checkpoint_path), max_batch_tokens=10**6, flush_every=4
+    ).run(ITEMS)
+
+
+def test_jsonl_sink_skips_rows_written_before_crash(tmp_path):
+    path = tmp_path / "resumos.jsonl"
+    _run_with_crash(JsonlSink(path), tmp_path)
+    # Novo processo: os ids já escritos vêm do ficheiro
+    JsonlSink(path).write([{"id": "0", "output": "repetido"}])
+
+    ids = [json.loads(line)["id"] for line in path.read_text().splitlines()]
+    assert sorted(ids) == sorted(item.id for item in ITEMS)
+
+
+def test_postgres_sink_replaces_rows_written_before_crash(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'resumos.db'}")
+    _run_with_crash(PostgresSink(engine, "resumos"), tmp_path)
+
+    with engine.connect() as conn:
+        ids = [row[0] for row in conn.execute(text("SELECT id FROM resumos"))]
+    assert sorted(ids) == sorted(item.id for item in ITEMS)
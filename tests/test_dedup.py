@@ -0,0 +1,28 @@
+"""Índice de quase-duplicados: parâmetros pedidos vs parâmetros gravados"""
+
+import pytest
+
+from src.db.dedup import NearDuplicateIndex
+
+TEXT = "Ministério da Saúde lança campanha de rastreio da diabetes tipo 2 em todo o país"
+VARIANT = "Ministério da Saúde lança nova campanha de rastreio da diabetes tipo 2 no país"
+
+
+def test_requested_threshold_overrides_stored(tmp_path):
+    path = tmp_path / "noticias.npz"
+    index = NearDuplicateIndex.load_or_create(path, threshold=0.99)
+    index.add("a", TEXT)
+    index.save()
+    assert NearDuplicateIndex.load_or_create(path, threshold=0.99).query(VARIANT) == []
+
+    loose = NearDuplicateIndex.load_or_create(path, threshold=0.3)
+    assert loose.threshold == 0.3
+    assert [key for key, _ in loose.query(VARIANT)] == ["a"]
+    assert NearDuplicateIndex.load_or_create(path).threshold == 0.99
+
+
+def test_incompatible_signature_params_raise(tmp_path):
+    path = tmp_path / "rag.npz"
+    NearDuplicateIndex.load_or_create(path, num_perm=64).save()
+    with pytest.raises(ValueError, match="num_perm=64"):
+        NearDuplicateIndex.load_or_create(path, num_perm=128)
@@ -0,0 +1,96 @@
+"""Controlo de execução do agente: reparação de tool calls, ciclos e orçamento"""
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.runnables import RunnableLambda
+
+from src.agents.execution import (
+    CONTROLLER_KEY,
+    AgentPlanner,
+    ExecutionController,
+    ExecutionLimits,
+    parse_actions,
+)
+
+TOOLS = ["ClinicalCalculator", "QueryDatabase"]
+ANSWER = "O IMC de 22.9 está dentro do intervalo normal para um adulto, sem risco acrescido."
+
+
+def test_parse_actions_repairs_tool_calls():
+    misspelled = AIMessage(content="", tool_calls=[
+        {"name": "clinical_calculator", "args": {"__arg1": "imc:70,1.75"}, "id": "c1"},
+    ])
+    actions, repaired = parse_actions(misspelled, TOOLS)
+    assert repaired == 1
+    assert [(a.tool, a.tool_input) for a in actions] == [("ClinicalCalculator", "imc:70,1.75")]
+
+    invalid = AIMessage(content="", invalid_tool_calls=[{
+        "name": "QueryDatabase", "args": "{'__arg1': 'SELECT 1',}", "id": "c2", "error": None,
+    }])
+    actions, repaired = parse_actions(invalid, TOOLS)
+    assert repaired == 1
+    assert [(a.tool, a.tool_input) for a in actions] == [("QueryDatabase", "SELECT 1")]
+
+    in_text = AIMessage(
+        content='```json\n{"name": "clinicalcalculator", "input": "pa:140,90"}\n```'
+    )
+    actions, repaired = parse_actions(in_text, TOOLS)
+    assert repaired == 1
+    assert [(a.tool, a.tool_input) for a in actions] == [("ClinicalCalculator", "pa:140,90")]
+
+    result, repaired = parse_actions(AIMessage(content=ANSWER), TOOLS)
+    assert isinstance(result, AgentFinish) and repaired == 0
+
+
+def _repeat(content: str) -> AIMessage:
+    return AIMessage(content=content, tool_calls=[
+        {"name": "ClinicalCalculator", "args": {"__arg1": "imc:70,1.75"}, "id": "c3"},
+    ])
+
+
+STEPS = [(AgentAction("ClinicalCalculator", "imc:70,1.75", ""), "IMC: 22.9 (Peso normal)")]
+
+
+def test_repeated_call_with_answer_stops_and_saves_one_round_trip():
+    controller = ExecutionController(ExecutionLimits(max_iterations=5))
+    controller.begin_iteration()
+    decision = controller.decide(_repeat(ANSWER), STEPS, TOOLS, final=False)
+
+    assert isinstance(decision, AgentFinish)
+    assert decision.return_values["output"] == ANSWER
+    assert controller.stop_reason == "loop"
+    assert (controller.saved_iterations, controller.saved_llm_calls) == (1, 1)
+
+
+def test_repeated_call_without_answer_asks_for_one():
+    controller = ExecutionController(ExecutionLimits(max_iterations=5))
+    controller.begin_iteration()
+
+    assert controller.decide(_repeat(""), STEPS, TOOLS, final=False) is None
+    # A chamada de resposta que se segue substitui a do LLM: nenhuma chamada poupada
+    assert (controller.saved_iterations, controller.saved_llm_calls) == (1, 0)
+
+
+def _planner(responses: list[AIMessage]) -> AgentPlanner:
+    llm = FakeMessagesListChatModel(responses=responses)
+    prepare = RunnableLambda(lambda inputs: StringPromptValue(text="pergunta " * 40))
+    return AgentPlanner(prepare, llm, llm, TOOLS)
+
+
+def test_budget_stops_before_another_llm_call():
+    planner = _planner([_repeat(""), AIMessage(content="não deve ser chamado")])
+    controller = ExecutionController(ExecutionLimits(max_tokens=50))
+    inputs = {"input": "IMC?", CONTROLLER_KEY: controller, "intermediate_steps": []}
+
+    actions = planner.as_runnable().invoke(inputs)
+    assert [a.tool for a in actions] == ["ClinicalCalculator"]
+    assert controller.exhausted()
+
+    steps = [(actions[0], "IMC: 22.9 (Peso normal)")]
+    decision = planner.as_runnable().invoke({**inputs, "intermediate_steps": steps})
+    assert isinstance(decision, AgentFinish)
+    assert controller.stop_reason == "budget"
+    assert "IMC: 22.9" in decision.return_values["output"]
+    assert controller.llm_calls == 1
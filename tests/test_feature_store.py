@@ -0,0 +1,31 @@
+"""Feature store: atualizações incrementais e rebuild dão as mesmas features"""
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from benchmarks.run import synthetic_diabetes_dataset  # noqa: E402
+from src.db.feature_store import FeatureStore  # noqa: E402
+from src.db.validation import PATIENT_ID_COLUMN, RECORD_ID_COLUMN  # noqa: E402
+
+
+def test_incremental_update_matches_rebuild(tmp_path):
+    df = synthetic_diabetes_dataset(600, rows_per_patient=6)
+    df[RECORD_ID_COLUMN] = range(1, len(df) + 1)
+
+    incremental = FeatureStore(tmp_path / "incremental.db")
+    for start in range(0, len(df), 100):
+        incremental.update(df.iloc[start : start + 100])
+
+    # Linhas gravadas fora da ordem de ingestão: o rebuild ordena por registo_id
+    engine = create_engine(f"sqlite:///{tmp_path / 'saude.db'}")
+    df.sample(frac=1, random_state=0).to_sql("saude_transacional", engine, index=False)
+    rebuilt = FeatureStore(tmp_path / "rebuilt.db")
+    assert rebuilt.rebuild(engine, chunksize=70) == len(incremental)
+
+    for patient_id in df[PATIENT_ID_COLUMN].unique():
+        assert rebuilt.get(patient_id) == incremental.get(patient_id)
+    incremental.close()
+    rebuilt.close()
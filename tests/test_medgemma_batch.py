@@ -0,0 +1,58 @@
+"""Geração em lote do modelo local partilhado entre threads"""
+
+import threading
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from benchmarks.run import _tiny_model_dir  # noqa: E402
+from src.llm.medgemma import MedGemmaHuggingFace  # noqa: E402
+
+PROMPTS = [
+    "O doente apresenta hipertensão.",
+    "O doente apresenta hipertensão arterial e diabetes tipo 2. " * 2,
+]
+
+
+@pytest.fixture(scope="module")
+def model(tmp_path_factory):
+    return MedGemmaHuggingFace(
+        model_name=_tiny_model_dir(tmp_path_factory.mktemp("model")),
+        device="cpu",
+        use_quantization=False,
+        use_snapshot=False,
+        max_new_tokens=8,
+        do_sample=False,
+    )
+
+
+def test_batch_matches_single_and_keeps_tokenizer(model):
+    padding_side = model.tokenizer.padding_side
+
+    assert model.generate_batch(PROMPTS) == [model.generate(p) for p in PROMPTS]
+    assert model.tokenizer.padding_side == padding_side
+
+
+def test_batches_and_streams_run_concurrently(model):
+    expected = model.generate_batch(PROMPTS)
+    streamed = model.generate(PROMPTS[0])
+    results: dict[str, list] = {"batch": [], "stream": []}
+
+    def batches():
+        for _ in range(5):
+            results["batch"].append(model.generate_batch(PROMPTS))
+
+    def streams():
+        for _ in range(5):
+            results["stream"].append("".join(model.stream(PROMPTS[0])).strip())
+
+    threads = [threading.Thread(target=batches), threading.Thread(target=streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results["batch"] == [expected] * 5
+    assert results["stream"] == [streamed] * 5
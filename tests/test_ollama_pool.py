@@ -0,0 +1,91 @@
+"""Pool de réplicas Ollama contra servidores stub locais (benchmarks/ollama_pool.py)"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.ollama_pool import start_stub, url
+from src.llm.ollama_pool import MedGemmaOllamaPool, NoHealthyReplicaError, OllamaPool
+
+
+@pytest.fixture
+def stubs():
+    servers = []
+
+    def start(latency: float = 0.0, fail: bool = False):
+        server = start_stub(latency, fail=fail)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_requests_spread_over_replicas(stubs):
+    servers = [stubs(latency=0.02) for _ in range(2)]
+    pool = OllamaPool([url(s) for s in servers], health_check_interval=None)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        texts = list(executor.map(lambda i: pool.generate("medgemma", f"p{i}"), range(16)))
+    pool.close()
+
+    assert texts == [f"eco: p{i}" for i in range(16)]
+    assert all(r["total_requests"] > 0 for r in pool.stats())
+
+
+def test_failover_ejects_broken_replica(stubs):
+    broken, healthy = stubs(fail=True), stubs()
+    pool = OllamaPool([url(broken), url(healthy)], health_check_interval=None)
+
+    assert [pool.generate("medgemma", f"p{i}") for i in range(4)] == [
+        f"eco: p{i}" for i in range(4)
+    ]
+    assert [r["available"] for r in pool.stats()] == [False, True]
+    assert pool.check_health() == {url(broken): False, url(healthy): True}
+    pool.close()
+
+
+def test_health_check_readmits_replica(stubs):
+    server = stubs()
+    pool = OllamaPool([url(server)], health_check_interval=None, eject_seconds=60)
+    pool.replicas[0].ejected_until = float("inf")
+
+    assert pool.check_health() == {url(server): True}
+    assert pool.stats()[0]["available"]
+    pool.close()
+
+
+def test_all_replicas_failing_raises(stubs):
+    pool = OllamaPool([url(stubs(fail=True)) for _ in range(2)], health_check_interval=None)
+    with pytest.raises(NoHealthyReplicaError):
+        pool.generate("medgemma", "p")
+    pool.close()
+
+
+def test_from_urls_forwards_pool_arguments(stubs):
+    broken, healthy = stubs(fail=True), stubs()
+    llm = MedGemmaOllamaPool.from_urls(
+        [url(broken), url(healthy)],
+        failure_threshold=3,
+        health_check_interval=None,
+        temperature=0.1,
+    )
+
+    assert llm.pool.health_check_interval is None
+    assert llm.temperature == 0.1
+    assert llm.invoke("olá") == "eco: olá"
+    # Uma só falha não chega para ejetar com failure_threshold=3
+    assert all(r["available"] for r in llm.pool.stats())
+    assert "".join(llm.stream("olá")) == "eco: olá"
+    llm.pool.close()
+
+
+def test_health_probe_failures_respect_threshold(stubs):
+    broken = stubs(fail=True)
+    pool = OllamaPool([url(broken)], health_check_interval=None, failure_threshold=2)
+
+    assert pool.check_health() == {url(broken): False}
+    assert pool.stats()[0]["available"]
+    pool.check_health()
+    assert not pool.stats()[0]["available"]
+    pool.close()
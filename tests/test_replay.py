@@ -0,0 +1,51 @@
+"""Gravação e reprodução de respostas do LLM"""
+
+import pytest
+from langchain.tools import Tool
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.agents.nesy_agent import MedicalDecisionAgent
+from src.agents.text_tools import TextToolCallingChat
+from src.llm.replay import LLMRecorder, ReplayChatModel
+
+
+def _agent(llm) -> MedicalDecisionAgent:
+    tool = Tool(name="patient_lookup", func=lambda x: "Glicemia: 180", description="Doente")
+    return MedicalDecisionAgent(
+        llm=llm, tools=[tool], db_postgres=None, vector_db=None, mongo_db=None
+    )
+
+
+def test_replays_agent_recorded_through_text_wrapper(tmp_path):
+    path = tmp_path / "gravacoes.jsonl"
+    llm = TextToolCallingChat(llm=FakeListLLM(
+        responses=['{"name": "patient_lookup", "input": "123"}', "Glicemia alta."]
+    ))
+    llm.callbacks = [LLMRecorder(path)]
+    question = "Qual a glicemia do doente 123?"
+    recorded = _agent(llm).query(question)
+
+    replayed = _agent(ReplayChatModel.from_file(path, latency=None)).query(question)
+
+    assert replayed == recorded == "Glicemia alta."
+
+
+def test_text_llm_and_chat_prompts_share_key(tmp_path):
+    path = tmp_path / "gravacoes.jsonl"
+    messages = [SystemMessage("És um assistente."), HumanMessage("Olá")]
+    FakeListLLM(responses=["Bom dia."], callbacks=[LLMRecorder(path)]).invoke(messages)
+
+    replay = ReplayChatModel.from_file(path, latency=None)
+
+    assert replay.invoke(messages).content == "Bom dia."
+
+
+def test_missing_recording_raises_unless_lenient(tmp_path):
+    path = tmp_path / "gravacoes.jsonl"
+    FakeListLLM(responses=["Bom dia."], callbacks=[LLMRecorder(path)]).invoke("Olá")
+
+    with pytest.raises(KeyError):
+        ReplayChatModel.from_file(path, latency=None).invoke("Outra pergunta")
+    lenient = ReplayChatModel.from_file(path, latency=None, strict=False)
+    assert lenient.invoke("Outra pergunta").content == "Bom dia."
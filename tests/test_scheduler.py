@@ -0,0 +1,63 @@
+"""Escalonador do LLM: espera assíncrona, cancelamentos e estado por tenant"""
+
+import asyncio
+import threading
+
+import pytest
+from langchain_core.language_models.fake import FakeListLLM
+
+from src.llm.scheduler import AsyncSchedulerCallbackHandler, LLMScheduler
+
+
+def test_idle_tenants_are_forgotten():
+    scheduler = LLMScheduler(max_concurrency=4, per_tenant_limit=2)
+    for i in range(50):
+        with scheduler.slot(tenant=f"sessão-{i}"):
+            assert scheduler.stats()["running_by_tenant"] == {f"sessão-{i}": 1}
+    assert scheduler._running_by_tenant == {}
+
+
+def test_async_waiters_do_not_hold_threads():
+    scheduler = LLMScheduler(max_concurrency=1)
+    scheduler.acquire(tenant="ocupado")
+
+    async def main():
+        threads = threading.active_count()
+        waiters = [asyncio.create_task(scheduler.aacquire(tenant=f"t{i}")) for i in range(20)]
+        await asyncio.sleep(0.05)
+        assert threading.active_count() == threads
+        assert scheduler.stats()["queued"] == 20
+
+        scheduler.release("ocupado")
+        await asyncio.wait_for(waiters[0], 1)
+        for waiter in waiters[1:]:
+            waiter.cancel()
+        await asyncio.gather(*waiters[1:], return_exceptions=True)
+        assert scheduler.stats() == {"queued": 0, "running": 1, "running_by_tenant": {"t0": 1}}
+        scheduler.release("t0")
+
+    asyncio.run(main())
+    assert scheduler.stats() == {"queued": 0, "running": 0, "running_by_tenant": {}}
+
+
+def test_cancelled_llm_call_gives_back_its_slot():
+    scheduler = LLMScheduler(max_concurrency=1)
+    llm = FakeListLLM(responses=["resposta"])
+    scheduler.acquire(tenant="ocupado")
+
+    async def main():
+        handler = AsyncSchedulerCallbackHandler(scheduler, tenant="sessão")
+        call = asyncio.create_task(llm.ainvoke("pergunta", config={"callbacks": [handler]}))
+        await asyncio.sleep(0.05)
+        assert scheduler.stats()["queued"] == 1
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert scheduler.stats()["queued"] == 0
+
+        scheduler.release("ocupado")
+        handler = AsyncSchedulerCallbackHandler(scheduler, tenant="sessão")
+        assert await llm.ainvoke("pergunta", config={"callbacks": [handler]}) == "resposta"
+
+    asyncio.run(main())
+    assert scheduler.stats() == {"queued": 0, "running": 0, "running_by_tenant": {}}
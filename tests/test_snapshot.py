@@ -0,0 +1,48 @@
+"""Chave dos snapshots do modelo: muda com o checkpoint de origem"""
+
+import os
+
+import pytest
+
+pytest.importorskip("transformers")
+
+from src.llm.snapshot import checkpoint_identity, snapshot_fields, snapshot_key  # noqa: E402
+
+
+def _key(model_name: str) -> str:
+    return snapshot_key(snapshot_fields(model_name, use_quantization=False))
+
+
+def test_local_checkpoint_change_invalidates_key(tmp_path):
+    (tmp_path / "config.json").write_text("{}")
+    weights = tmp_path / "model.safetensors"
+    weights.write_bytes(b"pesos v1")
+    before = _key(str(tmp_path))
+    (tmp_path / "README.md").write_text("notas")
+    assert _key(str(tmp_path)) == before
+
+    # Pesos substituídos no mesmo caminho (mesmo tamanho, mtime diferente)
+    weights.write_bytes(b"pesos v2")
+    stat = weights.stat()
+    os.utime(weights, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert _key(str(tmp_path)) != before
+
+
+def test_hub_checkpoint_is_cached_commit(tmp_path, monkeypatch):
+    from huggingface_hub import constants
+
+    monkeypatch.setattr(constants, "HF_HUB_CACHE", str(tmp_path))
+    assert checkpoint_identity("google/medgemma-4b-it") is None
+
+    repo = tmp_path / "models--google--medgemma-4b-it"
+    for commit in ("a1b2c3", "d4e5f6"):
+        (repo / "snapshots" / commit).mkdir(parents=True)
+        (repo / "snapshots" / commit / "config.json").write_text("{}")
+    (repo / "refs").mkdir()
+    (repo / "refs" / "main").write_text("a1b2c3")
+    first = _key("google/medgemma-4b-it")
+    assert checkpoint_identity("google/medgemma-4b-it") == "a1b2c3"
+
+    (repo / "refs" / "main").write_text("d4e5f6")
+    assert checkpoint_identity("google/medgemma-4b-it") == "d4e5f6"
+    assert _key("google/medgemma-4b-it") != first
@@ -0,0 +1,119 @@
+"""Agente sobre providers de texto (sem tool calling nativo)"""
+
+import pytest
+from langchain.tools import Tool
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from config.medgemma_config import MedGemmaConfig
+from src.agents.nesy_agent import MedicalDecisionAgent
+from src.agents.text_tools import TextToolCallingChat, supports_tool_calling
+from src.llm.medgemma import get_medgemma_llm
+
+
+def _tools(calls: list[str]) -> list[Tool]:
+    return [
+        Tool(
+            name="patient_lookup",
+            func=lambda x: calls.append(x) or "Glicemia: 180 mg/dL",
+            description="Dados clínicos de um doente pelo id",
+        )
+    ]
+
+
+def _agent(llm, calls: list[str] | None = None) -> MedicalDecisionAgent:
+    return MedicalDecisionAgent(
+        llm=llm, tools=_tools([] if calls is None else calls),
+        db_postgres=None, vector_db=None, mongo_db=None,
+    )
+
+
+@pytest.mark.parametrize("provider", ["ollama", "ollama-pool", "local-server"])
+def test_agent_builds_with_configured_provider(provider):
+    # Como `get_llm()` na app: LLM criado a partir da configuração
+    llm = get_medgemma_llm(config=MedGemmaConfig(provider=provider))
+    assert not supports_tool_calling(llm)
+
+    agent = _agent(llm)
+
+    assert agent.agent is not None
+
+
+def test_agent_runs_text_tool_call():
+    calls: list[str] = []
+    llm = FakeListLLM(responses=['{"name": "patient_lookup", "input": "123"}', "Glicemia alta."])
+
+    answer = _agent(llm, calls).query("Qual a glicemia do doente 123?")
+
+    assert answer == "Glicemia alta."
+    assert calls == ["123"]
+
+
+def test_tool_call_json_becomes_tool_calls():
+    llm = TextToolCallingChat(
+        llm=FakeListLLM(responses=['```json\n{"name": "patient_lookup", "input": "7"}\n```'])
+    ).bind_tools(_tools([]))
+
+    message = llm.invoke([HumanMessage("Doente 7?")])
+
+    assert message.content == ""
+    assert [(c["name"], c["args"]) for c in message.tool_calls] == [
+        ("patient_lookup", {"__arg1": "7"})
+    ]
+
+
+def test_stream_holds_tool_call_and_passes_text():
+    llm = TextToolCallingChat(llm=FakeListLLM(responses=[
+        '{"name": "patient_lookup", "input": "7"}', "Sem dados."
+    ])).bind_tools(_tools([]))
+
+    chunks = list(llm.stream([HumanMessage("Doente 7?")]))
+    merged = sum(chunks[1:], chunks[0])
+    assert merged.content == ""
+    assert merged.tool_calls[0]["args"] == {"__arg1": "7"}
+
+    chunks = list(llm.stream([HumanMessage("Doente 7?")]))
+    assert "".join(c.content for c in chunks) == "Sem dados."
+
+
+def test_prompt_renders_tool_turns():
+    llm = TextToolCallingChat(llm=FakeListLLM(responses=[""])).bind_tools(_tools([]))
+    call = {"name": "patient_lookup", "args": {"__arg1": "7"}, "id": "c1"}
+
+    prompt = llm._prompt([
+        SystemMessage("És um assistente clínico."),
+        HumanMessage("Doente 7?"),
+        AIMessage("", tool_calls=[call]),
+        ToolMessage("Glicemia: 180 mg/dL", tool_call_id="c1"),
+    ])
+
+    assert prompt.index("És um assistente") < prompt.index("- patient_lookup:")
+    assert 'Assistente: {"name": "patient_lookup", "input": "7"}' in prompt
+    assert "Resultado (patient_lookup): Glicemia: 180 mg/dL" in prompt
+    assert prompt.endswith("Assistente:")
+
+
+def test_stream_emits_only_final_answer():
+    from langchain_core.language_models.fake import FakeStreamingListLLM
+
+    llm = FakeStreamingListLLM(responses=[
+        "A consultar o doente.\n" '{"name": "patient_lookup", "input": "123"}',
+        "Glicemia alta.",
+    ])
+    result: dict[str, str] = {}
+
+    streamed = "".join(_agent(llm).stream("Qual a glicemia do doente 123?", result=result))
+
+    assert "patient_lookup" not in streamed
+    assert streamed == result["output"] == "Glicemia alta."
+
+
+def test_planning_calls_use_invoke():
+    # Chamadas de planeamento por invoke: num LLM com lotes juntam-se às de outras sessões
+    class InvokeOnly(FakeListLLM):
+        def _stream(self, *args, **kwargs):
+            raise AssertionError("planeamento não deve usar stream")
+
+    llm = InvokeOnly(responses=['{"name": "patient_lookup", "input": "123"}', "Glicemia alta."])
+
+    assert _agent(llm).query("Qual a glicemia do doente 123?") == "Glicemia alta."
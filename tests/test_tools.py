@@ -0,0 +1,96 @@
+"""Ferramentas do agente: SQL só de leitura e com tempo máximo, calculadora clínica"""
+
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+
+from src.agents.tools import aquery_database, clinical_calculator, query_database
+from src.db.async_stores import AsyncPostgres
+
+
+class _Result:
+    def keys(self):
+        return ["n"]
+
+    def fetchmany(self, size):
+        return [(1,)]
+
+
+class _Connection:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return _Result()
+
+
+class _Engine:
+    def __init__(self):
+        self.conn = _Connection()
+
+    @contextmanager
+    def connect(self):
+        yield self.conn
+
+
+def test_sync_query_runs_in_read_only_transaction_with_timeout():
+    engine = _Engine()
+
+    query_database(engine, "WITH d AS (DELETE FROM saude_transacional RETURNING 1) SELECT 1")
+
+    first, timeout, _ = engine.conn.statements
+    assert first == "SET TRANSACTION READ ONLY"
+    assert "statement_timeout" in timeout
+
+
+def test_rejects_non_select():
+    assert query_database(_Engine(), "DELETE FROM saude_transacional").startswith("Apenas")
+
+
+class _Cursor:
+    def __init__(self, statements):
+        self.statements = statements
+        self.description = None
+
+    async def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+
+class _AsyncConnection:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    @asynccontextmanager
+    async def cursor(self):
+        yield _Cursor(self.statements)
+
+
+class _Pool:
+    def __init__(self):
+        self.conn = _AsyncConnection()
+
+    @asynccontextmanager
+    async def connection(self):
+        yield self.conn
+
+
+def test_async_query_runs_in_read_only_transaction_with_timeout():
+    postgres = AsyncPostgres.__new__(AsyncPostgres)
+    postgres.pool = _Pool()
+
+    asyncio.run(aquery_database(postgres, "SELECT 1"))
+
+    first, timeout, query = postgres.pool.conn.statements
+    assert first == "SET TRANSACTION READ ONLY"
+    assert "statement_timeout" in timeout
+    assert query == "SELECT 1"
+
+
+def test_clinical_calculator_rejects_non_positive_values():
+    assert clinical_calculator("imc:70,1.75") == "IMC: 22.9 (Peso normal)"
+    for expression in ("imc:70,0", "imc:0,1.75", "imc:-70,1.75", "imc:70,nan", "pa:140,inf"):
+        assert clinical_calculator(expression).startswith("Cálculo não suportado")
@@ -0,0 +1,28 @@
+"""Exportador JSONL: spans escritos fora do caminho crítico, sem perdas"""
+
+import threading
+
+from src.observability.tracing import JsonlExporter, Tracer, load_spans
+
+
+def test_jsonl_exporter_writes_all_spans_from_threads(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer([JsonlExporter(path)])
+
+    def work(worker: int) -> None:
+        for i in range(50):
+            with tracer.span("tool.calc", worker=worker, i=i):
+                pass
+
+    threads = [threading.Thread(target=work, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tracer.shutdown()
+
+    spans = load_spans(path)
+    assert len(spans) == 200
+    assert {(s["attributes"]["worker"], s["attributes"]["i"]) for s in spans} == {
+        (w, i) for w in range(4) for i in range(50)
+    }
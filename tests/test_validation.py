@@ -0,0 +1,36 @@
+"""Validação na ingestão de saude_transacional"""
+
+import pandas as pd
+import pytest
+
+from src.db.validation import PATIENT_ID_COLUMN, validate
+
+
+def _rows(**overrides):
+    data = {
+        PATIENT_ID_COLUMN: ["P1", "P2"],
+        "age": [54, 61],
+        "gender": [" Male ", "Female"],
+        "systolic_bp": [130, 145],
+        "diastolic_bp": [85, 90],
+    }
+    return pd.DataFrame({**data, **overrides})
+
+
+def test_patient_id_is_required():
+    with pytest.raises(ValueError, match=PATIENT_ID_COLUMN):
+        validate(_rows().drop(columns=[PATIENT_ID_COLUMN]))
+
+
+def test_rows_without_patient_are_quarantined():
+    result = validate(_rows(**{PATIENT_ID_COLUMN: ["P1", None]}))
+
+    assert result.valid[PATIENT_ID_COLUMN].tolist() == ["P1"]
+    assert result.failures == {f"{PATIENT_ID_COLUMN}:nulo": 1}
+
+
+def test_diastolic_must_be_below_systolic():
+    result = validate(_rows(diastolic_bp=[85, 150]))
+
+    assert len(result.valid) == 1
+    assert result.invalid["motivo"].tolist() == ["pa_sistolica_maior"]
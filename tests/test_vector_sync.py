@@ -0,0 +1,120 @@
+"""Sincronização incremental MongoDB -> ChromaDB (coleções falsas em memória)"""
+
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("bson")
+
+from src.db.mongo_storage import CollectionLayout  # noqa: E402
+from src.db.vector_sync import MongoSource, SyncState, VectorSync  # noqa: E402
+
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(_matches(doc, branch) for branch in cond):
+                return False
+        elif isinstance(cond, dict):
+            if not doc[key] > cond["$gt"]:
+                return False
+        elif doc[key] != cond:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for key, direction in reversed(keys):
+            self.docs.sort(key=lambda d, k=key: d[k], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        return self.docs[:n]
+
+
+class _Stream:
+    resume_token = {"_data": "inicio"}
+
+    def try_next(self):
+        return None
+
+
+class _MongoCollection:
+    name = "logs_saude"
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        return _Cursor([d for d in self.docs if _matches(d, query)])
+
+    @contextmanager
+    def watch(self, **kwargs):
+        yield _Stream()
+
+
+class _TimeSeriesCollection(_MongoCollection):
+    def watch(self, **kwargs):
+        raise AssertionError("coleções time-series não têm change streams")
+
+
+class _Chroma:
+    def __init__(self, fail_after: int | None = None):
+        self.ids: set[str] = set()
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def upsert(self, ids, documents, metadatas):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise ConnectionError("ChromaDB indisponível")
+        self.ids.update(ids)
+
+    def delete(self, ids):
+        self.ids.difference_update(ids)
+
+
+def test_backfill_resumes_after_failure(tmp_path):
+    collection = _MongoCollection([{"_id": i, "texto": f"registo {i}"} for i in range(10)])
+    source = MongoSource(collection, text_field="texto", page_size=3)
+    state = SyncState(tmp_path / "vector_sync.json")
+
+    failing = _Chroma(fail_after=2)
+    with pytest.raises(ConnectionError):
+        VectorSync(failing, [source], state).run_once()
+    assert '"backfill"' in state.get(source.name)
+
+    chroma = _Chroma()
+    state = SyncState(tmp_path / "vector_sync.json")
+    VectorSync(chroma, [source], state).run_once()
+
+    indexed = failing.ids | chroma.ids
+    assert indexed == {f"mongo:logs_saude:{i}" for i in range(10)}
+    assert chroma.ids == {f"mongo:logs_saude:{i}" for i in range(6, 10)}
+    assert '"backfill"' not in state.get(source.name)
+
+
+def test_timeseries_polls_on_time_and_meta(tmp_path):
+    # Vários documentos com o mesmo timestamp: o desempate é o patient_id
+    docs = [
+        {"_id": 100 - i, "timestamp": i // 4, "patient_id": f"P{i % 4}", "texto": f"log {i}"}
+        for i in range(10)
+    ]
+    collection = _TimeSeriesCollection(docs)
+    layout = CollectionLayout(
+        "logs_saude", time_field="timestamp", meta_field="patient_id", timeseries=True
+    )
+    source = MongoSource.for_layout(collection, layout, text_field="texto", page_size=3)
+    assert (source.updated_field, source.meta_field) == ("timestamp", "patient_id")
+
+    chroma = _Chroma()
+    sync = VectorSync(chroma, [source], SyncState(tmp_path / "vector_sync.json"))
+    assert sync.run_once()[source.name]["upserts"] == 10
+
+    collection.docs.append({"_id": 1, "timestamp": 3, "patient_id": "P0", "texto": "novo"})
+    assert sync.run_once()[source.name]["upserts"] == 1
+    assert "mongo:logs_saude:1" in chroma.ids